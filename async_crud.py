@@ -0,0 +1,1284 @@
+# async_crud.py
+# Native asyncio counterpart of crud.py, used when db.DB_MODE is "async".
+from aiomysql import DictCursor, SSDictCursor
+from backends import OPEN_TRANSACTIONS
+from cache import cached, invalidate
+from crud import EXPORT_NET_WRITE_TIMEOUT, EXPORT_QUERIES, EXPAND_BATCH_SIZE, IMPORT_COUNTERS, IMPORT_QUERIES, \
+    LISTINGS, RELATIONS, TABLES, \
+    GROUP_COMMIT, GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_WINDOW_SECONDS, \
+    attach_related, auto_increment_ids, invalidate_links, bulk_insert_batches, by_id_query, delta_query, expansion_ids, make_delta_page, \
+    make_summary, parse_expand, patch_statements, search_query, search_terms, sync_token, \
+    SYNC_TABLES, TOMBSTONE_CURSOR, add_deletions, check_sync_age, rewritten_query, tombstone_horizon, \
+    tombstone_position, tombstone_query, tombstones_due
+from db import BACKEND, async_pooled_connection, async_read_connection, in_transaction, pin_to_primary
+from migrations import REBUILD_SUMMARY_STATEMENTS
+from pagination import DEFAULT_PAGE_SIZE, encode_cursor, make_page, page_query
+from queries import QUERIES
+from search import SEARCH_DEFAULT_LIMIT, SEARCH_KEYS, query_words
+from serialization import dumps
+from datetime import date
+from typing import List, Optional
+import asyncio
+import json
+import pymysql
+
+
+async def patch_row(table: str, key: int, changes: dict):
+    """
+    Async counterpart of crud.patch_row().
+    """
+    update, select, params = patch_statements(table, changes)
+    count = SUMMARY_COUNTERS.get(table) if update is not None else None
+    params["key"] = key
+    async with async_pooled_connection() as connection:
+        if update is not None:
+            await connection.begin()
+        cursor = await connection.cursor(DictCursor)
+        if count is not None:
+            await count(cursor, key, -1, params)
+        if update is not None:
+            await cursor.execute(update, params)
+            if cursor.rowcount == 0:
+                await cursor.close()
+                # aiomysql closes a connection released mid-transaction rather
+                # than pooling it; a shared transaction is left to its block.
+                if not in_transaction():
+                    await connection.rollback()
+                return None
+            await log_change(cursor, table, "update", {TABLES[table][0]: key})
+        if count is not None:
+            await count(cursor, key, 1, params)
+        await cursor.execute(select, params)
+        result = await cursor.fetchone()
+        if update is not None and table in SEARCH_KEYS:
+            await index_row(cursor, table, key, result)
+        await connection.commit()
+        if update is not None:
+            invalidate(table, key)
+        await cursor.close()
+        return result
+
+
+# Tenant CRUD
+async def create_tenant(tenant_data: dict):
+    """
+    Inserts a new tenant into the Tenants table.
+    Expects tenant_data with keys: firstName, lastName, phoneNumber, email.
+    """
+    query = QUERIES["create_tenant"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, tenant_data)
+        tenantID = cursor.lastrowid
+        await index_row(cursor, "Tenants", tenantID, tenant_data)
+        await log_change(cursor, "Tenants", "insert", {"tenantID": tenantID})
+        await connection.commit()
+        await cursor.close()
+        return tenantID
+
+
+async def create_tenants(tenants_data: List[dict]):
+    """
+    Inserts many tenants into the Tenants table in a single transaction, using
+    batched multi-row INSERTs. Returns the generated tenantIDs in input order.
+    """
+    columns = ["firstName", "lastName", "phoneNumber", "email"]
+    async with async_pooled_connection() as connection:
+        tenantIDs = await bulk_insert(connection, "Tenants", columns, tenants_data)
+        await index_rows(connection, "Tenants", tenantIDs, tenants_data)
+        await log_changes(connection, "Tenants", "insert", [{"tenantID": tenantID} for tenantID in tenantIDs])
+        await connection.commit()
+        return tenantIDs
+
+
+@cached("Tenants")
+async def get_tenant(tenantID: int):
+    """
+    Returns a single tenant record by tenantID.
+    """
+    query = QUERIES["get_tenant"]
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, {"tenantID": tenantID})
+        result = await cursor.fetchone()
+        await cursor.close()
+        return result
+
+
+async def get_tenants(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                      sort: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of tenant records ordered by `sort` (default tenantID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `since` lists only what changed after a sync token (see crud.get_changed_rows()).
+    """
+    if since is not None:
+        return await get_changed_rows("Tenants", QUERIES["get_changed_tenants"], ["tenantID"], limit, after, filters, sort, since)
+    query, params, order = page_query(QUERIES["get_tenants"], ["tenantID"], after, limit, filters=filters, sort=sort, **LISTINGS["Tenants"])
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, params)
+        results = await cursor.fetchall()
+        await cursor.close()
+        return make_page(results, order, limit)
+
+
+async def search_tenants(q: str, limit: int = SEARCH_DEFAULT_LIMIT):
+    """
+    Async counterpart of crud.search_tenants().
+    """
+    return await search_rows("Tenants", q, limit)
+
+
+async def update_tenant(tenantID: int, tenant_data: dict):
+    """
+    Updates a tenant record identified by tenantID.
+    Expects tenant_data with keys: firstName, lastName, phoneNumber, email.
+    Returns the number of matching rows, so 0 means no record has that tenantID.
+    """
+    query = QUERIES["update_tenant"]
+    tenant_data["tenantID"] = tenantID
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await cursor.execute(query, tenant_data)
+        matched = cursor.rowcount
+        if matched:
+            await index_row(cursor, "Tenants", tenantID, tenant_data)
+            await log_change(cursor, "Tenants", "update", {"tenantID": tenantID})
+        await connection.commit()
+        invalidate("Tenants", tenantID)
+        await cursor.close()
+        return matched
+
+
+async def patch_tenant(tenantID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a tenant record.
+    Returns the full updated record, or None if no record has that tenantID.
+    """
+    return await patch_row("Tenants", tenantID, changes)
+
+
+async def delete_tenant(tenantID: int):
+    """
+    Deletes a tenant record by tenantID.
+    """
+    query = QUERIES["delete_tenant"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await cursor.execute(query, {"tenantID": tenantID})
+        if cursor.rowcount:
+            await unindex_row(cursor, "Tenants", tenantID)
+            await log_change(cursor, "Tenants", "delete", {"tenantID": tenantID})
+        await connection.commit()
+        invalidate("Tenants", tenantID)
+        await cursor.close()
+
+
+# Property CRUD
+
+async def create_property(property_data: dict):
+    """
+    Inserts a new property into the Properties table.
+    Expects property_data with keys: address, city, state, zipCode, propertyValue.
+    """
+    query = QUERIES["create_property"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, property_data)
+        propertyID = cursor.lastrowid
+        await index_row(cursor, "Properties", propertyID, property_data)
+        await log_change(cursor, "Properties", "insert", {"propertyID": propertyID})
+        await connection.commit()
+        await cursor.close()
+        return propertyID
+
+
+@cached("Properties")
+async def get_property(propertyID: int):
+    """
+    Returns a single property record by propertyID.
+    """
+    query = QUERIES["get_property"]
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, {"propertyID": propertyID})
+        result = await cursor.fetchone()
+        await cursor.close()
+        return result
+
+
+async def get_properties(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                         sort: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of property records ordered by `sort` (default propertyID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `since` lists only what changed after a sync token (see crud.get_changed_rows()).
+    """
+    if since is not None:
+        return await get_changed_rows("Properties", QUERIES["get_changed_properties"], ["propertyID"], limit, after, filters, sort, since)
+    query, params, order = page_query(QUERIES["get_properties"], ["propertyID"], after, limit, filters=filters, sort=sort, **LISTINGS["Properties"])
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, params)
+        results = await cursor.fetchall()
+        await cursor.close()
+        return make_page(results, order, limit)
+
+
+async def search_properties(q: str, limit: int = SEARCH_DEFAULT_LIMIT):
+    """
+    Async counterpart of crud.search_properties().
+    """
+    return await search_rows("Properties", q, limit)
+
+
+async def update_property(propertyID: int, property_data: dict):
+    """
+    Updates a property record identified by propertyID.
+    Expects property_data with keys: address, city, state, zipCode, propertyValue.
+    Returns the number of matching rows, so 0 means no record has that propertyID.
+    """
+    query = QUERIES["update_property"]
+    property_data["propertyID"] = propertyID
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await cursor.execute(query, property_data)
+        matched = cursor.rowcount
+        if matched:
+            await index_row(cursor, "Properties", propertyID, property_data)
+            await log_change(cursor, "Properties", "update", {"propertyID": propertyID})
+        await connection.commit()
+        invalidate("Properties", propertyID)
+        await cursor.close()
+        return matched
+
+
+async def patch_property(propertyID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a property record.
+    Returns the full updated record, or None if no record has that propertyID.
+    """
+    return await patch_row("Properties", propertyID, changes)
+
+
+async def delete_property(propertyID: int):
+    """
+    Deletes a property record by propertyID.
+    """
+    query = QUERIES["delete_property"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await cursor.execute(query, {"propertyID": propertyID})
+        if cursor.rowcount:
+            await unindex_row(cursor, "Properties", propertyID)
+            await log_change(cursor, "Properties", "delete", {"propertyID": propertyID})
+        await connection.commit()
+        invalidate("Properties", propertyID)
+        await cursor.close()
+
+
+# Units CRUD
+
+async def create_unit(unit_data: dict):
+    """
+    Inserts a new unit into the Units table.
+    Expects unit_data with keys: propertyID, unitNumber, unitType, status.
+    """
+    query = QUERIES["create_unit"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, unit_data)
+        unitID = cursor.lastrowid
+        await count_unit(cursor, unitID, 1)
+        await log_change(cursor, "Units", "insert", {"unitID": unitID})
+        await connection.commit()
+        await cursor.close()
+        return unitID
+
+
+async def create_units(units_data: List[dict]):
+    """
+    Inserts many units into the Units table in a single transaction, using
+    batched multi-row INSERTs. Returns the generated unitIDs in input order.
+    """
+    columns = ["propertyID", "unitNumber", "unitType", "status"]
+    async with async_pooled_connection() as connection:
+        unitIDs = await bulk_insert(connection, "Units", columns, units_data)
+        await count_rows(connection, "count_unit", "unitID", unitIDs)
+        await log_changes(connection, "Units", "insert", [{"unitID": unitID} for unitID in unitIDs])
+        await connection.commit()
+        return unitIDs
+
+
+@cached("Units")
+async def get_unit(unitID: int):
+    """
+    Returns a single unit record by unitID.
+    """
+    query = QUERIES["get_unit"]
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, {"unitID": unitID})
+        result = await cursor.fetchone()
+        await cursor.close()
+        return result
+
+
+async def get_units(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                    sort: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of unit records ordered by `sort` (default unitID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `since` lists only what changed after a sync token (see crud.get_changed_rows()).
+    """
+    if since is not None:
+        return await get_changed_rows("Units", QUERIES["get_changed_units"], ["unitID"], limit, after, filters, sort, since)
+    query, params, order = page_query(QUERIES["get_units"], ["unitID"], after, limit, filters=filters, sort=sort, **LISTINGS["Units"])
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, params)
+        results = await cursor.fetchall()
+        await cursor.close()
+        return make_page(results, order, limit)
+
+
+async def update_unit(unitID: int, unit_data: dict):
+    """
+    Updates a unit record identified by unitID.
+    Expects unit_data with keys: propertyID, unitNumber, unitType, status.
+    Returns the number of matching rows, so 0 means no record has that unitID.
+    """
+    query = QUERIES["update_unit"]
+    unit_data["unitID"] = unitID
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await count_unit(cursor, unitID, -1, unit_data)
+        await cursor.execute(query, unit_data)
+        matched = cursor.rowcount
+        await count_unit(cursor, unitID, 1, unit_data)
+        if matched:
+            await log_change(cursor, "Units", "update", {"unitID": unitID})
+        await connection.commit()
+        invalidate("Units", unitID)
+        await cursor.close()
+        return matched
+
+
+async def patch_unit(unitID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a unit record.
+    Returns the full updated record, or None if no record has that unitID.
+    """
+    return await patch_row("Units", unitID, changes)
+
+
+async def delete_unit(unitID: int):
+    """
+    Deletes a unit record by unitID.
+    """
+    query = QUERIES["delete_unit"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        links = await get_links(connection, "get_unit_links", {"unitID": unitID})
+        cursor = await connection.cursor()
+        await count_unit(cursor, unitID, -1)
+        await cursor.execute(query, {"unitID": unitID})
+        if cursor.rowcount:
+            await log_change(cursor, "Units", "delete", {"unitID": unitID})
+            await log_changes(connection, "UnitMaintenanceRequests", "delete", links)
+        await connection.commit()
+        invalidate("Units", unitID)
+        invalidate_links(links)
+        await cursor.close()
+
+
+# Maintenance Request CRUD
+
+async def create_maintenance_request(mr_data: dict):
+    """
+    Inserts a new maintenance request into the MaintenanceRequests table.
+    Expects mr_data with keys: description, status, submissionDate, completionDate.
+    With GROUP_COMMIT on, the insert is committed together with concurrent ones.
+    """
+    if GROUP_COMMIT and not in_transaction():
+        return await coalescers["MaintenanceRequests"].insert(mr_data)
+    query = QUERIES["create_maintenance_request"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, mr_data)
+        requestID = cursor.lastrowid
+        await log_change(cursor, "MaintenanceRequests", "insert", {"requestID": requestID})
+        await connection.commit()
+        await cursor.close()
+        return requestID
+
+
+@cached("MaintenanceRequests")
+async def get_maintenance_request(requestID: int):
+    """
+    Returns a single maintenance request record by requestID.
+    """
+    query = QUERIES["get_maintenance_request"]
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, {"requestID": requestID})
+        result = await cursor.fetchone()
+        await cursor.close()
+        return result
+
+
+async def get_maintenance_requests(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                                   sort: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of maintenance request records ordered by `sort` (default requestID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `since` lists only what changed after a sync token (see crud.get_changed_rows()).
+    """
+    if since is not None:
+        return await get_changed_rows("MaintenanceRequests", QUERIES["get_changed_maintenance_requests"], ["requestID"], limit, after, filters, sort, since)
+    query, params, order = page_query(QUERIES["get_maintenance_requests"], ["requestID"], after, limit, filters=filters, sort=sort, **LISTINGS["MaintenanceRequests"])
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, params)
+        results = await cursor.fetchall()
+        await cursor.close()
+        return make_page(results, order, limit)
+
+
+async def update_maintenance_request(requestID: int, mr_data: dict):
+    """
+    Updates a maintenance request record identified by requestID.
+    Expects mr_data with keys: description, status, submissionDate, completionDate.
+    Returns the number of matching rows, so 0 means no record has that requestID.
+    """
+    query = QUERIES["update_maintenance_request"]
+    mr_data["requestID"] = requestID
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await cursor.execute(query, mr_data)
+        matched = cursor.rowcount
+        if matched:
+            await log_change(cursor, "MaintenanceRequests", "update", {"requestID": requestID})
+        await connection.commit()
+        invalidate("MaintenanceRequests", requestID)
+        await cursor.close()
+        return matched
+
+
+async def patch_maintenance_request(requestID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a maintenance request record.
+    Returns the full updated record, or None if no record has that requestID.
+    """
+    return await patch_row("MaintenanceRequests", requestID, changes)
+
+
+async def delete_maintenance_request(requestID: int):
+    """
+    Deletes a maintenance request record by requestID.
+    """
+    query = QUERIES["delete_maintenance_request"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        links = await get_links(connection, "get_request_links", {"requestID": requestID})
+        cursor = await connection.cursor()
+        await cursor.execute(query, {"requestID": requestID})
+        if cursor.rowcount:
+            await log_change(cursor, "MaintenanceRequests", "delete", {"requestID": requestID})
+            await log_changes(connection, "UnitMaintenanceRequests", "delete", links)
+        await connection.commit()
+        invalidate("MaintenanceRequests", requestID)
+        invalidate_links(links)
+        await cursor.close()
+
+
+# Leases CRUD
+
+async def create_lease(lease_data: dict):
+    """
+    Inserts a new lease into the Leases table.
+    Expects lease_data with keys: unitID, tenantID, startDate, endDate, rentPrice.
+    """
+    query = QUERIES["create_lease"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, lease_data)
+        leaseID = cursor.lastrowid
+        await count_lease(cursor, leaseID, 1)
+        await log_change(cursor, "Leases", "insert", {"leaseID": leaseID})
+        await connection.commit()
+        await cursor.close()
+        return leaseID
+
+
+async def create_leases(leases_data: List[dict]):
+    """
+    Inserts many leases into the Leases table in a single transaction, using
+    batched multi-row INSERTs. Returns the generated leaseIDs in input order.
+    """
+    columns = ["unitID", "tenantID", "startDate", "endDate", "rentPrice"]
+    async with async_pooled_connection() as connection:
+        leaseIDs = await bulk_insert(connection, "Leases", columns, leases_data)
+        await count_rows(connection, "count_lease", "leaseID", leaseIDs)
+        await log_changes(connection, "Leases", "insert", [{"leaseID": leaseID} for leaseID in leaseIDs])
+        await connection.commit()
+        return leaseIDs
+
+
+@cached("Leases")
+async def get_lease(leaseID: int):
+    """
+    Returns a single lease record by leaseID.
+    """
+    query = QUERIES["get_lease"]
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, {"leaseID": leaseID})
+        result = await cursor.fetchone()
+        await cursor.close()
+        return result
+
+
+async def get_leases(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                     sort: Optional[str] = None, expand: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of lease records ordered by `sort` (default leaseID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `expand` nests related records, e.g. "tenant,unit,unit.property" (see RELATIONS).
+    `since` lists only what changed after a sync token (see crud.get_changed_rows()).
+    """
+    relations = parse_expand("Leases", expand)
+    if since is not None:
+        return await get_changed_rows("Leases", QUERIES["get_changed_leases"], ["leaseID"], limit, after, filters, sort, since, relations)
+    query, params, order = page_query(QUERIES["get_leases"], ["leaseID"], after, limit, filters=filters, sort=sort, **LISTINGS["Leases"])
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, params)
+        results = await cursor.fetchall()
+        await cursor.close()
+        page = make_page(results, order, limit)
+        await expand_rows(connection, "Leases", page["items"], relations)
+        return page
+
+
+async def update_lease(leaseID: int, lease_data: dict):
+    """
+    Updates a lease record identified by leaseID.
+    Expects lease_data with keys: unitID, tenantID, startDate, endDate, rentPrice.
+    Returns the number of matching rows, so 0 means no record has that leaseID.
+    """
+    query = QUERIES["update_lease"]
+    lease_data["leaseID"] = leaseID
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await count_lease(cursor, leaseID, -1)
+        await cursor.execute(query, lease_data)
+        matched = cursor.rowcount
+        await count_lease(cursor, leaseID, 1)
+        if matched:
+            await log_change(cursor, "Leases", "update", {"leaseID": leaseID})
+        await connection.commit()
+        invalidate("Leases", leaseID)
+        await cursor.close()
+        return matched
+
+
+async def patch_lease(leaseID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a lease record.
+    Returns the full updated record, or None if no record has that leaseID.
+    """
+    return await patch_row("Leases", leaseID, changes)
+
+
+async def delete_lease(leaseID: int):
+    """
+    Deletes a lease record by leaseID.
+    """
+    query = QUERIES["delete_lease"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await count_lease(cursor, leaseID, -1)
+        await cursor.execute(query, {"leaseID": leaseID})
+        if cursor.rowcount:
+            await log_change(cursor, "Leases", "delete", {"leaseID": leaseID})
+        await connection.commit()
+        invalidate("Leases", leaseID)
+        await cursor.close()
+
+
+# Payments CRUD
+
+async def create_payment(payment_data: dict):
+    """
+    Inserts a new payment into the Payments table.
+    Expects payment_data with keys: tenantID, leaseID, amount, paymentDate, paymentMethod.
+    With GROUP_COMMIT on, the insert is committed together with concurrent ones.
+    """
+    if GROUP_COMMIT and not in_transaction():
+        return await coalescers["Payments"].insert(payment_data)
+    query = QUERIES["create_payment"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, payment_data)
+        paymentID = cursor.lastrowid
+        await log_change(cursor, "Payments", "insert", {"paymentID": paymentID})
+        await connection.commit()
+        await cursor.close()
+        return paymentID
+
+
+async def create_payments(payments_data: List[dict]):
+    """
+    Inserts many payments into the Payments table in a single transaction, using
+    batched multi-row INSERTs. Returns the generated paymentIDs in input order.
+    """
+    columns = ["tenantID", "leaseID", "amount", "paymentDate", "paymentMethod"]
+    async with async_pooled_connection() as connection:
+        paymentIDs = await bulk_insert(connection, "Payments", columns, payments_data)
+        await log_changes(connection, "Payments", "insert", [{"paymentID": paymentID} for paymentID in paymentIDs])
+        await connection.commit()
+        return paymentIDs
+
+
+@cached("Payments")
+async def get_payment(paymentID: int):
+    """
+    Returns a single payment record by paymentID.
+    """
+    query = QUERIES["get_payment"]
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, {"paymentID": paymentID})
+        result = await cursor.fetchone()
+        await cursor.close()
+        return result
+
+
+async def get_payments(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                       sort: Optional[str] = None, expand: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of payment records ordered by `sort` (default paymentID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `expand` nests related records, e.g. "tenant,lease,lease.unit" (see RELATIONS).
+    `since` lists only what changed after a sync token (see crud.get_changed_rows()).
+    """
+    relations = parse_expand("Payments", expand)
+    if since is not None:
+        return await get_changed_rows("Payments", QUERIES["get_changed_payments"], ["paymentID"], limit, after, filters, sort, since, relations)
+    query, params, order = page_query(QUERIES["get_payments"], ["paymentID"], after, limit, filters=filters, sort=sort, **LISTINGS["Payments"])
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, params)
+        results = await cursor.fetchall()
+        await cursor.close()
+        page = make_page(results, order, limit)
+        await expand_rows(connection, "Payments", page["items"], relations)
+        return page
+
+
+async def update_payment(paymentID: int, payment_data: dict):
+    """
+    Updates a payment record identified by paymentID.
+    Expects payment_data with keys: tenantID, leaseID, amount, paymentDate, paymentMethod.
+    Returns the number of matching rows, so 0 means no record has that paymentID.
+    """
+    query = QUERIES["update_payment"]
+    payment_data["paymentID"] = paymentID
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await cursor.execute(query, payment_data)
+        matched = cursor.rowcount
+        if matched:
+            await log_change(cursor, "Payments", "update", {"paymentID": paymentID})
+        await connection.commit()
+        invalidate("Payments", paymentID)
+        await cursor.close()
+        return matched
+
+
+async def patch_payment(paymentID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a payment record.
+    Returns the full updated record, or None if no record has that paymentID.
+    """
+    return await patch_row("Payments", paymentID, changes)
+
+
+async def delete_payment(paymentID: int):
+    """
+    Deletes a payment record by paymentID.
+    """
+    query = QUERIES["delete_payment"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await cursor.execute(query, {"paymentID": paymentID})
+        if cursor.rowcount:
+            await log_change(cursor, "Payments", "delete", {"paymentID": paymentID})
+        await connection.commit()
+        invalidate("Payments", paymentID)
+        await cursor.close()
+
+
+# Unit Maintenance Request CRUD
+
+async def create_unit_maintenance_request(umr_data: dict):
+    """
+    Inserts a new association in the UnitMaintenanceRequests table.
+    Expects umr_data with keys: unitID, requestID.
+    """
+    query = QUERIES["create_unit_maintenance_request"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await cursor.execute(query, umr_data)
+        await log_change(cursor, "UnitMaintenanceRequests", "insert",
+                         {"unitID": umr_data["unitID"], "requestID": umr_data["requestID"]})
+        await connection.commit()
+        await cursor.close()
+
+
+async def create_unit_maintenance_requests(umr_data: List[dict]):
+    """
+    Inserts many associations into the UnitMaintenanceRequests table in a
+    single transaction, using batched multi-row INSERTs.
+    """
+    columns = ["unitID", "requestID"]
+    async with async_pooled_connection() as connection:
+        await bulk_insert(connection, "UnitMaintenanceRequests", columns, umr_data, returns_ids=False)
+        await log_changes(connection, "UnitMaintenanceRequests", "insert",
+                          [{"unitID": row["unitID"], "requestID": row["requestID"]} for row in umr_data])
+        await connection.commit()
+
+
+@cached("UnitMaintenanceRequests")
+async def get_unit_maintenance_request(unitID: int, requestID: int):
+    """
+    Returns a specific UnitMaintenanceRequests record based on unitID and requestID.
+    """
+    query = QUERIES["get_unit_maintenance_request"]
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, {"unitID": unitID, "requestID": requestID})
+        result = await cursor.fetchone()
+        await cursor.close()
+        return result
+
+
+async def get_unit_maintenance_requests(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                                        filters: Optional[dict] = None, sort: Optional[str] = None,
+                                        expand: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of UnitMaintenanceRequests records ordered by unitID and
+    requestID, narrowed by `filters` and starting after the `after` cursor.
+    Accepted filters are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `expand` nests related records, e.g. "unit,request" (see RELATIONS).
+    `since` lists only what changed after a sync token (see crud.get_changed_rows()).
+    """
+    relations = parse_expand("UnitMaintenanceRequests", expand)
+    if since is not None:
+        return await get_changed_rows("UnitMaintenanceRequests", QUERIES["get_changed_unit_maintenance_requests"], ["unitID", "requestID"], limit, after, filters, sort, since, relations)
+    query, params, order = page_query(QUERIES["get_unit_maintenance_requests"], ["unitID", "requestID"], after, limit, filters=filters, sort=sort, **LISTINGS["UnitMaintenanceRequests"])
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, params)
+        results = await cursor.fetchall()
+        await cursor.close()
+        page = make_page(results, order, limit)
+        await expand_rows(connection, "UnitMaintenanceRequests", page["items"], relations)
+        return page
+
+
+async def delete_unit_maintenance_request(unitID: int, requestID: int):
+    """
+    Deletes a record from UnitMaintenanceRequests based on unitID and requestID.
+    """
+    query = QUERIES["delete_unit_maintenance_request"]
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        await cursor.execute(query, {"unitID": unitID, "requestID": requestID})
+        if cursor.rowcount:
+            await log_change(cursor, "UnitMaintenanceRequests", "delete", {"unitID": unitID, "requestID": requestID})
+        await connection.commit()
+        invalidate("UnitMaintenanceRequests", unitID, requestID)
+        await cursor.close()
+
+
+# Property summaries
+
+async def count_unit(cursor, unitID: int, sign: int, columns=()):
+    """
+    Async counterpart of crud.count_unit().
+    """
+    await cursor.execute(QUERIES["count_unit"], {"unitID": unitID, "sign": sign})
+    if "propertyID" in columns:
+        await cursor.execute(QUERIES["count_unit_leases"], {"unitID": unitID, "sign": sign})
+
+
+async def count_lease(cursor, leaseID: int, sign: int, columns=()):
+    """
+    Async counterpart of crud.count_lease().
+    """
+    await cursor.execute(QUERIES["count_lease"], {"leaseID": leaseID, "sign": sign})
+
+
+SUMMARY_COUNTERS = {"Units": count_unit, "Leases": count_lease}
+
+
+async def count_rows(connection, name: str, key_column: str, keys: List[int]):
+    """
+    Async counterpart of crud.count_rows().
+    """
+    cursor = await connection.cursor()
+    await cursor.executemany(QUERIES[name], [{key_column: key, "sign": 1} for key in keys])
+    await cursor.close()
+
+
+async def get_property_summary(propertyID: int):
+    """
+    Async counterpart of crud.get_property_summary().
+    """
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(QUERIES["get_property_unit_counts"], {"propertyID": propertyID})
+        unit_counts = await cursor.fetchall()
+        if not unit_counts:
+            await cursor.close()
+            return None
+        await cursor.execute(QUERIES["get_property_lease_totals"], {"propertyID": propertyID, "today": date.today()})
+        lease_totals = await cursor.fetchone()
+        await cursor.close()
+        return {"propertyID": propertyID, **make_summary(unit_counts, lease_totals)}
+
+
+async def get_portfolio_summary():
+    """
+    Async counterpart of crud.get_portfolio_summary().
+    """
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(QUERIES["get_unit_counts"])
+        unit_counts = await cursor.fetchall()
+        await cursor.execute(QUERIES["get_lease_totals"], {"today": date.today()})
+        lease_totals = await cursor.fetchone()
+        await cursor.close()
+        return {"propertyID": None, **make_summary(unit_counts, lease_totals)}
+
+
+async def recount_property_summaries():
+    """
+    Async counterpart of crud.recount_property_summaries().
+    """
+    async with async_pooled_connection() as connection:
+        await connection.begin()
+        cursor = await connection.cursor()
+        for statement, params in REBUILD_SUMMARY_STATEMENTS:
+            await cursor.execute(statement, params)
+        await connection.commit()
+        await cursor.close()
+
+
+# Change log
+
+async def log_change(cursor, table: str, operation: str, key: dict):
+    """
+    Async counterpart of crud.log_change().
+    """
+    change = {"tableName": table, "operation": operation, "rowKey": dumps(key).decode()}
+    await cursor.execute(QUERIES["log_change"], change)
+    if operation == "delete":
+        await cursor.execute(QUERIES["add_tombstone"], change)
+
+
+async def log_changes(connection, table: str, operation: str, keys: List[dict]):
+    """
+    Async counterpart of crud.log_changes().
+    """
+    if not keys:
+        return
+    changes = [{"tableName": table, "operation": operation, "rowKey": dumps(key).decode()} for key in keys]
+    cursor = await connection.cursor()
+    await cursor.executemany(QUERIES["log_change"], changes)
+    if operation == "delete":
+        await cursor.executemany(QUERIES["add_tombstone"], changes)
+    await cursor.close()
+
+
+async def get_links(connection, query: str, params: dict) -> List[dict]:
+    """
+    Async counterpart of crud.get_links().
+    """
+    cursor = await connection.cursor(DictCursor)
+    await cursor.execute(QUERIES[query], params)
+    links = await cursor.fetchall()
+    await cursor.close()
+    return links
+
+
+async def get_changes(after: int, limit: int):
+    """
+    Async counterpart of crud.get_changes().
+    """
+    async with async_pooled_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(QUERIES["get_changes"], {"after": after, "limit": limit})
+        results = await cursor.fetchall()
+        await cursor.close()
+        return results
+
+
+async def get_change_bounds():
+    """
+    Async counterpart of crud.get_change_bounds().
+    """
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(QUERIES["get_change_bounds"])
+        result = await cursor.fetchone()
+        await cursor.execute("SELECT @@auto_increment_increment AS increment")
+        result["increment"] = (await cursor.fetchone())["increment"]
+        await cursor.close()
+        return result
+
+
+async def get_open_transactions():
+    """
+    Async counterpart of crud.get_open_transactions().
+    """
+    async with async_pooled_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        try:
+            await cursor.execute(OPEN_TRANSACTIONS)
+            return {row["trx_id"] for row in await cursor.fetchall()}
+        except (pymysql.err.OperationalError, pymysql.err.ProgrammingError):
+            return None
+        finally:
+            await cursor.close()
+
+
+async def prune_changes(through: int):
+    """
+    Async counterpart of crud.prune_changes().
+    """
+    async with async_pooled_connection() as connection:
+        cursor = await connection.cursor()
+        await cursor.execute(QUERIES["prune_changes"], {"through": through})
+        await cursor.close()
+
+
+# Delta sync
+
+async def get_changed_rows(table: str, select: str, key_columns: List[str], limit: int, after: Optional[str],
+                           filters: Optional[dict], sort: Optional[str], since: str, relations: Optional[dict] = None):
+    """
+    Async counterpart of crud.get_changed_rows().
+    """
+    position = tombstone_position(after)
+    query, params, order, changed_after = delta_query(
+        select, key_columns, None if position else after, limit, filters, sort, since)
+    async with async_pooled_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(QUERIES["get_sync_time"])
+        synced_at = (await cursor.fetchone())["now"]
+        check_sync_age(changed_after, synced_at)
+        if tombstones_due():
+            for sync_table in SYNC_TABLES:
+                await cursor.execute(QUERIES["prune_tombstones"],
+                                     {"tableName": sync_table, "before": tombstone_horizon(synced_at)})
+        if position is None:
+            await cursor.execute(query, params)
+            page = make_delta_page(await cursor.fetchall(), order, limit)
+            if page["nextCursor"] is None:
+                if changed_after is None:
+                    page["syncToken"] = sync_token(synced_at)
+                else:
+                    position = [changed_after, "", synced_at]
+                    if len(page["items"]) == limit:
+                        page["nextCursor"] = encode_cursor(TOMBSTONE_CURSOR, position)
+                        position = None
+        else:
+            page = make_delta_page([], order, limit)
+        if position is not None:
+            await get_deletions(cursor, table, key_columns, position, limit - len(page["items"]), page)
+        await cursor.close()
+        await expand_rows(connection, table, page["items"], relations)
+        return page
+
+
+async def get_deletions(cursor, table: str, key_columns: List[str], position: list, limit: int, page: dict):
+    """
+    Async counterpart of crud.get_deletions().
+    """
+    query, params, order = tombstone_query(table, position, limit)
+    await cursor.execute(query, params)
+    rows = await cursor.fetchall()
+    keys = [tuple(json.loads(row["rowKey"])[column] for column in key_columns) for row in rows[:limit]]
+    rewritten = {}
+    if keys:
+        await cursor.execute(rewritten_query(table, key_columns, len(keys)), [value for key in keys for value in key])
+        rewritten = {tuple(row[column] for column in key_columns): row["updatedAt"] for row in await cursor.fetchall()}
+    add_deletions(page, rows, order, limit, keys, rewritten, position[2])
+
+
+# Search
+
+async def index_row(cursor, table: str, key: int, row: dict):
+    """
+    Async counterpart of crud.index_row().
+    """
+    await cursor.execute(QUERIES["delete_search_terms"], {"tableName": table, "rowID": key})
+    terms = search_terms(table, key, row)
+    if terms:
+        await cursor.executemany(QUERIES["add_search_term"], terms)
+
+
+async def unindex_row(cursor, table: str, key: int):
+    """
+    Async counterpart of crud.unindex_row().
+    """
+    await cursor.execute(QUERIES["delete_search_terms"], {"tableName": table, "rowID": key})
+
+
+async def index_rows(connection, table: str, keys: List[int], rows: List[dict]):
+    """
+    Async counterpart of crud.index_rows().
+    """
+    terms = [term for key, row in zip(keys, rows) for term in search_terms(table, key, row)]
+    if terms:
+        cursor = await connection.cursor()
+        await cursor.executemany(QUERIES["add_search_term"], terms)
+        await cursor.close()
+
+
+async def search_rows(table: str, q: str, limit: int) -> dict:
+    """
+    Async counterpart of crud.search_rows().
+    """
+    words = query_words(q)
+    if not words:
+        return {"items": []}
+    query, params = search_query(table, words, limit)
+    async with async_read_connection() as connection:
+        cursor = await connection.cursor(DictCursor)
+        await cursor.execute(query, params)
+        results = await cursor.fetchall()
+        await cursor.close()
+    for row in results:
+        row["score"] = int(row["score"])
+    return {"items": results}
+
+
+# Relation expansion
+
+async def expand_rows(connection, table: str, rows: list, tree: dict):
+    """
+    Async counterpart of crud.expand_rows().
+    """
+    if not rows or not tree:
+        return
+    cursor = await connection.cursor(DictCursor)
+    for name, ids in expansion_ids(table, rows, tree).items():
+        target = RELATIONS[table][name][1]
+        key_column = TABLES[target][0]
+        related = {}
+        for start in range(0, len(ids), EXPAND_BATCH_SIZE):
+            batch = ids[start:start + EXPAND_BATCH_SIZE]
+            await cursor.execute(by_id_query(target, len(batch)), batch)
+            related.update((row[key_column], row) for row in await cursor.fetchall())
+        await expand_rows(connection, target, list(related.values()), tree[name])
+        attach_related(table, rows, name, related)
+    await cursor.close()
+
+
+# Bulk inserts
+
+async def bulk_insert(connection, table: str, columns: List[str], rows: List[dict], returns_ids=True):
+    """
+    Async counterpart of crud.bulk_insert(). The async pool runs in autocommit
+    mode, so this explicitly begins the transaction the caller then commits.
+    """
+    await connection.begin()
+    cursor = await connection.cursor(DictCursor)
+    increment = 1
+    if returns_ids:
+        await cursor.execute("SELECT @@auto_increment_increment AS increment")
+        increment = (await cursor.fetchone())["increment"]
+    ids = []
+    for query, params, count in bulk_insert_batches(table, columns, rows):
+        await cursor.execute(query, params)
+        if returns_ids:
+            ids.extend(auto_increment_ids(cursor.lastrowid, count, increment))
+    await cursor.close()
+    return ids if returns_ids else None
+
+
+# Group commit
+
+class InsertBatch:
+    def __init__(self):
+        self.items = []  # (row, asyncio.Future)
+        self.full = asyncio.Event()
+        self.task = None
+
+
+async def insert_rows_each(connection, query: str, rows: List[dict]) -> list:
+    """
+    Async counterpart of crud.insert_rows_each().
+    """
+    results = []
+    cursor = await connection.cursor(DictCursor)
+    for row in rows:
+        try:
+            await cursor.execute(query, row)
+        except BACKEND.statement_errors as e:
+            results.append(e)
+        else:
+            results.append(cursor.lastrowid)
+    await cursor.close()
+    return results
+
+
+async def insert_rows_together(connection, table: str, query: str, rows: List[dict]) -> list:
+    """
+    Async counterpart of crud.insert_rows_together().
+    """
+    try:
+        return await bulk_insert(connection, table, TABLES[table][1], rows)
+    except BACKEND.statement_errors:
+        await connection.rollback()
+        await connection.begin()
+        return await insert_rows_each(connection, query, rows)
+
+
+class InsertCoalescer:
+    """
+    Async counterpart of crud.InsertCoalescer. Everything runs on the event
+    loop, so no lock is needed around the open batch.
+    """
+
+    def __init__(self, table: str, query: str, window=GROUP_COMMIT_WINDOW_SECONDS, max_batch=GROUP_COMMIT_MAX_BATCH):
+        self.table = table
+        self.query = query
+        self.window = window
+        self.max_batch = max_batch
+        self._batch = None
+
+    async def insert(self, row: dict):
+        pin_to_primary()
+        future = asyncio.get_running_loop().create_future()
+        batch = self._batch
+        if batch is None:
+            batch = self._batch = InsertBatch()
+            # A task rather than the first caller commits the batch, so the
+            # batch is still written if that caller's request is cancelled.
+            batch.task = asyncio.ensure_future(self.commit_when_ready(batch))
+        batch.items.append((row, future))
+        if len(batch.items) >= self.max_batch:
+            self._batch = None
+            batch.full.set()
+        return await future
+
+    async def commit_when_ready(self, batch: InsertBatch):
+        try:
+            await asyncio.wait_for(batch.full.wait(), self.window)
+        except asyncio.TimeoutError:
+            pass
+        if self._batch is batch:
+            self._batch = None
+        await self.flush(batch.items)
+
+    async def flush(self, items: list):
+        rows = [row for row, _ in items]
+        try:
+            async with async_pooled_connection() as connection:
+                results = await insert_rows_together(connection, self.table, self.query, rows)
+                key_column = TABLES[self.table][0]
+                await log_changes(connection, self.table, "insert",
+                                  [{key_column: key} for key in results if not isinstance(key, Exception)])
+                await connection.commit()
+        except Exception as e:
+            results = [e] * len(items)
+        for (_, future), result in zip(items, results):
+            if future.done():  # the caller was cancelled
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+coalescers = {
+    "Payments": InsertCoalescer("Payments", QUERIES["create_payment"]),
+    "MaintenanceRequests": InsertCoalescer("MaintenanceRequests", QUERIES["create_maintenance_request"]),
+}
+
+
+# Imports
+
+async def import_rows(table: str, rows: List[dict]) -> list:
+    """
+    Async counterpart of crud.import_rows().
+    """
+    key_column = TABLES[table][0]
+    async with async_pooled_connection() as connection:
+        results = await insert_rows_together(connection, table, IMPORT_QUERIES[table], rows)
+        keys = [key for key in results if not isinstance(key, Exception)]
+        if table in IMPORT_COUNTERS:
+            await count_rows(connection, IMPORT_COUNTERS[table], key_column, keys)
+        if table in SEARCH_KEYS:
+            imported = [row for row, result in zip(rows, results) if not isinstance(result, Exception)]
+            await index_rows(connection, table, keys, imported)
+        await log_changes(connection, table, "insert", [{key_column: key} for key in keys])
+        await connection.commit()
+        return results
+
+
+# Streaming exports
+
+async def iter_rows(resource: str):
+    """
+    Async counterpart of crud.iter_rows(). A connection abandoned mid-result is
+    closed before it goes back to the pool so it is never reused with an
+    unread result pending.
+    """
+    query = EXPORT_QUERIES[resource]
+    async with async_read_connection() as connection:
+        finished = False
+        try:
+            cursor = await connection.cursor(SSDictCursor)
+            await cursor.execute("SET SESSION net_write_timeout = %s", (EXPORT_NET_WRITE_TIMEOUT,))
+            await cursor.execute(query)
+            while True:
+                row = await cursor.fetchone()
+                if row is None:
+                    break
+                yield row
+            await cursor.close()
+            finished = True
+        finally:
+            if not finished:
+                connection.close()
@@ -0,0 +1,593 @@
+# async_routes.py
+# async def versions of the routes in main.py, backed by async_crud.py.
+# main.py mounts this router instead of its own when db.DB_MODE is "async".
+from datetime import date
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import async_crud
+import crud
+from batch import BatchError, arun_batch
+from imports import IMPORTS, ImportFormat, InvalidImport, run_import
+from models import Tenant, TenantOut, Property, PropertyOut, Unit, UnitOut, MaintenanceRequest, MaintenanceRequestOut, \
+    Lease, LeaseOut, Payment, PaymentOut, UnitMaintenanceRequest, TenantPage, PropertyPage, UnitPage, \
+    MaintenanceRequestPage, LeasePage, PaymentPage, UnitMaintenanceRequestPage, TenantPatch, PropertyPatch, UnitPatch, \
+    MaintenanceRequestPatch, LeasePatch, PaymentPatch, PropertySummary, ImportResult, BatchRequest, BatchResult, \
+    TenantSearchResult, PropertySearchResult
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, ExpiredSyncToken, InvalidListQuery
+from search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, SEARCH_QUERY_DESCRIPTION
+from serialization import rows_response
+from streaming import MEDIA_TYPES, ExportFormat, aencode_rows
+
+router = APIRouter()
+
+
+@router.post("/tenants", response_model=TenantOut)
+async def create_tenant(tenant: Tenant):
+    try:
+        tenantID = await async_crud.create_tenant(tenant.dict())
+        return {**tenant.dict(), "tenantID": tenantID}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/tenants/bulk", response_model=List[TenantOut])
+async def create_tenants(tenants: List[Tenant]):
+    try:
+        rows = [tenant.dict() for tenant in tenants]
+        tenantIDs = await async_crud.create_tenants(rows)
+        return [{**row, "tenantID": tenantID} for row, tenantID in zip(rows, tenantIDs)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/tenants/search", response_model=TenantSearchResult)
+async def search_tenants(q: str = Query(..., min_length=1, description=SEARCH_QUERY_DESCRIPTION),
+                         limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT)):
+    return rows_response(await async_crud.search_tenants(q, limit))
+
+
+@router.get("/tenants/{tenantID}", response_model=TenantOut)
+async def read_tenant(tenantID: int):
+    tenant = await async_crud.get_tenant(tenantID)
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    return rows_response(tenant)
+
+
+@router.get("/tenants", response_model=TenantPage, response_model_exclude_unset=True)
+async def read_tenants(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                       after: Optional[str] = None,
+                       since: Optional[str] = None):
+    try:
+        return rows_response(await async_crud.get_tenants(limit, after, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.put("/tenants/{tenantID}", response_model=TenantOut)
+async def update_tenant(tenantID: int, tenant: Tenant):
+    try:
+        if not await async_crud.update_tenant(tenantID, tenant.dict()):
+            raise HTTPException(status_code=404, detail="Tenant not found")
+        return {**tenant.dict(), "tenantID": tenantID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/tenants/{tenantID}", response_model=TenantOut)
+async def patch_tenant(tenantID: int, tenant: TenantPatch):
+    try:
+        updated = await async_crud.patch_tenant(tenantID, tenant.dict(exclude_unset=True))
+        if not updated:
+            raise HTTPException(status_code=404, detail="Tenant not found")
+        return updated
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/tenants/{tenantID}")
+async def delete_tenant(tenantID: int):
+    try:
+        await async_crud.delete_tenant(tenantID)
+        return {"detail": "Tenant deleted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------------------------
+# PROPERTIES ENDPOINTS
+# ------------------------------
+
+@router.post("/properties", response_model=PropertyOut)
+async def create_property(property: Property):
+    try:
+        propertyID = await async_crud.create_property(property.dict())
+        return {**property.dict(), "propertyID": propertyID}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/properties/search", response_model=PropertySearchResult)
+async def search_properties(q: str = Query(..., min_length=1, description=SEARCH_QUERY_DESCRIPTION),
+                            limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT)):
+    return rows_response(await async_crud.search_properties(q, limit))
+
+
+@router.get("/properties/summary", response_model=PropertySummary)
+async def read_portfolio_summary():
+    return rows_response(await async_crud.get_portfolio_summary())
+
+
+@router.get("/properties/{propertyID}/summary", response_model=PropertySummary)
+async def read_property_summary(propertyID: int):
+    summary = await async_crud.get_property_summary(propertyID)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return rows_response(summary)
+
+
+@router.post("/admin/property-summaries/recount")
+async def recount_property_summaries():
+    try:
+        await async_crud.recount_property_summaries()
+        return {"detail": "Property summaries recounted"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/properties/{propertyID}", response_model=PropertyOut)
+async def read_property(propertyID: int):
+    property_obj = await async_crud.get_property(propertyID)
+    if not property_obj:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return rows_response(property_obj)
+
+
+@router.get("/properties", response_model=PropertyPage, response_model_exclude_unset=True)
+async def read_properties(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                          after: Optional[str] = None,
+                          city: Optional[str] = None,
+                          since: Optional[str] = None):
+    try:
+        return rows_response(await async_crud.get_properties(limit, after, {"city": city}, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.put("/properties/{propertyID}", response_model=PropertyOut)
+async def update_property(propertyID: int, property: Property):
+    try:
+        if not await async_crud.update_property(propertyID, property.dict()):
+            raise HTTPException(status_code=404, detail="Property not found")
+        return {**property.dict(), "propertyID": propertyID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/properties/{propertyID}", response_model=PropertyOut)
+async def patch_property(propertyID: int, property: PropertyPatch):
+    try:
+        updated = await async_crud.patch_property(propertyID, property.dict(exclude_unset=True))
+        if not updated:
+            raise HTTPException(status_code=404, detail="Property not found")
+        return updated
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/properties/{propertyID}")
+async def delete_property(propertyID: int):
+    try:
+        await async_crud.delete_property(propertyID)
+        return {"detail": "Property deleted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/units", response_model=UnitOut)
+async def create_unit(unit: Unit):
+    try:
+        unitID = await async_crud.create_unit(unit.dict())
+        return {**unit.dict(), "unitID": unitID}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/units/bulk", response_model=List[UnitOut])
+async def create_units(units: List[Unit]):
+    try:
+        rows = [unit.dict() for unit in units]
+        unitIDs = await async_crud.create_units(rows)
+        return [{**row, "unitID": unitID} for row, unitID in zip(rows, unitIDs)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/units/{unitID}", response_model=UnitOut)
+async def read_unit(unitID: int):
+    unit_obj = await async_crud.get_unit(unitID)
+    if not unit_obj:
+        raise HTTPException(status_code=404, detail="Unit not found")
+    return rows_response(unit_obj)
+
+
+@router.get("/units", response_model=UnitPage, response_model_exclude_unset=True)
+async def read_units(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                     after: Optional[str] = None,
+                     propertyID: Optional[int] = None,
+                     status: Optional[str] = None,
+                     since: Optional[str] = None):
+    try:
+        return rows_response(await async_crud.get_units(limit, after, {"propertyID": propertyID, "status": status}, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.put("/units/{unitID}", response_model=UnitOut)
+async def update_unit(unitID: int, unit: Unit):
+    try:
+        if not await async_crud.update_unit(unitID, unit.dict()):
+            raise HTTPException(status_code=404, detail="Unit not found")
+        return {**unit.dict(), "unitID": unitID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/units/{unitID}", response_model=UnitOut)
+async def patch_unit(unitID: int, unit: UnitPatch):
+    try:
+        updated = await async_crud.patch_unit(unitID, unit.dict(exclude_unset=True))
+        if not updated:
+            raise HTTPException(status_code=404, detail="Unit not found")
+        return updated
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/units/{unitID}")
+async def delete_unit(unitID: int):
+    try:
+        await async_crud.delete_unit(unitID)
+        return {"detail": "Unit deleted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/maintenance_requests", response_model=MaintenanceRequestOut)
+async def create_maintenance_request(mr: MaintenanceRequest):
+    try:
+        requestID = await async_crud.create_maintenance_request(mr.dict())
+        return {**mr.dict(), "requestID": requestID}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/maintenance_requests/{requestID}", response_model=MaintenanceRequestOut)
+async def read_maintenance_request(requestID: int):
+    mr_obj = await async_crud.get_maintenance_request(requestID)
+    if not mr_obj:
+        raise HTTPException(status_code=404, detail="Maintenance request not found")
+    return rows_response(mr_obj)
+
+
+@router.get("/maintenance_requests", response_model=MaintenanceRequestPage, response_model_exclude_unset=True)
+async def read_maintenance_requests(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                    after: Optional[str] = None,
+                                    status: Optional[str] = None,
+                                    date_from: Optional[date] = Query(None, alias="from"),
+                                    date_to: Optional[date] = Query(None, alias="to"),
+                                    sort: Optional[str] = None,
+                                    since: Optional[str] = None):
+    try:
+        filters = {"status": status, "from": date_from, "to": date_to}
+        return rows_response(await async_crud.get_maintenance_requests(limit, after, filters, sort, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.put("/maintenance_requests/{requestID}", response_model=MaintenanceRequestOut)
+async def update_maintenance_request(requestID: int, mr: MaintenanceRequest):
+    try:
+        if not await async_crud.update_maintenance_request(requestID, mr.dict()):
+            raise HTTPException(status_code=404, detail="Maintenance request not found")
+        return {**mr.dict(), "requestID": requestID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/maintenance_requests/{requestID}", response_model=MaintenanceRequestOut)
+async def patch_maintenance_request(requestID: int, mr: MaintenanceRequestPatch):
+    try:
+        updated = await async_crud.patch_maintenance_request(requestID, mr.dict(exclude_unset=True))
+        if not updated:
+            raise HTTPException(status_code=404, detail="Maintenance request not found")
+        return updated
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/maintenance_requests/{requestID}")
+async def delete_maintenance_request(requestID: int):
+    try:
+        await async_crud.delete_maintenance_request(requestID)
+        return {"detail": "Maintenance request deleted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/leases", response_model=LeaseOut)
+async def create_lease(lease: Lease):
+    try:
+        leaseID = await async_crud.create_lease(lease.dict())
+        return {**lease.dict(), "leaseID": leaseID}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/leases/bulk", response_model=List[LeaseOut])
+async def create_leases(leases: List[Lease]):
+    try:
+        rows = [lease.dict() for lease in leases]
+        leaseIDs = await async_crud.create_leases(rows)
+        return [{**row, "leaseID": leaseID} for row, leaseID in zip(rows, leaseIDs)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/leases/{leaseID}", response_model=LeaseOut)
+async def read_lease(leaseID: int):
+    lease_obj = await async_crud.get_lease(leaseID)
+    if not lease_obj:
+        raise HTTPException(status_code=404, detail="Lease not found")
+    return rows_response(lease_obj)
+
+
+@router.get("/leases", response_model=LeasePage, response_model_exclude_unset=True)
+async def read_leases(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                      after: Optional[str] = None,
+                      unitID: Optional[int] = None,
+                      tenantID: Optional[int] = None,
+                      date_from: Optional[date] = Query(None, alias="from"),
+                      date_to: Optional[date] = Query(None, alias="to"),
+                      sort: Optional[str] = None,
+                      expand: Optional[str] = None,
+                      since: Optional[str] = None):
+    try:
+        filters = {"unitID": unitID, "tenantID": tenantID, "from": date_from, "to": date_to}
+        return rows_response(await async_crud.get_leases(limit, after, filters, sort, expand, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.put("/leases/{leaseID}", response_model=LeaseOut)
+async def update_lease(leaseID: int, lease: Lease):
+    try:
+        if not await async_crud.update_lease(leaseID, lease.dict()):
+            raise HTTPException(status_code=404, detail="Lease not found")
+        return {**lease.dict(), "leaseID": leaseID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/leases/{leaseID}", response_model=LeaseOut)
+async def patch_lease(leaseID: int, lease: LeasePatch):
+    try:
+        updated = await async_crud.patch_lease(leaseID, lease.dict(exclude_unset=True))
+        if not updated:
+            raise HTTPException(status_code=404, detail="Lease not found")
+        return updated
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/leases/{leaseID}")
+async def delete_lease(leaseID: int):
+    try:
+        await async_crud.delete_lease(leaseID)
+        return {"detail": "Lease deleted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/payments", response_model=PaymentOut)
+async def create_payment(payment: Payment):
+    try:
+        paymentID = await async_crud.create_payment(payment.dict())
+        return {**payment.dict(), "paymentID": paymentID}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/payments/bulk", response_model=List[PaymentOut])
+async def create_payments(payments: List[Payment]):
+    try:
+        rows = [payment.dict() for payment in payments]
+        paymentIDs = await async_crud.create_payments(rows)
+        return [{**row, "paymentID": paymentID} for row, paymentID in zip(rows, paymentIDs)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/payments/{paymentID}", response_model=PaymentOut)
+async def read_payment(paymentID: int):
+    payment_obj = await async_crud.get_payment(paymentID)
+    if not payment_obj:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return rows_response(payment_obj)
+
+
+@router.get("/payments", response_model=PaymentPage, response_model_exclude_unset=True)
+async def read_payments(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        after: Optional[str] = None,
+                        leaseID: Optional[int] = None,
+                        tenantID: Optional[int] = None,
+                        date_from: Optional[date] = Query(None, alias="from"),
+                        date_to: Optional[date] = Query(None, alias="to"),
+                        sort: Optional[str] = None,
+                        expand: Optional[str] = None,
+                        since: Optional[str] = None):
+    try:
+        filters = {"leaseID": leaseID, "tenantID": tenantID, "from": date_from, "to": date_to}
+        return rows_response(await async_crud.get_payments(limit, after, filters, sort, expand, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.put("/payments/{paymentID}", response_model=PaymentOut)
+async def update_payment(paymentID: int, payment: Payment):
+    try:
+        if not await async_crud.update_payment(paymentID, payment.dict()):
+            raise HTTPException(status_code=404, detail="Payment not found")
+        return {**payment.dict(), "paymentID": paymentID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/payments/{paymentID}", response_model=PaymentOut)
+async def patch_payment(paymentID: int, payment: PaymentPatch):
+    try:
+        updated = await async_crud.patch_payment(paymentID, payment.dict(exclude_unset=True))
+        if not updated:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        return updated
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/payments/{paymentID}")
+async def delete_payment(paymentID: int):
+    try:
+        await async_crud.delete_payment(paymentID)
+        return {"detail": "Payment deleted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/unit_maintenance_requests")
+async def create_unit_maintenance_request(umr: UnitMaintenanceRequest):
+    try:
+        await async_crud.create_unit_maintenance_request(umr.dict())
+        return {"detail": "Association created successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/unit_maintenance_requests/bulk")
+async def create_unit_maintenance_requests(umrs: List[UnitMaintenanceRequest]):
+    try:
+        await async_crud.create_unit_maintenance_requests([umr.dict() for umr in umrs])
+        return {"detail": "%d associations created successfully" % len(umrs)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/unit_maintenance_requests", response_model=UnitMaintenanceRequestPage, response_model_exclude_unset=True)
+async def read_unit_maintenance_requests(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                         after: Optional[str] = None,
+                                         unitID: Optional[int] = None,
+                                         requestID: Optional[int] = None,
+                                         expand: Optional[str] = None,
+                                         since: Optional[str] = None):
+    try:
+        filters = {"unitID": unitID, "requestID": requestID}
+        return rows_response(await async_crud.get_unit_maintenance_requests(limit, after, filters, expand=expand, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/unit_maintenance_requests")
+async def delete_unit_maintenance_request(unitID: int, requestID: int):
+    try:
+        await async_crud.delete_unit_maintenance_request(unitID, requestID)
+        return {"detail": "Association deleted successfully"}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------------------------
+# BATCH
+# ------------------------------
+
+@router.post("/batch", response_model=BatchResult)
+async def create_batch(batch: BatchRequest):
+    """
+    Runs the operations in order in one transaction; if any fails, none of
+    them take effect and the error names the failing operation.
+    """
+    try:
+        return {"results": await arun_batch(async_crud, batch.operations)}
+    except BatchError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+# ------------------------------
+# IMPORTS
+# ------------------------------
+
+@router.post("/import/{resource}", response_model=ImportResult)
+async def import_resource(resource: str, request: Request, format: ImportFormat = ImportFormat.ndjson):
+    """
+    Imports the CSV (with a header line) or NDJSON records in the request body,
+    read and written in batches as the upload streams in. Invalid rows are
+    skipped and listed in the result by line number.
+    """
+    if resource not in IMPORTS:
+        raise HTTPException(status_code=404, detail="Unknown resource")
+    try:
+        return await run_import(resource, format, request.stream(), async_crud.import_rows)
+    except InvalidImport as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------------------------
+# EXPORTS
+# ------------------------------
+
+@router.get("/export/{resource}")
+async def export_resource(resource: str, format: ExportFormat = ExportFormat.ndjson):
+    """
+    Streams every record of a resource as NDJSON or as one chunked JSON array.
+    Rows go straight from an unbuffered cursor to the response without being
+    collected or revalidated, so memory stays flat for any table size.
+    """
+    if resource not in crud.EXPORT_QUERIES:
+        raise HTTPException(status_code=404, detail="Unknown resource")
+    return StreamingResponse(aencode_rows(async_crud.iter_rows(resource), format), media_type=MEDIA_TYPES[format])
@@ -0,0 +1,318 @@
+# backends.py
+# Storage engines behind db.get_connection(), selected by DB_BACKEND.
+#
+# crud.py is written against PyMySQL's connection interface (pyformat
+# placeholders, dict rows, lastrowid/rowcount, commit/rollback). MySQLBackend
+# hands out real PyMySQL connections; SQLiteBackend wraps the standard
+# library's sqlite3 in a thin adapter with the same interface, so the CRUD
+# functions run unchanged on an embedded database file. The few statements
+# that cannot be written portably, and the choice of cursor, go through the
+# backend methods below.
+#
+# PyMySQL is imported by MySQLBackend only, so DB_BACKEND=sqlite (CI, local
+# use) runs without the MySQL driver installed.
+from datetime import date, datetime
+from decimal import Decimal
+import functools
+import re
+import sqlite3
+
+
+# Write transactions open on a MySQL server, other than the current session's.
+OPEN_TRANSACTIONS = """
+    SELECT trx_id FROM information_schema.INNODB_TRX
+    WHERE trx_mysql_thread_id <> CONNECTION_ID() AND trx_rows_modified > 0
+"""
+
+
+class MySQLBackend:
+    """
+    A MySQL server reached over the network through PyMySQL.
+    """
+
+    dialect = "mysql"
+    # The current time to the millisecond, as an SQL expression.
+    current_timestamp = "CURRENT_TIMESTAMP(3)"
+    # Prefix that shows a statement's plan instead of running it.
+    explain = "EXPLAIN "
+
+    def __init__(self, host, port, user, password, database):
+        import pymysql
+        from pymysql.constants import CLIENT, SERVER_STATUS
+        from pymysql.cursors import DictCursor, SSDictCursor
+
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.database = database
+        # Errors after which a connection may be broken and must not be reused.
+        self.disconnect_errors = (pymysql.err.OperationalError,)
+        # Errors that undo only the failing statement, leaving the rest of the
+        # transaction intact (unlike deadlocks, which roll all of it back).
+        self.statement_errors = (pymysql.err.IntegrityError, pymysql.err.DataError)
+        # Errors reading information_schema without the privileges for it.
+        self._privilege_errors = (pymysql.err.OperationalError, pymysql.err.ProgrammingError)
+        self._connect = pymysql.connect
+        self._found_rows = CLIENT.FOUND_ROWS
+        self._in_trans = SERVER_STATUS.SERVER_STATUS_IN_TRANS
+        self._dict_cursor = DictCursor
+        self._streaming_cursor = SSDictCursor
+
+    def connect(self):
+        # FOUND_ROWS makes UPDATE report matched rather than changed rows, so an
+        # update that rewrites identical values is not mistaken for a missing row.
+        return self._connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            cursorclass=self._dict_cursor,
+            client_flag=self._found_rows
+        )
+
+    def dict_cursor(self, conn):
+        """
+        Returns a buffered cursor on conn whose rows are dicts.
+        """
+        return conn.cursor(self._dict_cursor)
+
+    def streaming_cursor(self, conn):
+        """
+        Returns an unbuffered cursor on conn whose rows are dicts, read from
+        the server as they are fetched instead of all at once.
+        """
+        return conn.cursor(self._streaming_cursor)
+
+    def replica(self, host, port):
+        """
+        Returns a backend for a read replica reached with the same credentials.
+        """
+        return MySQLBackend(host, port, self.user, self.password, self.database)
+
+    def in_transaction(self, conn):
+        return bool(conn.server_status & self._in_trans)
+
+    def id_increment(self, cursor):
+        """
+        Returns the spacing between consecutive auto-increment IDs.
+        """
+        cursor.execute("SELECT @@auto_increment_increment AS increment")
+        return cursor.fetchone()["increment"]
+
+    def first_insert_id(self, cursor, count):
+        """
+        Returns the ID generated for the first row of the multi-row INSERT
+        just executed on cursor; MySQL reports exactly that as lastrowid.
+        """
+        return cursor.lastrowid
+
+    def open_transactions(self, cursor):
+        """
+        Returns the ids of the transactions other than cursor's that have
+        written rows and not yet committed, or None if the account lacks the
+        PROCESS privilege needed to see them.
+        """
+        try:
+            cursor.execute(OPEN_TRANSACTIONS)
+        except self._privilege_errors:
+            return None
+        return {row["trx_id"] for row in cursor.fetchall()}
+
+    def set_write_timeout(self, cursor, seconds):
+        """
+        Raises how long the server waits on a slow client reading a result.
+        """
+        cursor.execute("SET SESSION net_write_timeout = %s", (seconds,))
+
+    def upsert_sum(self, keys, columns):
+        """
+        Returns the clause that makes an INSERT add its columns to the row
+        that already has the same keys instead of failing on it.
+        """
+        return "ON DUPLICATE KEY UPDATE " + ", ".join(
+            "%s = %s + VALUES(%s)" % (column, column, column) for column in columns)
+
+
+# PyMySQL's placeholders and the sqlite3 styles they map to: %(name)s is a
+# named parameter, %s a positional one and %% a literal percent sign.
+PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+def _sqlite_placeholder(match):
+    if match.group(1):
+        return ":" + match.group(1)
+    return "?" if match.group(0) == "%s" else "%"
+
+
+@functools.lru_cache(maxsize=1024)
+def convert_placeholders(query: str) -> str:
+    """
+    Rewrites a PyMySQL-style query for sqlite3, e.g.
+    "WHERE id = %(id)s AND x IN (%s, %s)" becomes "WHERE id = :id AND x IN (?, ?)".
+    """
+    return PLACEHOLDER.sub(_sqlite_placeholder, query)
+
+
+# Bind dates and decimals the way PyMySQL does, and read DATE columns back as
+# dates, so rows look the same whichever backend produced them. Datetimes are
+# bound in the millisecond format the updatedAt triggers store (see
+# migrations.py), so they compare correctly as text.
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", "milliseconds"))
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+
+# Compiled statements sqlite3 keeps per connection, keyed by SQL text. Large
+# enough for the whole queries.py catalog plus the filter, expand and bulk
+# variants built at run time (the default of 128 would keep evicting them).
+SQLITE_STATEMENT_CACHE_SIZE = 512
+
+
+class SQLiteCursor:
+    """
+    A sqlite3 cursor that accepts PyMySQL-style queries and returns rows as
+    dicts, like PyMySQL's DictCursor.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        self._cursor.execute(convert_placeholders(query), () if params is None else params)
+        return self._cursor.rowcount
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(convert_placeholders(query), seq_of_params)
+        return self._cursor.rowcount
+
+    def _row(self, row):
+        return {description[0]: value for description, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._row(row)
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    A sqlite3 connection exposing the parts of PyMySQL's Connection that the
+    CRUD layer and the connection pool use.
+    """
+
+    def __init__(self, path, busy_timeout):
+        self._connection = sqlite3.connect(
+            path,
+            timeout=busy_timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+            # The pool hands a connection to one thread at a time, but not
+            # always the thread that opened it.
+            check_same_thread=False,
+            uri=path.startswith("file:"),
+        )
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        # In WAL mode NORMAL is still crash-safe; it only skips an fsync per
+        # commit, which would otherwise dominate small writes.
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self.open = True
+
+    def cursor(self):
+        return SQLiteCursor(self._connection.cursor())
+
+    @property
+    def in_transaction(self):
+        return self._connection.in_transaction
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def ping(self, reconnect=True):
+        # An embedded database has no server connection to lose.
+        if not self.open:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+
+    def close(self):
+        self.open = False
+        self._connection.close()
+
+
+class SQLiteBackend:
+    """
+    An embedded SQLite database file in WAL mode: readers never block the
+    writer or each other, and there is no network round trip per query.
+    Writes are serialized by SQLite itself; a writer waits up to busy_timeout
+    seconds for the lock.
+    """
+
+    dialect = "sqlite"
+    disconnect_errors = (sqlite3.OperationalError,)
+    statement_errors = (sqlite3.IntegrityError, sqlite3.DataError)
+    current_timestamp = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    explain = "EXPLAIN QUERY PLAN "
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+
+    def connect(self):
+        return SQLiteConnection(self.path, self.busy_timeout)
+
+    def dict_cursor(self, conn):
+        return conn.cursor()
+
+    def streaming_cursor(self, conn):
+        # sqlite3 cursors step through results lazily, so a buffered and an
+        # unbuffered cursor are the same thing here.
+        return conn.cursor()
+
+    def in_transaction(self, conn):
+        return conn.in_transaction
+
+    def id_increment(self, cursor):
+        return 1
+
+    def open_transactions(self, cursor):
+        # SQLite has one writer at a time: by the time a row is visible, every
+        # transaction that wrote before it has committed or rolled back.
+        return set()
+
+    def first_insert_id(self, cursor, count):
+        # SQLite reports the last row of a multi-row INSERT. Writers hold the
+        # database lock for the whole statement, so its rowids are consecutive.
+        return cursor.lastrowid - count + 1
+
+    def set_write_timeout(self, cursor, seconds):
+        pass
+
+    def upsert_sum(self, keys, columns):
+        return "ON CONFLICT (%s) DO UPDATE SET %s" % (", ".join(keys), ", ".join(
+            "%s = %s + excluded.%s" % (column, column, column) for column in columns))
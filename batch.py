@@ -0,0 +1,201 @@
+# batch.py
+# POST /batch: an ordered list of create, update, patch and delete operations
+# across resources, run on one connection as one transaction.
+#
+# Multi-step actions such as a move-in (create the tenant, create the lease,
+# mark the unit Occupied, record the deposit) otherwise take a request and a
+# commit per step, and leave half-done state behind when a later step fails.
+# Here each operation calls the same CRUD function its single-record route
+# does, inside db.transaction(), so summaries, the change log and every other
+# side effect of the write join the batch's transaction; the first failing
+# operation rolls the whole batch back. An operation can use the ID created
+# by an earlier one by referring to it as "$<ref>" (the earlier operation's
+# `ref`) or "$<index>" (its position, from 0).
+import re
+
+from pydantic import ValidationError
+
+from cache import invalidate
+import db
+from imports import describe
+from models import BatchMethod, Lease, LeasePatch, MaintenanceRequest, MaintenanceRequestPatch, Payment, \
+    PaymentPatch, Property, PropertyPatch, Tenant, TenantPatch, Unit, UnitMaintenanceRequest, UnitPatch
+
+BATCH_MAX_OPERATIONS = 100
+
+# API resource name -> (table, key column, record name used in the CRUD
+# function names, model, patch model, label for messages). The association
+# table has a composite key given in `data`, and cannot be updated.
+BATCH_RESOURCES = {
+    "tenants": ("Tenants", "tenantID", "tenant", Tenant, TenantPatch, "Tenant"),
+    "properties": ("Properties", "propertyID", "property", Property, PropertyPatch, "Property"),
+    "units": ("Units", "unitID", "unit", Unit, UnitPatch, "Unit"),
+    "maintenance_requests": ("MaintenanceRequests", "requestID", "maintenance_request", MaintenanceRequest,
+                             MaintenanceRequestPatch, "Maintenance request"),
+    "leases": ("Leases", "leaseID", "lease", Lease, LeasePatch, "Lease"),
+    "payments": ("Payments", "paymentID", "payment", Payment, PaymentPatch, "Payment"),
+    "unit_maintenance_requests": ("UnitMaintenanceRequests", None, "unit_maintenance_request",
+                                  UnitMaintenanceRequest, None, "Association"),
+}
+
+# Fields of `data` that may hold a reference instead of an ID.
+REFERENCE_FIELDS = {"propertyID", "unitID", "tenantID", "leaseID", "requestID"}
+REFERENCE = re.compile(r"^\$(\w+)$")
+
+
+class BatchError(Exception):
+    """
+    Raised for the operation that failed a batch, with the HTTP status its
+    single-record route would have answered with.
+    """
+
+    def __init__(self, index: int, operation, status_code: int, message: str):
+        super().__init__("Operation %d (%s %s): %s" % (index, operation.method.value, operation.resource, message))
+        self.status_code = status_code
+
+
+def check_operations(operations):
+    """
+    Rejects a batch that is too long or names an unknown resource or an
+    unsupported method before any of it runs.
+    """
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        raise BatchError(BATCH_MAX_OPERATIONS, operations[BATCH_MAX_OPERATIONS], 400,
+                         "A batch holds at most %d operations" % BATCH_MAX_OPERATIONS)
+    for index, operation in enumerate(operations):
+        if operation.resource not in BATCH_RESOURCES:
+            raise BatchError(index, operation, 400, "Unknown resource")
+        key_column = BATCH_RESOURCES[operation.resource][1]
+        if key_column is None and operation.method in (BatchMethod.update, BatchMethod.patch):
+            raise BatchError(index, operation, 400, "Associations cannot be updated")
+
+
+def resolve(value, refs: dict, index: int, operation):
+    """
+    Replaces a "$<ref>" reference with the ID it refers to.
+    """
+    match = REFERENCE.match(value) if isinstance(value, str) else None
+    if match is None:
+        return value
+    if match.group(1) not in refs:
+        raise BatchError(index, operation, 400, "Unknown reference %s" % value)
+    return refs[match.group(1)]
+
+
+def plan(index: int, operation, refs: dict):
+    """
+    Validates one operation against its resource's models, with references
+    resolved. Returns (CRUD function name, arguments).
+    """
+    table, key_column, name, model, patch_model, label = BATCH_RESOURCES[operation.resource]
+    data = {
+        field: resolve(value, refs, index, operation) if field in REFERENCE_FIELDS else value
+        for field, value in operation.data.items()
+    }
+    key = resolve(operation.id, refs, index, operation)
+    if key_column is not None and operation.method is not BatchMethod.create:
+        if not isinstance(key, int):
+            raise BatchError(index, operation, 400, "An integer id is required")
+        if operation.method is BatchMethod.delete:
+            return "delete_" + name, (key,)
+    try:
+        if operation.method is BatchMethod.patch:
+            return "patch_" + name, (key, patch_model(**data).dict(exclude_unset=True))
+        row = model(**data).dict()
+    except ValidationError as e:
+        raise BatchError(index, operation, 422, describe(e))
+    if key_column is None:
+        return operation.method.value + "_" + name, (row["unitID"], row["requestID"]) \
+            if operation.method is BatchMethod.delete else (row,)
+    if operation.method is BatchMethod.create:
+        return "create_" + name, (row,)
+    return "update_" + name, (key, row)
+
+
+def outcome(index: int, operation, args: tuple, returned, refs: dict) -> dict:
+    """
+    Turns a CRUD function's return value into the operation's result, the body
+    its single-record route would return, and records created IDs in refs.
+    """
+    table, key_column, name, model, patch_model, label = BATCH_RESOURCES[operation.resource]
+    if operation.method is BatchMethod.delete:
+        return {"detail": "%s deleted successfully" % label}
+    if operation.method is BatchMethod.patch:
+        if returned is None:
+            raise BatchError(index, operation, 404, "%s not found" % label)
+        return returned
+    if key_column is None:
+        return args[0]
+    if operation.method is BatchMethod.update:
+        if not returned:
+            raise BatchError(index, operation, 404, "%s not found" % label)
+        return {**args[1], key_column: args[0]}
+    refs[str(index)] = returned
+    if operation.ref:
+        refs[operation.ref] = returned
+    return {**args[0], key_column: returned}
+
+
+def touched_key(operation, args: tuple):
+    """
+    Returns the (table, *key) cache entry an update, patch or delete changed,
+    or None. These are invalidated again once the batch has committed or
+    rolled back: the CRUD functions invalidate before that, and a concurrent
+    read in between could have cached a row the batch then changed.
+    """
+    table, key_column = BATCH_RESOURCES[operation.resource][:2]
+    if operation.method is BatchMethod.create:
+        return None
+    if key_column is None:
+        return (table,) + args
+    return table, args[0]
+
+
+def run_batch(module, operations) -> list:
+    """
+    Runs operations through the CRUD module (crud) in one transaction and
+    returns their results in order. Raises BatchError for the first operation
+    that fails, after rolling the batch back.
+    """
+    check_operations(operations)
+    refs = {}
+    results = []
+    touched = []
+    try:
+        with db.transaction():
+            for index, operation in enumerate(operations):
+                function, args = plan(index, operation, refs)
+                touched.append(touched_key(operation, args))
+                try:
+                    returned = getattr(module, function)(*args)
+                except Exception as e:
+                    raise BatchError(index, operation, 400, str(e))
+                results.append(outcome(index, operation, args, returned, refs))
+    finally:
+        for entry in filter(None, touched):
+            invalidate(*entry)
+    return results
+
+
+async def arun_batch(module, operations) -> list:
+    """
+    run_batch() for async_crud, in db.async_transaction().
+    """
+    check_operations(operations)
+    refs = {}
+    results = []
+    touched = []
+    try:
+        async with db.async_transaction():
+            for index, operation in enumerate(operations):
+                function, args = plan(index, operation, refs)
+                touched.append(touched_key(operation, args))
+                try:
+                    returned = await getattr(module, function)(*args)
+                except Exception as e:
+                    raise BatchError(index, operation, 400, str(e))
+                results.append(outcome(index, operation, args, returned, refs))
+    finally:
+        for entry in filter(None, touched):
+            invalidate(*entry)
+    return results
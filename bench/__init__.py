@@ -0,0 +1 @@
+# Offline load benchmarks for the API; see bench/run.py.
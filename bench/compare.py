@@ -0,0 +1,69 @@
+# bench/compare.py
+# Compares two bench.run result files scenario by scenario.
+#
+#   python -m bench.compare bench/results/baseline.json bench/results/latest.json --fail-above 10
+#
+# Exits non-zero when --fail-above is given and any scenario's p95 latency got
+# worse by more than that many percent, so it can gate a CI job.
+import argparse
+import json
+import sys
+
+METRICS = [("throughput", "req/s", False), ("p50", "ms", True), ("p95", "ms", True), ("p99", "ms", True),
+           ("peakRssKb", "kB", True)]
+
+
+def load(path):
+    with open(path) as results:
+        report = json.load(results)
+    return report["meta"], {scenario["name"]: scenario for scenario in report["scenarios"]}
+
+
+def value(scenario, metric):
+    if metric in scenario["latencyMs"]:
+        return scenario["latencyMs"][metric]
+    return scenario.get(metric)
+
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--fail-above", type=float, help="p95 regression (in percent) that fails the run")
+    args = parser.parse_args()
+
+    baseline_meta, baseline = load(args.baseline)
+    candidate_meta, candidate = load(args.candidate)
+    for key in ("dbBackend", "dbMode", "concurrency", "rows"):
+        if baseline_meta.get(key) != candidate_meta.get(key):
+            print("warning: runs differ in %s (%s vs %s)" % (key, baseline_meta.get(key), candidate_meta.get(key)))
+
+    regressions = []
+    for name, after in candidate.items():
+        before = baseline.get(name)
+        if before is None:
+            print("%s: new scenario" % name)
+            continue
+        cells = []
+        for metric, unit, lower_is_better in METRICS:
+            delta = change(value(before, metric), value(after, metric))
+            cells.append("%s %s -> %s %s (%s)" % (metric, value(before, metric), value(after, metric), unit,
+                                                  "n/a" if delta is None else "%+.1f%%" % delta))
+        print("%s\n    %s" % (name, "\n    ".join(cells)))
+        p95_delta = change(value(before, "p95"), value(after, "p95"))
+        if args.fail_above is not None and p95_delta is not None and p95_delta > args.fail_above:
+            regressions.append((name, p95_delta))
+
+    for name, delta in regressions:
+        print("REGRESSION: %s p95 %+.1f%%" % (name, delta))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# bench/load.py
+# A small closed-loop HTTP load generator built only on the standard library,
+# so benchmarks run offline without installing wrk/locust.
+#
+# Each worker thread keeps one keep-alive connection and issues requests back
+# to back; latency is measured per request from send to fully-read body.
+import http.client
+import json
+import threading
+import time
+
+REQUEST_TIMEOUT_SECONDS = 30
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, statuses, elapsed, response_bytes):
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "requests": count,
+        "errors": errors,
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "elapsedSeconds": round(elapsed, 3),
+        "throughput": round(count / elapsed, 2) if elapsed else None,
+        "responseBytes": response_bytes,
+        "latencyMs": {
+            "mean": ms(sum(latencies) / count) if count else None,
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1]) if count else None,
+        },
+    }
+
+
+class Worker(threading.Thread):
+    def __init__(self, host, port, next_request, deadline, remaining):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.next_request = next_request
+        self.deadline = deadline
+        self.remaining = remaining
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.response_bytes = 0
+        self.connection = None
+
+    def connect(self):
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT_SECONDS)
+
+    def run(self):
+        self.connect()
+        while time.monotonic() < self.deadline and self.remaining.take():
+            method, path, body, expected = self.next_request()
+            payload = None if body is None else json.dumps(body).encode()
+            headers = {"Content-Type": "application/json"} if payload is not None else {}
+            started = time.perf_counter()
+            try:
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                self.connection.close()
+                self.connect()
+                continue
+            self.latencies.append(time.perf_counter() - started)
+            self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+            self.response_bytes += len(data)
+            if response.status not in expected:
+                self.errors += 1
+        self.connection.close()
+
+
+class Budget:
+    """
+    A shared request counter; None means unlimited (bounded by duration only).
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self._lock = threading.Lock()
+
+    def take(self):
+        if self.total is None:
+            return True
+        with self._lock:
+            if self.total <= 0:
+                return False
+            self.total -= 1
+            return True
+
+
+def run_load(host, port, next_request, concurrency=8, duration=10.0, requests=None):
+    """
+    Drives the server with `concurrency` keep-alive connections until
+    `duration` seconds pass or `requests` requests were sent, whichever comes
+    first. next_request() is called from the worker threads and must return
+    (method, path, json body or None, expected statuses); it has to be
+    thread-safe. Returns the summary dict from summarize().
+    """
+    deadline = time.monotonic() + duration
+    budget = Budget(requests)
+    workers = [Worker(host, port, next_request, deadline, budget) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    latencies, statuses = [], {}
+    errors = response_bytes = 0
+    for worker in workers:
+        latencies.extend(worker.latencies)
+        errors += worker.errors
+        response_bytes += worker.response_bytes
+        for status, n in worker.statuses.items():
+            statuses[status] = statuses.get(status, 0) + n
+    return summarize(latencies, errors, statuses, elapsed, response_bytes)
@@ -0,0 +1,341 @@
+# bench/run.py
+# Load benchmark for every API route.
+#
+#   DB_HOST=127.0.0.1 DB_USER=bench DB_PASSWORD=bench DB_NAME=upms_bench \
+#       python -m bench.run --seed-data --reset --out bench/results/baseline.json
+#   DB_BACKEND=sqlite SQLITE_PATH=/tmp/bench.sqlite3 python -m bench.run --seed-data --reset
+#
+# Starts the API under uvicorn in a subprocess against the database named by
+# the usual DB_* variables (a throwaway local MySQL server, since the class
+# database is refused, or DB_BACKEND=sqlite to measure the API layer alone),
+# optionally seeds it, then drives each scenario in turn with bench.load and
+# records latency percentiles, throughput and the server's memory. Compare two result files with bench.compare.
+from datetime import datetime, timezone
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import crud
+import db
+from bench import seed
+from bench.load import run_load
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_START_TIMEOUT_SECONDS = 30
+BULK_SIZE = 100
+OK = (200,)
+
+
+class Picker:
+    """
+    Thread-safe deterministic choices for request factories running on several
+    load-generator threads.
+    """
+
+    def __init__(self, seed_value):
+        self.rng = random.Random(seed_value)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def choice(self, values):
+        with self._lock:
+            return self.rng.choice(values)
+
+    def next(self):
+        with self._lock:
+            return next(self._counter)
+
+    def locked(self, func, *args):
+        with self._lock:
+            return func(self.rng, *args)
+
+
+def take_in_order(values):
+    """
+    Returns a thread-safe function handing out values one at a time, for
+    scenarios that must touch each row exactly once (deletes).
+    """
+    iterator = iter(list(values))
+    lock = threading.Lock()
+
+    def take():
+        with lock:
+            return next(iterator)
+    return take
+
+
+def fixtures(ids, count, rng, tag):
+    """
+    Inserts fresh rows that nothing references, so the DELETE scenarios can
+    remove them without tripping foreign keys or eating into the seeded data.
+    """
+    tenant_ids, unit_ids, lease_ids = ids["Tenants"], ids["Units"], ids["Leases"]
+    leases = [seed.lease_row(rng, rng.choice(unit_ids), rng.choice(tenant_ids)) for _ in range(count)]
+    payments = [seed.payment_row(rng, rng.choice(lease_ids), lease, 0) for lease in leases]
+    return {
+        "Tenants": seed.insert("Tenants", crud.TABLES["Tenants"][1],
+                               [seed.tenant_row(rng, "delete-%s" % tag, i) for i in range(count)]),
+        "Properties": seed.insert("Properties", crud.TABLES["Properties"][1],
+                                  [seed.property_row(rng, i) for i in range(count)]),
+        "Units": seed.insert("Units", crud.TABLES["Units"][1],
+                             [seed.unit_row(rng, ids["Properties"][0], i, "Vacant") for i in range(count)]),
+        "MaintenanceRequests": seed.insert("MaintenanceRequests", crud.TABLES["MaintenanceRequests"][1],
+                                           [seed.request_row(rng, i) for i in range(2 * count)]),
+        "Leases": seed.insert("Leases", crud.TABLES["Leases"][1], leases),
+        "Payments": seed.insert("Payments", crud.TABLES["Payments"][1], payments),
+    }
+
+
+def scenarios(ids, fresh, count, picker, tag):
+    """
+    Returns [(name, next_request, request budget or None)] covering every
+    route. next_request() returns (method, path, body, expected statuses).
+    """
+    one = picker.choice
+    tenants, properties, units = ids["Tenants"], ids["Properties"], ids["Units"]
+    leases, payments, requests = ids["Leases"], ids["Payments"], ids["MaintenanceRequests"]
+    associations = ids["UnitMaintenanceRequests"]
+
+    def row(builder, *args):
+        return seed.json_ready(picker.locked(builder, *args))
+
+    def new_tenant():
+        return row(seed.tenant_row, "post-%s" % tag, picker.next())
+
+    def get(path):
+        return lambda: ("GET", path, None, OK)
+
+    # Half of the fresh maintenance requests get linked to a unit by the POST
+    # scenario and unlinked again by the DELETE one; the rest are deleted.
+    pairs = [(units[i % len(units)], request_id) for i, request_id in enumerate(fresh["MaintenanceRequests"][:count])]
+    link, unlink = take_in_order(pairs), take_in_order(pairs)
+
+    reads = [
+        ("GET /tenants", get("/tenants?limit=100"), None),
+        ("GET /tenants/{id}", lambda: ("GET", "/tenants/%d" % one(tenants), None, OK), None),
+        ("GET /properties?city", lambda: ("GET", "/properties?city=%s" % one(seed.CITIES)[0], None, OK), None),
+        ("GET /properties/{id}", lambda: ("GET", "/properties/%d" % one(properties), None, OK), None),
+        ("GET /properties/{id}/summary",
+         lambda: ("GET", "/properties/%d/summary" % one(properties), None, OK), None),
+        ("GET /properties/summary", get("/properties/summary"), None),
+        ("GET /units?propertyID", lambda: ("GET", "/units?propertyID=%d" % one(properties), None, OK), None),
+        ("GET /units/{id}", lambda: ("GET", "/units/%d" % one(units), None, OK), None),
+        ("GET /maintenance_requests?status&sort",
+         lambda: ("GET", "/maintenance_requests?status=%s&sort=-submissionDate" % one(["Open", "Closed"]),
+                  None, OK), None),
+        ("GET /maintenance_requests/{id}",
+         lambda: ("GET", "/maintenance_requests/%d" % one(requests), None, OK), None),
+        ("GET /leases?expand", get("/leases?limit=100&expand=tenant,unit.property"), None),
+        ("GET /leases/{id}", lambda: ("GET", "/leases/%d" % one(leases), None, OK), None),
+        ("GET /payments?tenantID&sort",
+         lambda: ("GET", "/payments?tenantID=%d&sort=-paymentDate&expand=lease" % one(tenants), None, OK), None),
+        ("GET /payments?from&to", get("/payments?from=2023-01-01&to=2023-03-31&limit=500"), None),
+        ("GET /payments/{id}", lambda: ("GET", "/payments/%d" % one(payments), None, OK), None),
+        ("GET /unit_maintenance_requests?unitID&expand",
+         lambda: ("GET", "/unit_maintenance_requests?unitID=%d&expand=request" % one(associations)[0],
+                  None, OK), None),
+        ("GET /export/payments", get("/export/payments"), 20),
+        ("GET /export/tenants?format=json", get("/export/tenants?format=json"), 20),
+        ("GET /cache/stats", get("/cache/stats"), None),
+        ("GET /metrics", get("/metrics"), None),
+    ]
+    writes = [
+        ("POST /tenants", lambda: ("POST", "/tenants", new_tenant(), OK), count),
+        ("POST /tenants/bulk",
+         lambda: ("POST", "/tenants/bulk", [new_tenant() for _ in range(BULK_SIZE)], OK), count // 10 or 1),
+        ("POST /properties", lambda: ("POST", "/properties", row(seed.property_row, picker.next()), OK), count),
+        ("POST /units", lambda: ("POST", "/units", row(seed.unit_row, one(properties), 0), OK), count),
+        ("POST /units/bulk",
+         lambda: ("POST", "/units/bulk", [row(seed.unit_row, one(properties), n) for n in range(BULK_SIZE)], OK),
+         count // 10 or 1),
+        ("POST /maintenance_requests",
+         lambda: ("POST", "/maintenance_requests", row(seed.request_row, picker.next()), OK), count),
+        ("POST /leases", lambda: ("POST", "/leases", row(seed.lease_row, one(units), one(tenants)), OK), count),
+        ("POST /leases/bulk",
+         lambda: ("POST", "/leases/bulk",
+                  [row(seed.lease_row, one(units), one(tenants)) for _ in range(BULK_SIZE)], OK),
+         count // 10 or 1),
+        ("POST /payments", lambda: ("POST", "/payments", payment_body(), OK), count),
+        ("POST /payments/bulk",
+         lambda: ("POST", "/payments/bulk", [payment_body() for _ in range(BULK_SIZE)], OK), count // 10 or 1),
+        ("POST /unit_maintenance_requests",
+         lambda: ("POST", "/unit_maintenance_requests", dict(zip(("unitID", "requestID"), link())), OK),
+         len(pairs)),
+        ("PUT /tenants/{id}", lambda: put_tenant(), count),
+        ("PATCH /tenants/{id}",
+         lambda: ("PATCH", "/tenants/%d" % one(tenants), {"phoneNumber": "5415550100"}, OK), count),
+        ("PUT /properties/{id}",
+         lambda: ("PUT", "/properties/%d" % one(properties), row(seed.property_row, 0), OK), count),
+        ("PATCH /properties/{id}",
+         lambda: ("PATCH", "/properties/%d" % one(properties), {"propertyValue": 750000}, OK), count),
+        ("PUT /units/{id}", lambda: ("PUT", "/units/%d" % one(units), row(seed.unit_row, one(properties), 0), OK),
+         count),
+        ("PATCH /units/{id}", lambda: ("PATCH", "/units/%d" % one(units), {"status": "Occupied"}, OK), count),
+        ("PUT /maintenance_requests/{id}",
+         lambda: ("PUT", "/maintenance_requests/%d" % one(requests), row(seed.request_row, 0), OK), count),
+        ("PATCH /maintenance_requests/{id}",
+         lambda: ("PATCH", "/maintenance_requests/%d" % one(requests), {"status": "Closed"}, OK), count),
+        ("PUT /leases/{id}",
+         lambda: ("PUT", "/leases/%d" % one(leases), row(seed.lease_row, one(units), one(tenants)), OK), count),
+        ("PATCH /leases/{id}", lambda: ("PATCH", "/leases/%d" % one(leases), {"rentPrice": 1500}, OK), count),
+        ("PUT /payments/{id}", lambda: ("PUT", "/payments/%d" % one(payments), payment_body(), OK), count),
+        ("PATCH /payments/{id}",
+         lambda: ("PATCH", "/payments/%d" % one(payments), {"paymentMethod": "ACH"}, OK), count),
+    ]
+
+    def payment_body():
+        lease = {"tenantID": one(tenants), "startDate": seed.EPOCH, "rentPrice": 1200}
+        return row(seed.payment_row, one(leases), lease, picker.next() % 12)
+
+    def put_tenant():
+        tenant_id = one(tenants)
+        body = row(seed.tenant_row, "put", tenant_id)
+        return "PUT", "/tenants/%d" % tenant_id, body, OK
+
+    deletes = [
+        ("DELETE /unit_maintenance_requests",
+         lambda: ("DELETE", "/unit_maintenance_requests?unitID=%d&requestID=%d" % unlink(), None, OK), len(pairs)),
+    ]
+    for name, table in [("payments", "Payments"), ("leases", "Leases"), ("units", "Units"),
+                        ("maintenance_requests", "MaintenanceRequests"), ("properties", "Properties"),
+                        ("tenants", "Tenants")]:
+        victims = fresh[table][count:] if table == "MaintenanceRequests" else fresh[table]
+        take = take_in_order(victims)
+        deletes.append(("DELETE /%s/{id}" % name,
+                        (lambda take=take, name=name: ("DELETE", "/%s/%d" % (name, take()), None, OK)),
+                        len(victims)))
+    return reads + writes + deletes
+
+
+def memory_kb(pid):
+    """
+    Returns the resident set size and its peak (VmRSS, VmHWM) of a process in
+    kB, read from /proc so no extra dependency is needed.
+    """
+    usage = {}
+    try:
+        with open("/proc/%d/status" % pid) as status:
+            for line in status:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    name, value = line.split(":", 1)
+                    usage[name] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage.get("VmRSS"), usage.get("VmHWM")
+
+
+def start_server(host, port, env):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("The API server exited with status %d" % server.returncode)
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request("GET", "/readyz")
+            ready = connection.getresponse().status == 200
+            connection.close()
+            if ready:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("The API server did not start within %d seconds" % SERVER_START_TIMEOUT_SECONDS)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API route against a local database.")
+    seed.add_volume_arguments(parser)
+    parser.add_argument("--seed", type=int, default=42, help="random seed for data and request mix")
+    parser.add_argument("--seed-data", action="store_true", help="seed the database before benchmarking")
+    parser.add_argument("--reset", action="store_true", help="delete all existing rows before seeding")
+    parser.add_argument("--allow-remote", action="store_true")
+    parser.add_argument("--db-mode", choices=["sync", "async"], default=db.DB_MODE)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per read scenario")
+    parser.add_argument("--writes", type=int, default=200, help="requests per write scenario")
+    parser.add_argument("--only", help="run only scenarios whose name contains this text")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--out", default=os.path.join(ROOT, "bench", "results", "latest.json"))
+    args = parser.parse_args()
+
+    seed.check_target(args.allow_remote)
+    db.initialize_db()
+    if args.reset:
+        seed.reset()
+    ids = seed.seed(seed.volumes_from_args(args), args.seed) if args.seed_data else seed.load_ids()
+    if not all(ids.values()):
+        raise SystemExit("The database is empty; run with --seed-data.")
+    tag = "%d.%d" % (os.getpid(), int(time.time()))
+    rng = random.Random(args.seed)
+    fresh = fixtures(ids, args.writes, rng, tag)
+
+    env = dict(os.environ, DB_MODE=args.db_mode, MIGRATE_ON_STARTUP="0")
+    server = start_server(args.host, args.port, env)
+    results = []
+    try:
+        for name, next_request, budget in scenarios(ids, fresh, args.writes, Picker(args.seed), tag):
+            if args.only and args.only not in name:
+                continue
+            # Scenarios with a budget (writes, deletes, exports) run until it is
+            # spent; reads run for the configured duration.
+            duration = args.duration if budget is None else float("inf")
+            result = run_load(args.host, args.port, next_request, args.concurrency, duration, budget)
+            result["name"] = name
+            result["rssKb"], result["peakRssKb"] = memory_kb(server.pid)
+            results.append(result)
+            latency = result["latencyMs"]
+            print("%-48s %8s req/s  p50 %8s ms  p95 %8s ms  p99 %8s ms  errors %d" % (
+                name, result["throughput"], latency["p50"], latency["p95"], latency["p99"], result["errors"]))
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "dbMode": args.db_mode,
+            "dbBackend": db.DB_BACKEND,
+            "dbHost": db.DB_HOST if db.DB_BACKEND == "mysql" else db.SQLITE_PATH,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "writes": args.writes,
+            "seed": args.seed,
+            "rows": {table: len(table_ids) for table, table_ids in ids.items()},
+        },
+        "scenarios": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as out:
+        json.dump(report, out, indent=2)
+    print("Results written to %s" % args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# bench/seed.py
+# Deterministic synthetic data for the load benchmarks.
+#
+#   python -m bench.seed --tenants 5000 --payments-per-lease 24 --reset
+#
+# Writes through crud.bulk_insert(), so seeding a few hundred thousand rows
+# takes seconds. Refuses to touch the default (shared class) database unless
+# --allow-remote is given: --reset deletes every row in the schema.
+from datetime import date, timedelta
+import argparse
+import random
+
+import crud
+import db
+
+DEFAULT_VOLUMES = {
+    "tenants": 1000,
+    "properties": 50,
+    "units_per_property": 20,
+    "payments_per_lease": 12,
+    "maintenance_requests": 500,
+}
+
+# Child tables first, so deletes never trip a foreign key.
+RESET_ORDER = ["UnitMaintenanceRequests", "Payments", "Leases", "MaintenanceRequests", "Units", "Properties",
+               "Tenants"]
+
+UNIT_TYPES = ["Studio", "1BR", "2BR", "3BR"]
+PAYMENT_METHODS = ["Card", "ACH", "Check", "Cash"]
+REQUEST_STATUSES = ["Open", "In Progress", "Closed"]
+CITIES = [("Corvallis", "OR"), ("Portland", "OR"), ("Eugene", "OR"), ("Salem", "OR"), ("Bend", "OR")]
+
+# Fixed "today" so generated dates do not depend on when the seed runs.
+EPOCH = date(2024, 1, 1)
+
+
+def check_target(allow_remote=False):
+    if db.BACKEND.dialect == "mysql" and db.DB_HOST == "classmysql.engr.oregonstate.edu" and not allow_remote:
+        raise SystemExit("Refusing to seed the shared class database; set DB_HOST to a local server "
+                         "or pass --allow-remote.")
+
+
+def reset():
+    with db.pooled_connection() as connection:
+        cursor = connection.cursor()
+        for table in RESET_ORDER:
+            cursor.execute("DELETE FROM %s" % table)
+        connection.commit()
+        cursor.close()
+
+
+def insert(table, columns, rows, returns_ids=True):
+    with db.pooled_connection() as connection:
+        ids = crud.bulk_insert(connection, table, columns, rows, returns_ids=returns_ids)
+        connection.commit()
+        return ids
+
+
+def tenant_row(rng, tag, i):
+    return {
+        "firstName": "First%d" % i,
+        "lastName": "Last%d" % i,
+        "phoneNumber": "%010d" % rng.randrange(10 ** 10),
+        "email": "tenant.%s.%d@example.com" % (tag, i),
+    }
+
+
+def property_row(rng, i):
+    city, state = rng.choice(CITIES)
+    return {
+        "address": "%d Bench St" % i,
+        "city": city,
+        "state": state,
+        "zipCode": "97%03d" % rng.randrange(1000),
+        "propertyValue": rng.randrange(200000, 5000000),
+    }
+
+
+def unit_row(rng, property_id, n, status=None):
+    return {
+        "propertyID": property_id,
+        "unitNumber": "%d" % (n + 1),
+        "unitType": rng.choice(UNIT_TYPES),
+        "status": status or ("Occupied" if rng.random() < 0.8 else "Vacant"),
+    }
+
+
+def lease_row(rng, unit_id, tenant_id):
+    start = EPOCH - timedelta(days=rng.randrange(730))
+    return {
+        "unitID": unit_id,
+        "tenantID": tenant_id,
+        "startDate": start,
+        "endDate": start + timedelta(days=365),
+        "rentPrice": rng.randrange(900, 3500),
+    }
+
+
+def payment_row(rng, lease_id, lease, month):
+    return {
+        "tenantID": lease["tenantID"],
+        "leaseID": lease_id,
+        "amount": lease["rentPrice"],
+        "paymentDate": lease["startDate"] + timedelta(days=30 * month),
+        "paymentMethod": rng.choice(PAYMENT_METHODS),
+    }
+
+
+def request_row(rng, i):
+    return {
+        "description": "Bench request %d" % i,
+        "status": rng.choice(REQUEST_STATUSES),
+        "submissionDate": EPOCH - timedelta(days=rng.randrange(365)),
+        "completionDate": None,
+    }
+
+
+def json_ready(row):
+    """
+    Returns a copy of a generated row with dates as ISO strings, for use as a
+    request body.
+    """
+    return {key: value.isoformat() if isinstance(value, date) else value for key, value in row.items()}
+
+
+def seed(volumes=None, seed_value=42):
+    """
+    Inserts a reproducible data set sized by volumes (see DEFAULT_VOLUMES).
+    Returns {table: [generated IDs]}.
+    """
+    volumes = dict(DEFAULT_VOLUMES, **(volumes or {}))
+    rng = random.Random(seed_value)
+
+    tenants = [tenant_row(rng, seed_value, i) for i in range(volumes["tenants"])]
+    tenant_ids = insert("Tenants", crud.TABLES["Tenants"][1], tenants)
+
+    properties = [property_row(rng, i) for i in range(volumes["properties"])]
+    property_ids = insert("Properties", crud.TABLES["Properties"][1], properties)
+
+    units = [unit_row(rng, property_id, n)
+             for property_id in property_ids for n in range(volumes["units_per_property"])]
+    unit_ids = crud.create_units(units)
+
+    leases = [lease_row(rng, unit_id, rng.choice(tenant_ids))
+              for unit_id, unit in zip(unit_ids, units) if unit["status"] == "Occupied"]
+    lease_ids = crud.create_leases(leases)
+
+    payments = [payment_row(rng, lease_id, lease, month)
+                for lease_id, lease in zip(lease_ids, leases) for month in range(volumes["payments_per_lease"])]
+    payment_ids = insert("Payments", crud.TABLES["Payments"][1], payments)
+
+    requests = [request_row(rng, i) for i in range(volumes["maintenance_requests"])]
+    request_ids = insert("MaintenanceRequests", crud.TABLES["MaintenanceRequests"][1], requests)
+
+    associations = [{"unitID": rng.choice(unit_ids), "requestID": request_id} for request_id in request_ids]
+    insert("UnitMaintenanceRequests", ["unitID", "requestID"], associations, returns_ids=False)
+
+    return {
+        "Tenants": tenant_ids,
+        "Properties": property_ids,
+        "Units": unit_ids,
+        "Leases": lease_ids,
+        "Payments": payment_ids,
+        "MaintenanceRequests": request_ids,
+        "UnitMaintenanceRequests": [(row["unitID"], row["requestID"]) for row in associations],
+    }
+
+
+def load_ids():
+    """
+    Reads back the IDs already in the database, for benchmarking a data set
+    seeded by an earlier run. Returns the same shape as seed().
+    """
+    ids = {}
+    with db.pooled_connection() as connection:
+        cursor = connection.cursor()
+        for table, (key_column, _) in crud.TABLES.items():
+            cursor.execute("SELECT %s FROM %s ORDER BY %s" % (key_column, table, key_column))
+            ids[table] = [row[key_column] for row in cursor.fetchall()]
+        cursor.execute("SELECT unitID, requestID FROM UnitMaintenanceRequests")
+        ids["UnitMaintenanceRequests"] = [(row["unitID"], row["requestID"]) for row in cursor.fetchall()]
+        cursor.close()
+    return ids
+
+
+def add_volume_arguments(parser):
+    for name, default in DEFAULT_VOLUMES.items():
+        parser.add_argument("--" + name.replace("_", "-"), type=int, default=default)
+
+
+def volumes_from_args(args):
+    return {name: getattr(args, name) for name in DEFAULT_VOLUMES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database with benchmark data.")
+    add_volume_arguments(parser)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="delete all existing rows first")
+    parser.add_argument("--allow-remote", action="store_true")
+    args = parser.parse_args()
+    check_target(args.allow_remote)
+    db.initialize_db()
+    if args.reset:
+        reset()
+    ids = seed(volumes_from_args(args), args.seed)
+    for table, table_ids in ids.items():
+        print("%-24s %d rows" % (table, len(table_ids)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# cache.py
+# In-process read-through cache for single-row lookups.
+#
+# Entries expire after a TTL as well as being invalidated by the write paths in
+# crud.py, because invalidation only reaches this process: with several
+# workers, the TTL is what bounds how stale another worker's copy can get. The
+# same goes for a row re-read from a read replica that lags the primary.
+#
+# Lookups made inside db.transaction() (e.g. the get operations of a POST
+# /batch) bypass the cache altogether: they can see the transaction's own
+# uncommitted writes, which must not be cached in case it rolls back, and
+# should not be served a committed copy that predates them.
+from collections import OrderedDict
+import functools
+import inspect
+import threading
+import time
+
+from db import in_transaction
+
+ENTITY_CACHE_MAX_ENTRIES = 10000
+ENTITY_CACHE_TTL_SECONDS = 30
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread-safe LRU cache whose entries also expire `ttl` seconds after they
+    were stored. Holds at most `maxsize` entries, evicting the least recently
+    used one when full.
+    """
+
+    def __init__(self, maxsize=ENTITY_CACHE_MAX_ENTRIES, ttl=ENTITY_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._generation = 0  # bumped by every invalidation, see version()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Returns the cached value for key, or MISSING.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def version(self):
+        """
+        Returns a token to pass to put() for a value about to be loaded. If any
+        invalidation happens before the put(), the put is skipped, so a slow
+        read can never re-cache a row that a concurrent write just changed.
+        Tracking this globally rather than per key errs towards an occasional
+        extra miss but keeps no state for keys that are never cached.
+        """
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, version=None):
+        with self._lock:
+            if version is not None and version != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+entity_cache = LRUCache()
+
+
+def cached(table: str):
+    """
+    Decorates a single-row lookup so its non-empty results are served from
+    entity_cache under the key (table, *args), except inside a transaction.
+    Works for both plain and async functions. Callers get their own copy of
+    the row, so mutating it cannot corrupt the cached entry.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args):
+                if in_transaction():
+                    return await func(*args)
+                key = (table,) + args
+                value = entity_cache.get(key)
+                if value is not MISSING:
+                    return dict(value)
+                version = entity_cache.version()
+                result = await func(*args)
+                if result:
+                    entity_cache.put(key, dict(result), version)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            if in_transaction():
+                return func(*args)
+            key = (table,) + args
+            value = entity_cache.get(key)
+            if value is not MISSING:
+                return dict(value)
+            version = entity_cache.version()
+            result = func(*args)
+            if result:
+                entity_cache.put(key, dict(result), version)
+            return result
+        return wrapper
+    return decorator
+
+
+def invalidate(table: str, *key):
+    """
+    Drops the cached row for (table, *key), if any.
+    """
+    entity_cache.invalidate((table,) + key)
@@ -0,0 +1,300 @@
+# changes.py
+# Server-Sent Events feed of every insert, update and delete made through the
+# CRUD layer, behind GET /changes.
+#
+# The write paths record each change in the ChangeLog table on their own
+# transaction (crud.log_change()). One poller per process reads new entries
+# into an in-memory buffer and wakes the connected clients, which stream
+# events from that buffer; so the database sees one small range query per
+# poll however many clients are listening. A client that reconnects with the
+# last seq it saw (Last-Event-ID or ?after=) is replayed what it missed, from
+# the buffer or, if it is too far behind, from the ChangeLog itself.
+#
+# seq is an auto-increment value, assigned when a change is written rather
+# than when it commits, so a slow transaction can commit a lower seq after a
+# higher one is already visible. The poller therefore reads the ChangeLog on
+# the primary, publishes strictly in seq order and holds back at a gap for as
+# long as a write transaction that was open when the gap appeared is still
+# open, since only such a transaction can fill it. Once they have all ended,
+# the missing seqs belong to rolled-back writes (or are auto-increment holes)
+# and the poller moves past them right away.
+#
+# Two cases still skip a gap that may yet be filled, and lose the change for
+# /changes subscribers (delta sync and the tables themselves are unaffected):
+# - on MySQL without the PROCESS privilege the open transactions cannot be
+#   seen, and a gap is skipped after CHANGE_GAP_TIMEOUT_SECONDS, so a write
+#   committing later than that after its ChangeLog insert is missed;
+# - a write transaction still open after CHANGE_GAP_MAX_SECONDS is given up
+#   on, so as not to stall the feed indefinitely.
+import asyncio
+import json
+import logging
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+CHANGE_POLL_SECONDS = 0.5
+CHANGE_GAP_TIMEOUT_SECONDS = 2.0
+CHANGE_GAP_MAX_SECONDS = 60.0
+CHANGE_PAGE_SIZE = 500
+# Recent events kept in memory for clients to catch up from.
+CHANGE_BUFFER_SIZE = 10000
+# ChangeLog entries kept in the database for clients resuming after a long
+# disconnect; older ones are pruned once an hour.
+CHANGE_LOG_RETAIN = 1000000
+CHANGE_PRUNE_SECONDS = 3600
+# Idle connections get a comment line this often so proxies keep them open.
+KEEPALIVE_SECONDS = 15
+
+# ChangeLog table names and the API resource names events are published under.
+RESOURCES = {
+    "Tenants": "tenants",
+    "Properties": "properties",
+    "Units": "units",
+    "MaintenanceRequests": "maintenance_requests",
+    "Leases": "leases",
+    "Payments": "payments",
+    "UnitMaintenanceRequests": "unit_maintenance_requests",
+}
+
+
+class InvalidChangeQuery(ValueError):
+    """Raised for an unknown resource in a /changes subscription."""
+
+
+def parse_resources(resources):
+    """
+    Parses a comma-separated list of resource names, e.g. "units,leases", into
+    a set. None or an empty string means every resource.
+    """
+    if not resources:
+        return None
+    names = {name.strip() for name in resources.split(",") if name.strip()}
+    unknown = names - set(RESOURCES.values())
+    if unknown:
+        raise InvalidChangeQuery("Unknown resource: %s" % ", ".join(sorted(unknown)))
+    return names
+
+
+def make_event(row: dict) -> dict:
+    return {
+        "seq": row["seq"],
+        "resource": RESOURCES[row["tableName"]],
+        "operation": row["operation"],
+        "key": json.loads(row["rowKey"]),
+        "changedAt": row["changedAt"],
+    }
+
+
+def format_event(event: dict) -> bytes:
+    return b"id: %d\nevent: change\ndata: %s\n\n" % (event["seq"], dumps(event))
+
+
+class ThreadedStore:
+    """
+    Runs crud.py's blocking change-log functions in the threadpool, giving
+    them the same awaitable interface as async_crud.py's.
+    """
+
+    def __init__(self, module):
+        self.module = module
+
+    async def get_changes(self, after, limit):
+        return await run_in_threadpool(self.module.get_changes, after, limit)
+
+    async def get_change_bounds(self):
+        return await run_in_threadpool(self.module.get_change_bounds)
+
+    async def get_open_transactions(self):
+        return await run_in_threadpool(self.module.get_open_transactions)
+
+    async def prune_changes(self, through):
+        return await run_in_threadpool(self.module.prune_changes, through)
+
+
+class Gap:
+    """
+    A seq missing from the ChangeLog while higher ones are visible: when it
+    was noticed, the open write transactions that might still fill it, and
+    whether the poller may move past it.
+    """
+
+    def __init__(self, seq):
+        self.seq = seq
+        self.since = time.monotonic()
+        self.waiting = None
+        self.passable = False
+
+
+class ChangeFeed:
+    """
+    Polls the ChangeLog through `store` (async_crud, or crud wrapped in
+    ThreadedStore) and fans new events out to every subscriber. The poller is
+    started by the first subscriber and runs until stop().
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.position = 0  # highest seq published
+        self.floor = 0  # every event above this seq is in the buffer
+        self.increment = 1
+        self.buffer = []
+        self._gap = None  # the Gap the poller is holding back at, if any
+        self._advanced = None
+        self._task = None
+        self._ready = None
+
+    async def start(self):
+        if self._task is None:
+            self._ready = asyncio.Event()
+            self._advanced = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+        await self._ready.wait()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                bounds = await self.store.get_change_bounds()
+                break
+            except Exception:
+                logger.exception("Could not read the change log; retrying")
+                await asyncio.sleep(CHANGE_POLL_SECONDS)
+        self.position = self.floor = bounds["last"] or 0
+        self.increment = bounds["increment"]
+        self._ready.set()
+        pruned_at = time.monotonic()
+        while True:
+            rows = []
+            try:
+                rows = await self.store.get_changes(self.position, CHANGE_PAGE_SIZE)
+                self.publish(rows)
+                if self._gap is not None and await self.check_gap():
+                    # Re-read: the missing seqs may have committed since.
+                    rows = await self.store.get_changes(self.position, CHANGE_PAGE_SIZE)
+                    self.publish(rows)
+                if time.monotonic() - pruned_at > CHANGE_PRUNE_SECONDS:
+                    pruned_at = time.monotonic()
+                    await self.store.prune_changes(self.position - CHANGE_LOG_RETAIN * self.increment)
+            except Exception:
+                logger.exception("Change feed poll failed")
+            if len(rows) < CHANGE_PAGE_SIZE:
+                await asyncio.sleep(CHANGE_POLL_SECONDS)
+
+    async def check_gap(self) -> bool:
+        """
+        Decides whether the poller may move past the gap it is holding back
+        at: once no write transaction open when the gap was first checked is
+        still open, or (if open transactions cannot be seen) once the gap is
+        CHANGE_GAP_TIMEOUT_SECONDS old. Returns True if it may.
+        """
+        gap = self._gap
+        age = time.monotonic() - gap.since
+        if age >= CHANGE_GAP_MAX_SECONDS:
+            logger.warning("Change feed skipping seq %d after waiting %.0fs for it", gap.seq, age)
+            gap.passable = True
+            return True
+        open_transactions = await self.store.get_open_transactions()
+        if open_transactions is None:
+            gap.passable = age >= CHANGE_GAP_TIMEOUT_SECONDS
+        else:
+            gap.waiting = open_transactions if gap.waiting is None else gap.waiting & open_transactions
+            gap.passable = not gap.waiting
+        return gap.passable
+
+    def publish(self, rows):
+        """
+        Appends the ChangeLog rows that directly follow the current position
+        to the buffer, stopping at a gap until check_gap() lets it pass, and
+        wakes the subscribers if anything was added.
+        """
+        published = False
+        for row in rows:
+            expected = self.position + self.increment
+            if row["seq"] != expected:
+                if self._gap is None or self._gap.seq != expected:
+                    self._gap = Gap(expected)
+                if not self._gap.passable:
+                    break
+                logger.debug("Change feed skipping seq %d..%d", expected, row["seq"] - self.increment)
+            self._gap = None
+            self.buffer.append(make_event(row))
+            self.position = row["seq"]
+            published = True
+        if len(self.buffer) > 2 * CHANGE_BUFFER_SIZE:
+            self.floor = self.buffer[-CHANGE_BUFFER_SIZE - 1]["seq"]
+            del self.buffer[:-CHANGE_BUFFER_SIZE]
+        if published:
+            self._advanced.set()
+            self._advanced = asyncio.Event()
+
+    def buffered_after(self, seq: int) -> list:
+        """
+        Returns the buffered events above seq (binary search on the sorted buffer).
+        """
+        low, high = 0, len(self.buffer)
+        while low < high:
+            middle = (low + high) // 2
+            if self.buffer[middle]["seq"] <= seq:
+                low = middle + 1
+            else:
+                high = middle
+        return self.buffer[low:]
+
+    async def backlog_after(self, seq: int):
+        """
+        Reads published events above seq from the ChangeLog, for a client
+        further behind than the buffer reaches. Returns (events, the seq the
+        client has caught up to).
+        """
+        rows = await self.store.get_changes(seq, CHANGE_PAGE_SIZE)
+        events = [make_event(row) for row in rows if row["seq"] <= self.floor]
+        # With nothing left below the buffer, the client skips to its start.
+        return events, events[-1]["seq"] if events else self.floor
+
+    async def stream(self, after, resources, is_disconnected):
+        """
+        Yields SSE messages for the changes after seq `after` (None: from now
+        on) to the resources in `resources` (None: all of them), until the
+        client disconnects. A client resuming from a seq that has already been
+        pruned gets a `reset` event and should reload its copy.
+        """
+        await self.start()
+        if after is None:
+            after = self.position
+        elif after < self.floor:
+            bounds = await self.store.get_change_bounds()
+            if bounds["first"] is not None and after + self.increment < bounds["first"]:
+                yield b"event: reset\ndata: {}\n\n"
+                after = self.position
+        last = after
+        while not await is_disconnected():
+            advanced = self._advanced
+            if last < self.floor:
+                events, last = await self.backlog_after(last)
+            else:
+                events = self.buffered_after(last)
+                if not events:
+                    try:
+                        await asyncio.wait_for(advanced.wait(), KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield b": keepalive\n\n"
+                    continue
+                last = events[-1]["seq"]
+            chunk = b"".join(
+                format_event(event) for event in events if resources is None or event["resource"] in resources
+            )
+            if chunk:
+                yield chunk
@@ -1,8 +1,126 @@
 # crud.py
-from db import get_connection
-from pymysql.cursors import DictCursor
-
-connection = get_connection()
+from cache import cached, invalidate
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+from db import BACKEND, in_transaction, pin_to_primary, pooled_connection, read_connection
+from migrations import SYNC_TABLES, rebuild_property_summaries
+from pagination import DEFAULT_PAGE_SIZE, SYNC_FROM_START, ExpiredSyncToken, InvalidCursor, InvalidListQuery, \
+    decode_cursor, decode_sync_token, encode_cursor, encode_sync_token, make_page, page_query
+from queries import QUERIES
+from search import SEARCH_DEFAULT_LIMIT, SEARCH_KEYS, SEARCH_MIN_PREFIX, prefix_bounds, query_words, row_terms
+from serialization import dumps
+from typing import List, Optional
+import json
+import os
+import threading
+import time
+
+# Primary key and data columns of each table, for the generic helpers that
+# build SQL from caller-supplied column names. Only names listed here are ever
+# interpolated into a statement.
+TABLES = {
+    "Tenants": ("tenantID", ["firstName", "lastName", "phoneNumber", "email"]),
+    "Properties": ("propertyID", ["address", "city", "state", "zipCode", "propertyValue"]),
+    "Units": ("unitID", ["propertyID", "unitNumber", "unitType", "status"]),
+    "MaintenanceRequests": ("requestID", ["description", "status", "submissionDate", "completionDate"]),
+    "Leases": ("leaseID", ["unitID", "tenantID", "startDate", "endDate", "rentPrice"]),
+    "Payments": ("paymentID", ["tenantID", "leaseID", "amount", "paymentDate", "paymentMethod"]),
+}
+
+# Filters and sort columns accepted by each list endpoint, passed through to
+# pagination.page_query(). Each filter is a fixed SQL condition whose value is
+# bound as a parameter. Every filter and sort column is indexed (see
+# migrations.REQUIRED_INDEXES) so a filtered or sorted page stays a range scan.
+LISTINGS = {
+    "Tenants": {"allowed_filters": {}, "sortable": []},
+    "Properties": {
+        "allowed_filters": {"city": "city = %(city)s"},
+        "sortable": [],
+    },
+    "Units": {
+        "allowed_filters": {"propertyID": "propertyID = %(propertyID)s", "status": "status = %(status)s"},
+        "sortable": [],
+    },
+    "MaintenanceRequests": {
+        "allowed_filters": {
+            "status": "status = %(status)s",
+            "from": "submissionDate >= %(from)s",
+            "to": "submissionDate <= %(to)s",
+        },
+        "sortable": ["submissionDate"],
+    },
+    "Leases": {
+        "allowed_filters": {
+            "unitID": "unitID = %(unitID)s",
+            "tenantID": "tenantID = %(tenantID)s",
+            "from": "startDate >= %(from)s",
+            "to": "startDate <= %(to)s",
+        },
+        "sortable": ["startDate"],
+    },
+    "Payments": {
+        "allowed_filters": {
+            "leaseID": "leaseID = %(leaseID)s",
+            "tenantID": "tenantID = %(tenantID)s",
+            "from": "paymentDate >= %(from)s",
+            "to": "paymentDate <= %(to)s",
+        },
+        "sortable": ["paymentDate"],
+    },
+    "UnitMaintenanceRequests": {
+        "allowed_filters": {"unitID": "unitID = %(unitID)s", "requestID": "requestID = %(requestID)s"},
+        "sortable": [],
+    },
+}
+
+
+def patch_statements(table: str, changes: dict):
+    """
+    Builds the UPDATE for the whitelisted columns in changes (None if there are
+    none) and the SELECT that reads the row back, both keyed on %(key)s.
+    Returns (update_query, select_query, params).
+    """
+    key_column, columns = TABLES[table]
+    changes = {column: value for column, value in changes.items() if column in columns}
+    update = None
+    if changes:
+        assignments = ", ".join("%s = %%(%s)s" % (column, column) for column in changes)
+        update = "UPDATE %s SET %s WHERE %s = %%(key)s" % (table, assignments, key_column)
+    select = "SELECT %s FROM %s WHERE %s = %%(key)s" % (", ".join([key_column] + columns), table, key_column)
+    return update, select, changes
+
+
+def patch_row(table: str, key: int, changes: dict):
+    """
+    Writes only the changed columns of one row and reads the result back on the
+    same connection before committing, keeping the property summaries in step
+    for tables in SUMMARY_COUNTERS and the search terms for tables in
+    SEARCH_KEYS. Returns the updated row, or None if the key does not exist.
+    """
+    update, select, params = patch_statements(table, changes)
+    count = SUMMARY_COUNTERS.get(table) if update is not None else None
+    params["key"] = key
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        if count is not None:
+            count(cursor, key, -1, params)
+        if update is not None:
+            cursor.execute(update, params)
+            if cursor.rowcount == 0:
+                cursor.close()
+                return None
+            log_change(cursor, table, "update", {TABLES[table][0]: key})
+        if count is not None:
+            count(cursor, key, 1, params)
+        cursor.execute(select, params)
+        result = cursor.fetchone()
+        if update is not None and table in SEARCH_KEYS:
+            index_row(cursor, table, key, result)
+        connection.commit()
+        if update is not None:
+            invalidate(table, key)
+        cursor.close()
+        return result
 
 
 # Tenant CRUD
@@ -11,78 +129,116 @@ def create_tenant(tenant_data: dict):
     Inserts a new tenant into the Tenants table.
     Expects tenant_data with keys: firstName, lastName, phoneNumber, email.
     """
-    query = """
-    INSERT INTO Tenants (firstName, lastName, phoneNumber, email)
-    VALUES (%(firstName)s, %(lastName)s, %(phoneNumber)s, %(email)s)
+    query = QUERIES["create_tenant"]
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, tenant_data)
+        tenantID = cursor.lastrowid
+        index_row(cursor, "Tenants", tenantID, tenant_data)
+        log_change(cursor, "Tenants", "insert", {"tenantID": tenantID})
+        connection.commit()
+        cursor.close()
+        return tenantID
+
+
+def create_tenants(tenants_data: List[dict]):
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, tenant_data)
-    connection.commit()
-    tenantID = cursor.lastrowid
-    cursor.close()
-    return tenantID
+    Inserts many tenants into the Tenants table in a single transaction, using
+    batched multi-row INSERTs. Returns the generated tenantIDs in input order.
+    """
+    columns = ["firstName", "lastName", "phoneNumber", "email"]
+    with pooled_connection() as connection:
+        tenantIDs = bulk_insert(connection, "Tenants", columns, tenants_data)
+        index_rows(connection, "Tenants", tenantIDs, tenants_data)
+        log_changes(connection, "Tenants", "insert", [{"tenantID": tenantID} for tenantID in tenantIDs])
+        connection.commit()
+        return tenantIDs
 
 
+@cached("Tenants")
 def get_tenant(tenantID: int):
     """
     Returns a single tenant record by tenantID.
     """
-    query = """
-    SELECT tenantID, firstName, lastName, phoneNumber, email
-    FROM Tenants
-    WHERE tenantID = %(tenantID)s
-    """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, {"tenantID": tenantID})
-    result = cursor.fetchone()
-    cursor.close()
-    return result
+    query = QUERIES["get_tenant"]
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, {"tenantID": tenantID})
+        result = cursor.fetchone()
+        cursor.close()
+        return result
 
 
-def get_tenants():
+def get_tenants(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                sort: Optional[str] = None, since: Optional[str] = None):
     """
-    Returns all tenant records.
+    Returns one page of tenant records ordered by `sort` (default tenantID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `since` lists only what changed after a sync token (see get_changed_rows()).
     """
-    query = """
-    SELECT tenantID, firstName, lastName, phoneNumber, email
-    FROM Tenants
+    if since is not None:
+        return get_changed_rows("Tenants", QUERIES["get_changed_tenants"], ["tenantID"], limit, after, filters, sort, since)
+    query, params, order = page_query(QUERIES["get_tenants"], ["tenantID"], after, limit, filters=filters, sort=sort, **LISTINGS["Tenants"])
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+        return make_page(results, order, limit)
+
+
+def search_tenants(q: str, limit: int = SEARCH_DEFAULT_LIMIT):
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query)
-    results = cursor.fetchall()
-    cursor.close()
-    return results
+    Returns up to `limit` tenants matching every word of q by name, email or
+    phone number, best match first. Result: {"items": [...]}, each with a score.
+    """
+    return search_rows("Tenants", q, limit)
 
 
 def update_tenant(tenantID: int, tenant_data: dict):
     """
     Updates a tenant record identified by tenantID.
     Expects tenant_data with keys: firstName, lastName, phoneNumber, email.
+    Returns the number of matching rows, so 0 means no record has that tenantID.
     """
-    query = """
-    UPDATE Tenants
-    SET firstName = %(firstName)s,
-        lastName = %(lastName)s,
-        phoneNumber = %(phoneNumber)s,
-        email = %(email)s
-    WHERE tenantID = %(tenantID)s
-    """
+    query = QUERIES["update_tenant"]
     tenant_data["tenantID"] = tenantID
-    cursor = connection.cursor()
-    cursor.execute(query, tenant_data)
-    connection.commit()
-    cursor.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, tenant_data)
+        matched = cursor.rowcount
+        if matched:
+            index_row(cursor, "Tenants", tenantID, tenant_data)
+            log_change(cursor, "Tenants", "update", {"tenantID": tenantID})
+        connection.commit()
+        invalidate("Tenants", tenantID)
+        cursor.close()
+        return matched
+
+
+def patch_tenant(tenantID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a tenant record.
+    Returns the full updated record, or None if no record has that tenantID.
+    """
+    return patch_row("Tenants", tenantID, changes)
 
 
 def delete_tenant(tenantID: int):
     """
     Deletes a tenant record by tenantID.
     """
-    query = "DELETE FROM Tenants WHERE tenantID = %(tenantID)s"
-    cursor = connection.cursor()
-    cursor.execute(query, {"tenantID": tenantID})
-    connection.commit()
-    cursor.close()
+    query = QUERIES["delete_tenant"]
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, {"tenantID": tenantID})
+        if cursor.rowcount:
+            unindex_row(cursor, "Tenants", tenantID)
+            log_change(cursor, "Tenants", "delete", {"tenantID": tenantID})
+        connection.commit()
+        invalidate("Tenants", tenantID)
+        cursor.close()
 
 
 # Property CRUD
@@ -92,79 +248,103 @@ def create_property(property_data: dict):
     Inserts a new property into the Properties table.
     Expects property_data with keys: address, city, state, zipCode, propertyValue.
     """
-    query = """
-    INSERT INTO Properties (address, city, state, zipCode, propertyValue)
-    VALUES (%(address)s, %(city)s, %(state)s, %(zipCode)s, %(propertyValue)s)
-    """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, property_data)
-    connection.commit()
-    propertyID = cursor.lastrowid
-    cursor.close()
-    return propertyID
+    query = QUERIES["create_property"]
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, property_data)
+        propertyID = cursor.lastrowid
+        index_row(cursor, "Properties", propertyID, property_data)
+        log_change(cursor, "Properties", "insert", {"propertyID": propertyID})
+        connection.commit()
+        cursor.close()
+        return propertyID
 
 
+@cached("Properties")
 def get_property(propertyID: int):
     """
     Returns a single property record by propertyID.
     """
-    query = """
-    SELECT propertyID, address, city, state, zipCode, propertyValue
-    FROM Properties
-    WHERE propertyID = %(propertyID)s
-    """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, {"propertyID": propertyID})
-    result = cursor.fetchone()
-    cursor.close()
-    return result
+    query = QUERIES["get_property"]
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, {"propertyID": propertyID})
+        result = cursor.fetchone()
+        cursor.close()
+        return result
 
 
-def get_properties():
+def get_properties(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                   sort: Optional[str] = None, since: Optional[str] = None):
     """
-    Returns all property records.
+    Returns one page of property records ordered by `sort` (default propertyID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `since` lists only what changed after a sync token (see get_changed_rows()).
     """
-    query = """
-    SELECT propertyID, address, city, state, zipCode, propertyValue
-    FROM Properties
+    if since is not None:
+        return get_changed_rows("Properties", QUERIES["get_changed_properties"], ["propertyID"], limit, after, filters, sort, since)
+    query, params, order = page_query(QUERIES["get_properties"], ["propertyID"], after, limit, filters=filters, sort=sort, **LISTINGS["Properties"])
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+        return make_page(results, order, limit)
+
+
+def search_properties(q: str, limit: int = SEARCH_DEFAULT_LIMIT):
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query)
-    results = cursor.fetchall()
-    cursor.close()
-    return results
+    Returns up to `limit` properties matching every word of q by address,
+    city, state or zip code, best match first. Result: {"items": [...]}, each
+    with a score.
+    """
+    return search_rows("Properties", q, limit)
 
 
 def update_property(propertyID: int, property_data: dict):
     """
     Updates a property record identified by propertyID.
     Expects property_data with keys: address, city, state, zipCode, propertyValue.
+    Returns the number of matching rows, so 0 means no record has that propertyID.
     """
-    query = """
-    UPDATE Properties
-    SET address = %(address)s,
-        city = %(city)s,
-        state = %(state)s,
-        zipCode = %(zipCode)s,
-        propertyValue = %(propertyValue)s
-    WHERE propertyID = %(propertyID)s
-    """
+    query = QUERIES["update_property"]
     property_data["propertyID"] = propertyID
-    cursor = connection.cursor()
-    cursor.execute(query, property_data)
-    connection.commit()
-    cursor.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, property_data)
+        matched = cursor.rowcount
+        if matched:
+            index_row(cursor, "Properties", propertyID, property_data)
+            log_change(cursor, "Properties", "update", {"propertyID": propertyID})
+        connection.commit()
+        invalidate("Properties", propertyID)
+        cursor.close()
+        return matched
+
+
+def patch_property(propertyID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a property record.
+    Returns the full updated record, or None if no record has that propertyID.
+    """
+    return patch_row("Properties", propertyID, changes)
 
 
 def delete_property(propertyID: int):
     """
     Deletes a property record by propertyID.
     """
-    query = "DELETE FROM Properties WHERE propertyID = %(propertyID)s"
-    cursor = connection.cursor()
-    cursor.execute(query, {"propertyID": propertyID})
-    connection.commit()
-    cursor.close()
+    query = QUERIES["delete_property"]
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, {"propertyID": propertyID})
+        if cursor.rowcount:
+            unindex_row(cursor, "Properties", propertyID)
+            log_change(cursor, "Properties", "delete", {"propertyID": propertyID})
+        connection.commit()
+        invalidate("Properties", propertyID)
+        cursor.close()
 
 
 # Units CRUD
@@ -174,78 +354,112 @@ def create_unit(unit_data: dict):
     Inserts a new unit into the Units table.
     Expects unit_data with keys: propertyID, unitNumber, unitType, status.
     """
-    query = """
-    INSERT INTO Units (propertyID, unitNumber, unitType, status)
-    VALUES (%(propertyID)s, %(unitNumber)s, %(unitType)s, %(status)s)
+    query = QUERIES["create_unit"]
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, unit_data)
+        unitID = cursor.lastrowid
+        count_unit(cursor, unitID, 1)
+        log_change(cursor, "Units", "insert", {"unitID": unitID})
+        connection.commit()
+        cursor.close()
+        return unitID
+
+
+def create_units(units_data: List[dict]):
+    """
+    Inserts many units into the Units table in a single transaction, using
+    batched multi-row INSERTs. Returns the generated unitIDs in input order.
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, unit_data)
-    connection.commit()
-    unitID = cursor.lastrowid
-    cursor.close()
-    return unitID
+    columns = ["propertyID", "unitNumber", "unitType", "status"]
+    with pooled_connection() as connection:
+        unitIDs = bulk_insert(connection, "Units", columns, units_data)
+        count_rows(connection, "count_unit", "unitID", unitIDs)
+        log_changes(connection, "Units", "insert", [{"unitID": unitID} for unitID in unitIDs])
+        connection.commit()
+        return unitIDs
 
 
+@cached("Units")
 def get_unit(unitID: int):
     """
     Returns a single unit record by unitID.
     """
-    query = """
-    SELECT unitID, propertyID, unitNumber, unitType, status
-    FROM Units
-    WHERE unitID = %(unitID)s
-    """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, {"unitID": unitID})
-    result = cursor.fetchone()
-    cursor.close()
-    return result
+    query = QUERIES["get_unit"]
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, {"unitID": unitID})
+        result = cursor.fetchone()
+        cursor.close()
+        return result
 
 
-def get_units():
+def get_units(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+              sort: Optional[str] = None, since: Optional[str] = None):
     """
-    Returns all unit records.
+    Returns one page of unit records ordered by `sort` (default unitID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `since` lists only what changed after a sync token (see get_changed_rows()).
     """
-    query = """
-    SELECT unitID, propertyID, unitNumber, unitType, status
-    FROM Units
-    """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query)
-    results = cursor.fetchall()
-    cursor.close()
-    return results
+    if since is not None:
+        return get_changed_rows("Units", QUERIES["get_changed_units"], ["unitID"], limit, after, filters, sort, since)
+    query, params, order = page_query(QUERIES["get_units"], ["unitID"], after, limit, filters=filters, sort=sort, **LISTINGS["Units"])
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+        return make_page(results, order, limit)
 
 
 def update_unit(unitID: int, unit_data: dict):
     """
     Updates a unit record identified by unitID.
     Expects unit_data with keys: propertyID, unitNumber, unitType, status.
+    Returns the number of matching rows, so 0 means no record has that unitID.
     """
-    query = """
-    UPDATE Units
-    SET propertyID = %(propertyID)s,
-        unitNumber = %(unitNumber)s,
-        unitType = %(unitType)s,
-        status = %(status)s
-    WHERE unitID = %(unitID)s
-    """
+    query = QUERIES["update_unit"]
     unit_data["unitID"] = unitID
-    cursor = connection.cursor()
-    cursor.execute(query, unit_data)
-    connection.commit()
-    cursor.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        count_unit(cursor, unitID, -1, unit_data)
+        cursor.execute(query, unit_data)
+        matched = cursor.rowcount
+        count_unit(cursor, unitID, 1, unit_data)
+        if matched:
+            log_change(cursor, "Units", "update", {"unitID": unitID})
+        connection.commit()
+        invalidate("Units", unitID)
+        cursor.close()
+        return matched
+
+
+def patch_unit(unitID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a unit record.
+    Returns the full updated record, or None if no record has that unitID.
+    """
+    return patch_row("Units", unitID, changes)
 
 
 def delete_unit(unitID: int):
     """
     Deletes a unit record by unitID.
     """
-    query = "DELETE FROM Units WHERE unitID = %(unitID)s"
-    cursor = connection.cursor()
-    cursor.execute(query, {"unitID": unitID})
-    connection.commit()
-    cursor.close()
+    query = QUERIES["delete_unit"]
+    with pooled_connection() as connection:
+        links = get_links(connection, "get_unit_links", {"unitID": unitID})
+        cursor = connection.cursor()
+        count_unit(cursor, unitID, -1)
+        cursor.execute(query, {"unitID": unitID})
+        if cursor.rowcount:
+            log_change(cursor, "Units", "delete", {"unitID": unitID})
+            log_changes(connection, "UnitMaintenanceRequests", "delete", links)
+        connection.commit()
+        invalidate("Units", unitID)
+        invalidate_links(links)
+        cursor.close()
 
 
 # Maintenance Request CRUD
@@ -254,79 +468,99 @@ def create_maintenance_request(mr_data: dict):
     """
     Inserts a new maintenance request into the MaintenanceRequests table.
     Expects mr_data with keys: description, status, submissionDate, completionDate.
-    """
-    query = """
-    INSERT INTO MaintenanceRequests (description, status, submissionDate, completionDate)
-    VALUES (%(description)s, %(status)s, %(submissionDate)s, %(completionDate)s)
-    """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, mr_data)
-    connection.commit()
-    requestID = cursor.lastrowid
-    cursor.close()
-    return requestID
-
-
+    With GROUP_COMMIT on, the insert is committed together with concurrent ones
+    (except inside a db.transaction() block, whose transaction it joins).
+    """
+    if GROUP_COMMIT and not in_transaction():
+        return coalescers["MaintenanceRequests"].insert(mr_data)
+    query = QUERIES["create_maintenance_request"]
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, mr_data)
+        requestID = cursor.lastrowid
+        log_change(cursor, "MaintenanceRequests", "insert", {"requestID": requestID})
+        connection.commit()
+        cursor.close()
+        return requestID
+
+
+@cached("MaintenanceRequests")
 def get_maintenance_request(requestID: int):
     """
     Returns a single maintenance request record by requestID.
     """
-    query = """
-    SELECT requestID, description, status, submissionDate, completionDate
-    FROM MaintenanceRequests
-    WHERE requestID = %(requestID)s
-    """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, {"requestID": requestID})
-    result = cursor.fetchone()
-    cursor.close()
-    return result
+    query = QUERIES["get_maintenance_request"]
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, {"requestID": requestID})
+        result = cursor.fetchone()
+        cursor.close()
+        return result
 
 
-def get_maintenance_requests():
-    """
-    Returns all maintenance request records.
+def get_maintenance_requests(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                             sort: Optional[str] = None, since: Optional[str] = None):
     """
-    query = """
-    SELECT requestID, description, status, submissionDate, completionDate
-    FROM MaintenanceRequests
+    Returns one page of maintenance request records ordered by `sort` (default requestID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `since` lists only what changed after a sync token (see get_changed_rows()).
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query)
-    results = cursor.fetchall()
-    cursor.close()
-    return results
+    if since is not None:
+        return get_changed_rows("MaintenanceRequests", QUERIES["get_changed_maintenance_requests"], ["requestID"], limit, after, filters, sort, since)
+    query, params, order = page_query(QUERIES["get_maintenance_requests"], ["requestID"], after, limit, filters=filters, sort=sort, **LISTINGS["MaintenanceRequests"])
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+        return make_page(results, order, limit)
 
 
 def update_maintenance_request(requestID: int, mr_data: dict):
     """
     Updates a maintenance request record identified by requestID.
     Expects mr_data with keys: description, status, submissionDate, completionDate.
+    Returns the number of matching rows, so 0 means no record has that requestID.
     """
-    query = """
-    UPDATE MaintenanceRequests
-    SET description = %(description)s,
-        status = %(status)s,
-        submissionDate = %(submissionDate)s,
-        completionDate = %(completionDate)s
-    WHERE requestID = %(requestID)s
-    """
+    query = QUERIES["update_maintenance_request"]
     mr_data["requestID"] = requestID
-    cursor = connection.cursor()
-    cursor.execute(query, mr_data)
-    connection.commit()
-    cursor.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, mr_data)
+        matched = cursor.rowcount
+        if matched:
+            log_change(cursor, "MaintenanceRequests", "update", {"requestID": requestID})
+        connection.commit()
+        invalidate("MaintenanceRequests", requestID)
+        cursor.close()
+        return matched
+
+
+def patch_maintenance_request(requestID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a maintenance request record.
+    Returns the full updated record, or None if no record has that requestID.
+    """
+    return patch_row("MaintenanceRequests", requestID, changes)
 
 
 def delete_maintenance_request(requestID: int):
     """
     Deletes a maintenance request record by requestID.
     """
-    query = "DELETE FROM MaintenanceRequests WHERE requestID = %(requestID)s"
-    cursor = connection.cursor()
-    cursor.execute(query, {"requestID": requestID})
-    connection.commit()
-    cursor.close()
+    query = QUERIES["delete_maintenance_request"]
+    with pooled_connection() as connection:
+        links = get_links(connection, "get_request_links", {"requestID": requestID})
+        cursor = connection.cursor()
+        cursor.execute(query, {"requestID": requestID})
+        if cursor.rowcount:
+            log_change(cursor, "MaintenanceRequests", "delete", {"requestID": requestID})
+            log_changes(connection, "UnitMaintenanceRequests", "delete", links)
+        connection.commit()
+        invalidate("MaintenanceRequests", requestID)
+        invalidate_links(links)
+        cursor.close()
 
 
 # Leases CRUD
@@ -336,79 +570,113 @@ def create_lease(lease_data: dict):
     Inserts a new lease into the Leases table.
     Expects lease_data with keys: unitID, tenantID, startDate, endDate, rentPrice.
     """
-    query = """
-    INSERT INTO Leases (unitID, tenantID, startDate, endDate, rentPrice)
-    VALUES (%(unitID)s, %(tenantID)s, %(startDate)s, %(endDate)s, %(rentPrice)s)
-    """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, lease_data)
-    connection.commit()
-    leaseID = cursor.lastrowid
-    cursor.close()
-    return leaseID
+    query = QUERIES["create_lease"]
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, lease_data)
+        leaseID = cursor.lastrowid
+        count_lease(cursor, leaseID, 1)
+        log_change(cursor, "Leases", "insert", {"leaseID": leaseID})
+        connection.commit()
+        cursor.close()
+        return leaseID
 
 
-def get_lease(leaseID: int):
-    """
-    Returns a single lease record by leaseID.
+def create_leases(leases_data: List[dict]):
     """
-    query = """
-    SELECT leaseID, unitID, tenantID, startDate, endDate, rentPrice
-    FROM Leases
-    WHERE leaseID = %(leaseID)s
+    Inserts many leases into the Leases table in a single transaction, using
+    batched multi-row INSERTs. Returns the generated leaseIDs in input order.
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, {"leaseID": leaseID})
-    result = cursor.fetchone()
-    cursor.close()
-    return result
+    columns = ["unitID", "tenantID", "startDate", "endDate", "rentPrice"]
+    with pooled_connection() as connection:
+        leaseIDs = bulk_insert(connection, "Leases", columns, leases_data)
+        count_rows(connection, "count_lease", "leaseID", leaseIDs)
+        log_changes(connection, "Leases", "insert", [{"leaseID": leaseID} for leaseID in leaseIDs])
+        connection.commit()
+        return leaseIDs
 
 
-def get_leases():
-    """
-    Returns all lease records.
+@cached("Leases")
+def get_lease(leaseID: int):
     """
-    query = """
-    SELECT leaseID, unitID, tenantID, startDate, endDate, rentPrice
-    FROM Leases
+    Returns a single lease record by leaseID.
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query)
-    results = cursor.fetchall()
-    cursor.close()
-    return results
+    query = QUERIES["get_lease"]
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, {"leaseID": leaseID})
+        result = cursor.fetchone()
+        cursor.close()
+        return result
+
+
+def get_leases(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+               sort: Optional[str] = None, expand: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of lease records ordered by `sort` (default leaseID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `expand` nests related records, e.g. "tenant,unit,unit.property" (see RELATIONS).
+    `since` lists only what changed after a sync token (see get_changed_rows()).
+    """
+    relations = parse_expand("Leases", expand)
+    if since is not None:
+        return get_changed_rows("Leases", QUERIES["get_changed_leases"], ["leaseID"], limit, after, filters, sort, since, relations)
+    query, params, order = page_query(QUERIES["get_leases"], ["leaseID"], after, limit, filters=filters, sort=sort, **LISTINGS["Leases"])
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+        page = make_page(results, order, limit)
+        expand_rows(connection, "Leases", page["items"], relations)
+        return page
 
 
 def update_lease(leaseID: int, lease_data: dict):
     """
     Updates a lease record identified by leaseID.
     Expects lease_data with keys: unitID, tenantID, startDate, endDate, rentPrice.
+    Returns the number of matching rows, so 0 means no record has that leaseID.
     """
-    query = """
-    UPDATE Leases
-    SET unitID = %(unitID)s,
-        tenantID = %(tenantID)s,
-        startDate = %(startDate)s,
-        endDate = %(endDate)s,
-        rentPrice = %(rentPrice)s
-    WHERE leaseID = %(leaseID)s
-    """
+    query = QUERIES["update_lease"]
     lease_data["leaseID"] = leaseID
-    cursor = connection.cursor()
-    cursor.execute(query, lease_data)
-    connection.commit()
-    cursor.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        count_lease(cursor, leaseID, -1)
+        cursor.execute(query, lease_data)
+        matched = cursor.rowcount
+        count_lease(cursor, leaseID, 1)
+        if matched:
+            log_change(cursor, "Leases", "update", {"leaseID": leaseID})
+        connection.commit()
+        invalidate("Leases", leaseID)
+        cursor.close()
+        return matched
+
+
+def patch_lease(leaseID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a lease record.
+    Returns the full updated record, or None if no record has that leaseID.
+    """
+    return patch_row("Leases", leaseID, changes)
 
 
 def delete_lease(leaseID: int):
     """
     Deletes a lease record by leaseID.
     """
-    query = "DELETE FROM Leases WHERE leaseID = %(leaseID)s"
-    cursor = connection.cursor()
-    cursor.execute(query, {"leaseID": leaseID})
-    connection.commit()
-    cursor.close()
+    query = QUERIES["delete_lease"]
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        count_lease(cursor, leaseID, -1)
+        cursor.execute(query, {"leaseID": leaseID})
+        if cursor.rowcount:
+            log_change(cursor, "Leases", "delete", {"leaseID": leaseID})
+        connection.commit()
+        invalidate("Leases", leaseID)
+        cursor.close()
 
 
 # Payments CRUD
@@ -417,80 +685,113 @@ def create_payment(payment_data: dict):
     """
     Inserts a new payment into the Payments table.
     Expects payment_data with keys: tenantID, leaseID, amount, paymentDate, paymentMethod.
+    With GROUP_COMMIT on, the insert is committed together with concurrent ones
+    (except inside a db.transaction() block, whose transaction it joins).
     """
-    query = """
-    INSERT INTO Payments (tenantID, leaseID, amount, paymentDate, paymentMethod)
-    VALUES (%(tenantID)s, %(leaseID)s, %(amount)s, %(paymentDate)s, %(paymentMethod)s)
-    """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, payment_data)
-    connection.commit()
-    paymentID = cursor.lastrowid
-    cursor.close()
-    return paymentID
+    if GROUP_COMMIT and not in_transaction():
+        return coalescers["Payments"].insert(payment_data)
+    query = QUERIES["create_payment"]
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, payment_data)
+        paymentID = cursor.lastrowid
+        log_change(cursor, "Payments", "insert", {"paymentID": paymentID})
+        connection.commit()
+        cursor.close()
+        return paymentID
 
 
-def get_payment(paymentID: int):
-    """
-    Returns a single payment record by paymentID.
+def create_payments(payments_data: List[dict]):
     """
-    query = """
-    SELECT paymentID, tenantID, leaseID, amount, paymentDate, paymentMethod
-    FROM Payments
-    WHERE paymentID = %(paymentID)s
+    Inserts many payments into the Payments table in a single transaction, using
+    batched multi-row INSERTs. Returns the generated paymentIDs in input order.
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, {"paymentID": paymentID})
-    result = cursor.fetchone()
-    cursor.close()
-    return result
+    columns = ["tenantID", "leaseID", "amount", "paymentDate", "paymentMethod"]
+    with pooled_connection() as connection:
+        paymentIDs = bulk_insert(connection, "Payments", columns, payments_data)
+        log_changes(connection, "Payments", "insert", [{"paymentID": paymentID} for paymentID in paymentIDs])
+        connection.commit()
+        return paymentIDs
 
 
-def get_payments():
-    """
-    Returns all payment records.
+@cached("Payments")
+def get_payment(paymentID: int):
     """
-    query = """
-    SELECT paymentID, tenantID, leaseID, amount, paymentDate, paymentMethod
-    FROM Payments
+    Returns a single payment record by paymentID.
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query)
-    results = cursor.fetchall()
-    cursor.close()
-    return results
+    query = QUERIES["get_payment"]
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, {"paymentID": paymentID})
+        result = cursor.fetchone()
+        cursor.close()
+        return result
+
+
+def get_payments(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, filters: Optional[dict] = None,
+                 sort: Optional[str] = None, expand: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of payment records ordered by `sort` (default paymentID),
+    narrowed by `filters` and starting after the `after` cursor. Accepted
+    filters and sorts are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `expand` nests related records, e.g. "tenant,lease,lease.unit" (see RELATIONS).
+    `since` lists only what changed after a sync token (see get_changed_rows()).
+    """
+    relations = parse_expand("Payments", expand)
+    if since is not None:
+        return get_changed_rows("Payments", QUERIES["get_changed_payments"], ["paymentID"], limit, after, filters, sort, since, relations)
+    query, params, order = page_query(QUERIES["get_payments"], ["paymentID"], after, limit, filters=filters, sort=sort, **LISTINGS["Payments"])
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+        page = make_page(results, order, limit)
+        expand_rows(connection, "Payments", page["items"], relations)
+        return page
 
 
 def update_payment(paymentID: int, payment_data: dict):
     """
     Updates a payment record identified by paymentID.
     Expects payment_data with keys: tenantID, leaseID, amount, paymentDate, paymentMethod.
+    Returns the number of matching rows, so 0 means no record has that paymentID.
     """
-    query = """
-    UPDATE Payments
-    SET tenantID = %(tenantID)s,
-        leaseID = %(leaseID)s,
-        amount = %(amount)s,
-        paymentDate = %(paymentDate)s,
-        paymentMethod = %(paymentMethod)s
-    WHERE paymentID = %(paymentID)s
-    """
+    query = QUERIES["update_payment"]
     payment_data["paymentID"] = paymentID
-    cursor = connection.cursor()
-    cursor.execute(query, payment_data)
-    connection.commit()
-    cursor.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, payment_data)
+        matched = cursor.rowcount
+        if matched:
+            log_change(cursor, "Payments", "update", {"paymentID": paymentID})
+        connection.commit()
+        invalidate("Payments", paymentID)
+        cursor.close()
+        return matched
+
+
+def patch_payment(paymentID: int, changes: dict):
+    """
+    Updates only the columns present in changes on a payment record.
+    Returns the full updated record, or None if no record has that paymentID.
+    """
+    return patch_row("Payments", paymentID, changes)
 
 
 def delete_payment(paymentID: int):
     """
     Deletes a payment record by paymentID.
     """
-    query = "DELETE FROM Payments WHERE paymentID = %(paymentID)s"
-    cursor = connection.cursor()
-    cursor.execute(query, {"paymentID": paymentID})
-    connection.commit()
-    cursor.close()
+    query = QUERIES["delete_payment"]
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, {"paymentID": paymentID})
+        if cursor.rowcount:
+            log_change(cursor, "Payments", "delete", {"paymentID": paymentID})
+        connection.commit()
+        invalidate("Payments", paymentID)
+        cursor.close()
 
 
 # Unit Maintenance Request CRUD
@@ -500,56 +801,893 @@ def create_unit_maintenance_request(umr_data: dict):
     Inserts a new association in the UnitMaintenanceRequests table.
     Expects umr_data with keys: unitID, requestID.
     """
-    query = """
-    INSERT INTO UnitMaintenanceRequests (unitID, requestID)
-    VALUES (%(unitID)s, %(requestID)s)
+    query = QUERIES["create_unit_maintenance_request"]
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, umr_data)
+        log_change(cursor, "UnitMaintenanceRequests", "insert",
+                   {"unitID": umr_data["unitID"], "requestID": umr_data["requestID"]})
+        connection.commit()
+        cursor.close()
+
+
+def create_unit_maintenance_requests(umr_data: List[dict]):
+    """
+    Inserts many associations into the UnitMaintenanceRequests table in a
+    single transaction, using batched multi-row INSERTs.
     """
-    cursor = connection.cursor()
-    cursor.execute(query, umr_data)
-    connection.commit()
-    cursor.close()
+    columns = ["unitID", "requestID"]
+    with pooled_connection() as connection:
+        bulk_insert(connection, "UnitMaintenanceRequests", columns, umr_data, returns_ids=False)
+        log_changes(connection, "UnitMaintenanceRequests", "insert",
+                    [{"unitID": row["unitID"], "requestID": row["requestID"]} for row in umr_data])
+        connection.commit()
 
 
+@cached("UnitMaintenanceRequests")
 def get_unit_maintenance_request(unitID: int, requestID: int):
     """
     Returns a specific UnitMaintenanceRequests record based on unitID and requestID.
     """
-    query = """
-    SELECT unitID, requestID
-    FROM UnitMaintenanceRequests
-    WHERE unitID = %(unitID)s AND requestID = %(requestID)s
+    query = QUERIES["get_unit_maintenance_request"]
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, {"unitID": unitID, "requestID": requestID})
+        result = cursor.fetchone()
+        cursor.close()
+        return result
+
+
+def get_unit_maintenance_requests(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                                  filters: Optional[dict] = None, sort: Optional[str] = None,
+                                  expand: Optional[str] = None, since: Optional[str] = None):
+    """
+    Returns one page of UnitMaintenanceRequests records ordered by unitID and
+    requestID, narrowed by `filters` and starting after the `after` cursor.
+    Accepted filters are in LISTINGS. Result: {"items": [...], "nextCursor": ...}.
+    `expand` nests related records, e.g. "unit,request" (see RELATIONS).
+    `since` lists only what changed after a sync token (see get_changed_rows()).
+    """
+    relations = parse_expand("UnitMaintenanceRequests", expand)
+    if since is not None:
+        return get_changed_rows("UnitMaintenanceRequests", QUERIES["get_changed_unit_maintenance_requests"], ["unitID", "requestID"], limit, after, filters, sort, since, relations)
+    query, params, order = page_query(QUERIES["get_unit_maintenance_requests"], ["unitID", "requestID"], after, limit, filters=filters, sort=sort, **LISTINGS["UnitMaintenanceRequests"])
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+        page = make_page(results, order, limit)
+        expand_rows(connection, "UnitMaintenanceRequests", page["items"], relations)
+        return page
+
+
+def delete_unit_maintenance_request(unitID: int, requestID: int):
+    """
+    Deletes a record from UnitMaintenanceRequests based on unitID and requestID.
+    """
+    query = QUERIES["delete_unit_maintenance_request"]
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, {"unitID": unitID, "requestID": requestID})
+        if cursor.rowcount:
+            log_change(cursor, "UnitMaintenanceRequests", "delete", {"unitID": unitID, "requestID": requestID})
+        connection.commit()
+        invalidate("UnitMaintenanceRequests", unitID, requestID)
+        cursor.close()
+
+
+# Property summaries
+
+def count_unit(cursor, unitID: int, sign: int, columns=()):
+    """
+    Adds sign (1 or -1) times a unit's current status to its property's
+    PropertyUnitCounts, on the caller's transaction. When propertyID is among
+    the columns being written, the unit's leases are moved along with it.
+    """
+    cursor.execute(QUERIES["count_unit"], {"unitID": unitID, "sign": sign})
+    if "propertyID" in columns:
+        cursor.execute(QUERIES["count_unit_leases"], {"unitID": unitID, "sign": sign})
+
+
+def count_lease(cursor, leaseID: int, sign: int, columns=()):
+    """
+    Adds sign (1 or -1) times a lease's current end date and rent to its
+    property's PropertyLeaseTotals, on the caller's transaction.
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query, {"unitID": unitID, "requestID": requestID})
-    result = cursor.fetchone()
+    cursor.execute(QUERIES["count_lease"], {"leaseID": leaseID, "sign": sign})
+
+
+# Tables whose writes feed the property summaries, with the function that
+# counts one row in or out.
+SUMMARY_COUNTERS = {"Units": count_unit, "Leases": count_lease}
+
+
+def count_rows(connection, name: str, key_column: str, keys: List[int]):
+    """
+    Counts rows just inserted by bulk_insert() into the property summaries.
+    """
+    cursor = connection.cursor()
+    cursor.executemany(QUERIES[name], [{key_column: key, "sign": 1} for key in keys])
     cursor.close()
-    return result
 
 
-def get_unit_maintenance_requests():
+def make_summary(unit_counts: List[dict], lease_totals: dict) -> dict:
+    units_by_status = {row["status"]: int(row["unitCount"]) for row in unit_counts if row["status"] is not None}
+    return {
+        "totalUnits": sum(units_by_status.values()),
+        "unitsByStatus": units_by_status,
+        "activeLeases": int(lease_totals["activeLeases"] or 0),
+        "totalRent": lease_totals["totalRent"] or 0,
+    }
+
+
+def get_property_summary(propertyID: int):
+    """
+    Returns unit counts by status, the number of active leases and their total
+    rentPrice for one property, or None if no property has that propertyID.
+    A lease is active until its endDate has passed.
     """
-    Returns all records from the UnitMaintenanceRequests table.
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(QUERIES["get_property_unit_counts"], {"propertyID": propertyID})
+        unit_counts = cursor.fetchall()
+        if not unit_counts:
+            cursor.close()
+            return None
+        cursor.execute(QUERIES["get_property_lease_totals"], {"propertyID": propertyID, "today": date.today()})
+        lease_totals = cursor.fetchone()
+        cursor.close()
+        return {"propertyID": propertyID, **make_summary(unit_counts, lease_totals)}
+
+
+def get_portfolio_summary():
     """
-    query = """
-    SELECT unitID, requestID
-    FROM UnitMaintenanceRequests
+    Returns the same figures as get_property_summary() across all properties.
     """
-    cursor = connection.cursor(DictCursor)
-    cursor.execute(query)
-    results = cursor.fetchall()
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(QUERIES["get_unit_counts"])
+        unit_counts = cursor.fetchall()
+        cursor.execute(QUERIES["get_lease_totals"], {"today": date.today()})
+        lease_totals = cursor.fetchone()
+        cursor.close()
+        return {"propertyID": None, **make_summary(unit_counts, lease_totals)}
+
+
+def recount_property_summaries():
+    """
+    Rebuilds the property summaries from Units and Leases in one transaction,
+    repairing counters that drifted through writes the CRUD functions did not
+    make (manual SQL, cascades).
+    """
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        rebuild_property_summaries(cursor)
+        connection.commit()
+        cursor.close()
+
+
+# Change log
+
+def log_change(cursor, table: str, operation: str, key: dict):
+    """
+    Records an insert, update or delete of the row with primary key `key` in
+    the ChangeLog, on the caller's transaction, for the GET /changes feed.
+    A delete also leaves a tombstone for delta sync.
+    """
+    change = {"tableName": table, "operation": operation, "rowKey": dumps(key).decode()}
+    cursor.execute(QUERIES["log_change"], change)
+    if operation == "delete":
+        cursor.execute(QUERIES["add_tombstone"], change)
+
+
+def log_changes(connection, table: str, operation: str, keys: List[dict]):
+    """
+    log_change() for many rows at once, e.g. after bulk_insert().
+    """
+    if not keys:
+        return
+    changes = [{"tableName": table, "operation": operation, "rowKey": dumps(key).decode()} for key in keys]
+    cursor = connection.cursor()
+    cursor.executemany(QUERIES["log_change"], changes)
+    if operation == "delete":
+        cursor.executemany(QUERIES["add_tombstone"], changes)
     cursor.close()
-    return results
 
 
-def delete_unit_maintenance_request(unitID: int, requestID: int):
+def get_links(connection, query: str, params: dict) -> List[dict]:
     """
-    Deletes a record from UnitMaintenanceRequests based on unitID and requestID.
+    Returns the unit/maintenance request associations selected by catalog
+    query `query`: read before a unit or request delete removes them by
+    cascade, so their deletes can be logged as well.
+    """
+    cursor = BACKEND.dict_cursor(connection)
+    cursor.execute(QUERIES[query], params)
+    links = cursor.fetchall()
+    cursor.close()
+    return links
+
+
+def invalidate_links(links: List[dict]):
+    """
+    Drops the cached copies of associations a unit or request delete removed
+    by cascade.
+    """
+    for link in links:
+        invalidate("UnitMaintenanceRequests", link["unitID"], link["requestID"])
+
+
+def get_changes(after: int, limit: int):
+    """
+    Returns up to `limit` ChangeLog entries with a seq above `after`, oldest
+    first. Read on the primary, where get_open_transactions() tells whether a
+    missing seq can still commit; a replica may not have applied it yet.
+    """
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(QUERIES["get_changes"], {"after": after, "limit": limit})
+        results = cursor.fetchall()
+        cursor.close()
+        return results
+
+
+def get_change_bounds():
+    """
+    Returns the lowest and highest seq in the ChangeLog (None when it is
+    empty) and the step between consecutive seqs, as {"first", "last", "increment"}.
+    """
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(QUERIES["get_change_bounds"])
+        result = cursor.fetchone()
+        result["increment"] = BACKEND.id_increment(cursor)
+        cursor.close()
+        return result
+
+
+def get_open_transactions():
+    """
+    Returns the ids of the write transactions open on the primary, or None
+    when the database does not let us see them (see changes.ChangeFeed).
+    """
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        result = BACKEND.open_transactions(cursor)
+        cursor.close()
+        return result
+
+
+def prune_changes(through: int):
+    """
+    Deletes the ChangeLog entries up to and including seq `through`.
+    """
+    with pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(QUERIES["prune_changes"], {"through": through})
+        connection.commit()
+        cursor.close()
+
+
+# Delta sync
+
+# How far back from the moment it is issued a sync token reaches. updatedAt is
+# set when a row is written, but the row only becomes visible when its
+# transaction commits, so each delta repeats the last few seconds of changes
+# to pick up writes that committed late. Clients may therefore see a change
+# twice; a transaction running longer than this can be missed.
+DELTA_SYNC_LAG_SECONDS = 5
+# The sync-token horizon: deletions are remembered (as Tombstones) for this
+# long, so an older token is refused with ExpiredSyncToken and the client
+# starts over with a full sync. Expired tombstones are pruned at most once per
+# TOMBSTONE_PRUNE_SECONDS, by the next delta listing.
+SYNC_TOKEN_MAX_AGE_DAYS = 30
+TOMBSTONE_PRUNE_SECONDS = 3600
+
+# The `after` cursor of a delta page listing deletions: the position among
+# the table's tombstones, and the database time the rows were listed up to,
+# which the final page's sync token is issued for.
+TOMBSTONE_CURSOR = ["deletedAt", "rowKey", "syncedAt"]
+
+_tombstones_pruned_at = None
+_tombstones_lock = threading.Lock()
+
+
+def delta_query(select: str, key_columns: List[str], after: Optional[str], limit: int,
+                filters: Optional[dict], sort: Optional[str], since: str):
+    """
+    Builds the page query for the rows `select` returns that changed after
+    the `since` token, oldest change first. Returns (query, params, order,
+    the decoded token).
+    """
+    if sort or any(value is not None for value in (filters or {}).values()):
+        # A row updated out of a filter's range would silently drop out of
+        # the client's copy instead of being sent.
+        raise InvalidListQuery("since cannot be combined with filters or sort")
+    changed_after = decode_sync_token(since)
+    query, params, order = page_query(
+        select, key_columns, after, limit, filters={"since": changed_after},
+        allowed_filters={"since": "updatedAt > %(since)s"}, sort="updatedAt", sortable=["updatedAt"])
+    return query, params, order, changed_after
+
+
+def make_delta_page(rows: list, order: List[str], limit: int) -> dict:
+    """
+    make_page() for a delta listing, with updatedAt (needed only for the
+    cursor) dropped from the rows and empty "deleted" and "syncToken" fields.
+    """
+    page = make_page(rows, order, limit)
+    for row in page["items"]:
+        del row["updatedAt"]
+    page["deleted"] = []
+    page["syncToken"] = None
+    return page
+
+
+def as_datetime(value) -> datetime:
+    if isinstance(value, str):  # SQLite returns expressions as text
+        return datetime.fromisoformat(value)
+    return value
+
+
+def sync_token(synced_at) -> str:
+    """
+    Returns the token for the next delta after a listing started at synced_at
+    (database time), DELTA_SYNC_LAG_SECONDS earlier.
     """
-    query = """
-    DELETE FROM UnitMaintenanceRequests
-    WHERE unitID = %(unitID)s AND requestID = %(requestID)s
+    return encode_sync_token(as_datetime(synced_at) - timedelta(seconds=DELTA_SYNC_LAG_SECONDS))
+
+
+def check_sync_age(changed_after: Optional[datetime], synced_at):
+    """
+    Raises ExpiredSyncToken for a token past the sync-token horizon, whose
+    deletions may already have been pruned.
+    """
+    if changed_after is not None and as_datetime(synced_at) - changed_after > timedelta(days=SYNC_TOKEN_MAX_AGE_DAYS):
+        raise ExpiredSyncToken("Sync token is older than %d days; start over with since=%s"
+                               % (SYNC_TOKEN_MAX_AGE_DAYS, SYNC_FROM_START))
+
+
+def tombstone_horizon(synced_at) -> datetime:
+    return as_datetime(synced_at) - timedelta(days=SYNC_TOKEN_MAX_AGE_DAYS)
+
+
+def tombstones_due() -> bool:
     """
+    Returns True, at most once per TOMBSTONE_PRUNE_SECONDS in this process,
+    when the caller should prune expired tombstones.
+    """
+    global _tombstones_pruned_at
+    with _tombstones_lock:
+        now = time.monotonic()
+        if _tombstones_pruned_at is not None and now - _tombstones_pruned_at < TOMBSTONE_PRUNE_SECONDS:
+            return False
+        _tombstones_pruned_at = now
+        return True
+
+
+def tombstone_position(after: Optional[str]) -> Optional[list]:
+    """
+    Returns [deletedAt, rowKey, syncedAt] from a cursor into the deletions of
+    a delta listing, or None for no cursor or a cursor into its rows.
+    """
+    if after is None:
+        return None
+    try:
+        return decode_cursor(after, TOMBSTONE_CURSOR)
+    except InvalidCursor:
+        return None
+
+
+def tombstone_query(table: str, position: list, limit: int):
+    """
+    Builds the page query for the tombstones of `table` after `position`,
+    oldest deletion first. Returns (query, params, order).
+    """
+    return page_query(
+        QUERIES["get_tombstones"], ["rowKey"], encode_cursor(["deletedAt", "rowKey"], position[:2]), limit,
+        filters={"tableName": table}, allowed_filters={"tableName": "tableName = %(tableName)s"},
+        sort="deletedAt", sortable=["deletedAt"])
+
+
+def rewritten_query(table: str, key_columns: List[str], count: int) -> str:
+    """
+    Returns a query for the updatedAt of those of `count` keys (bound in
+    order as positional parameters) whose rows exist again.
+    """
+    match = "(" + " AND ".join("%s = %%s" % column for column in key_columns) + ")"
+    return "SELECT %s, updatedAt FROM %s WHERE %s" % (", ".join(key_columns), table, " OR ".join([match] * count))
+
+
+def add_deletions(page: dict, rows: list, order: List[str], limit: int, keys: List[tuple], rewritten: dict,
+                  synced_at):
+    """
+    Adds one page of tombstones (`rows`, with their row keys as tuples in
+    `keys`) to a delta page under "deleted", leaving out rows written again
+    after they were deleted, which were listed among the items. Sets the
+    cursor to the next tombstone, or the sync token once there are none left.
+    """
+    tombstones = make_page(rows, order, limit)
+    seen = set()
+    for row, key in zip(tombstones["items"], keys):
+        rewritten_at = rewritten.get(key)
+        if rewritten_at is not None and as_datetime(rewritten_at) > as_datetime(row["deletedAt"]):
+            continue
+        if row["rowKey"] not in seen:
+            seen.add(row["rowKey"])
+            page["deleted"].append(json.loads(row["rowKey"]))
+    if tombstones["nextCursor"] is None:
+        page["syncToken"] = sync_token(synced_at)
+    else:
+        last = tombstones["items"][-1]
+        page["nextCursor"] = encode_cursor(TOMBSTONE_CURSOR, [last["deletedAt"], last["rowKey"], synced_at])
+
+
+def get_changed_rows(table: str, select: str, key_columns: List[str], limit: int, after: Optional[str],
+                     filters: Optional[dict], sort: Optional[str], since: str, relations: Optional[dict] = None):
+    """
+    Returns one page of the rows of `table` inserted or updated after the
+    `since` token ("0" for every row), ordered by when they last changed, so
+    rows written while a client pages through move ahead of it rather than
+    being missed. Once the rows run out, the pages go on to list the keys of
+    the rows deleted since then under "deleted", `limit` at a time, and the
+    last page carries the "syncToken" to pass as `since` next time. A token
+    older than SYNC_TOKEN_MAX_AGE_DAYS raises ExpiredSyncToken.
+    """
+    position = tombstone_position(after)
+    query, params, order, changed_after = delta_query(
+        select, key_columns, None if position else after, limit, filters, sort, since)
+    # From the primary: a replica may not have applied writes older than the
+    # token yet.
+    with pooled_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(QUERIES["get_sync_time"])
+        synced_at = cursor.fetchone()["now"]
+        check_sync_age(changed_after, synced_at)
+        if tombstones_due():
+            for sync_table in SYNC_TABLES:
+                cursor.execute(QUERIES["prune_tombstones"],
+                               {"tableName": sync_table, "before": tombstone_horizon(synced_at)})
+            connection.commit()
+        if position is None:
+            cursor.execute(query, params)
+            page = make_delta_page(cursor.fetchall(), order, limit)
+            if page["nextCursor"] is None:
+                if changed_after is None:
+                    page["syncToken"] = sync_token(synced_at)
+                else:
+                    position = [changed_after, "", synced_at]
+                    if len(page["items"]) == limit:
+                        page["nextCursor"] = encode_cursor(TOMBSTONE_CURSOR, position)
+                        position = None
+        else:
+            page = make_delta_page([], order, limit)
+        if position is not None:
+            get_deletions(cursor, table, key_columns, position, limit - len(page["items"]), page)
+        cursor.close()
+        expand_rows(connection, table, page["items"], relations)
+        return page
+
+
+def get_deletions(cursor, table: str, key_columns: List[str], position: list, limit: int, page: dict):
+    """
+    Adds the next `limit` deletions after `position` to a delta page (see
+    add_deletions()).
+    """
+    query, params, order = tombstone_query(table, position, limit)
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    keys = [tuple(json.loads(row["rowKey"])[column] for column in key_columns) for row in rows[:limit]]
+    rewritten = {}
+    if keys:
+        cursor.execute(rewritten_query(table, key_columns, len(keys)), [value for key in keys for value in key])
+        rewritten = {tuple(row[column] for column in key_columns): row["updatedAt"] for row in cursor.fetchall()}
+    add_deletions(page, rows, order, limit, keys, rewritten, position[2])
+
+
+# Search
+
+def search_terms(table: str, key: int, row: dict) -> List[dict]:
+    return [
+        {"tableName": table, "term": term, "rowID": key, "weight": weight}
+        for term, weight in row_terms(table, row).items()
+    ]
+
+
+def index_row(cursor, table: str, key: int, row: dict):
+    """
+    Replaces the SearchTerms of one tenant or property with those of row, on
+    the caller's transaction.
+    """
+    cursor.execute(QUERIES["delete_search_terms"], {"tableName": table, "rowID": key})
+    terms = search_terms(table, key, row)
+    if terms:
+        cursor.executemany(QUERIES["add_search_term"], terms)
+
+
+def unindex_row(cursor, table: str, key: int):
+    """
+    Removes the SearchTerms of a deleted tenant or property, on the caller's
+    transaction.
+    """
+    cursor.execute(QUERIES["delete_search_terms"], {"tableName": table, "rowID": key})
+
+
+def index_rows(connection, table: str, keys: List[int], rows: List[dict]):
+    """
+    Adds the SearchTerms of rows just inserted, e.g. by bulk_insert().
+    """
+    terms = [term for key, row in zip(keys, rows) for term in search_terms(table, key, row)]
+    if terms:
+        cursor = connection.cursor()
+        cursor.executemany(QUERIES["add_search_term"], terms)
+        cursor.close()
+
+
+def search_query(table: str, words: List[str], limit: int):
+    """
+    Builds the search for the rows of `table` with a term matching each of
+    words. Every word of at least SEARCH_MIN_PREFIX characters is one index
+    range over the terms it prefixes, and only rows found by all of them are
+    kept; shorter words are then checked against those rows' own terms. A
+    word scores its term's weight, doubled when the term is the whole word,
+    and rows rank by their total score. Returns (query, params).
+    """
+    key_column, columns = TABLES[table]
+    long_words = [word for word in words if len(word) >= SEARCH_MIN_PREFIX]
+    short_words = [word for word in words if len(word) < SEARCH_MIN_PREFIX]
+    params = {"tableName": table, "limit": limit}
+    matches = []
+    checks = []
+    for index, word in enumerate(words):
+        params["word%d" % index] = word
+        params["high%d" % index] = prefix_bounds(word)[1]
+        prefix = "{term} >= %%(word%d)s AND {term} < %%(high%d)s" % (index, index)
+        if not long_words:
+            # Nothing to narrow down: look the word up as a whole term.
+            prefix = "{term} = %%(word%d)s" % index
+        elif word in short_words:
+            checks.append(
+                " AND EXISTS (SELECT 1 FROM SearchTerms AS s WHERE s.tableName = %%(tableName)s"
+                " AND s.rowID = matches.rowID AND %s)" % prefix.format(term="s.term"))
+            continue
+        matches.append(
+            "SELECT rowID, MAX(CASE WHEN term = %%(word%d)s THEN 2 * weight ELSE weight END) AS score"
+            " FROM SearchTerms WHERE tableName = %%(tableName)s AND %s GROUP BY rowID"
+            % (index, prefix.format(term="term")))
+    params["count"] = len(matches)
+    query = (
+        "SELECT %s, m.score FROM ("
+        "SELECT rowID, SUM(score) AS score FROM (%s) AS matches"
+        " GROUP BY rowID HAVING COUNT(*) = %%(count)s%s ORDER BY score DESC, rowID LIMIT %%(limit)s"
+        ") AS m JOIN %s AS r ON r.%s = m.rowID ORDER BY m.score DESC, m.rowID"
+    ) % (", ".join("r." + column for column in [key_column] + columns), " UNION ALL ".join(matches),
+         "".join(checks), table, key_column)
+    return query, params
+
+
+def search_rows(table: str, q: str, limit: int) -> dict:
+    """
+    Runs search_query() for the words of q. Returns {"items": [...]}, each
+    row with its integer score; no items if q has no letters or digits.
+    """
+    words = query_words(q)
+    if not words:
+        return {"items": []}
+    query, params = search_query(table, words, limit)
+    with read_connection() as connection:
+        cursor = BACKEND.dict_cursor(connection)
+        cursor.execute(query, params)
+        results = cursor.fetchall()
+        cursor.close()
+    for row in results:
+        row["score"] = int(row["score"])
+    return {"items": results}
+
+
+# Relation expansion
+
+# Related rows that list endpoints can nest into their results, as
+# {table: {relation name: (foreign key column, related table)}}.
+RELATIONS = {
+    "Units": {"property": ("propertyID", "Properties")},
+    "Leases": {"tenant": ("tenantID", "Tenants"), "unit": ("unitID", "Units")},
+    "Payments": {"tenant": ("tenantID", "Tenants"), "lease": ("leaseID", "Leases")},
+    "UnitMaintenanceRequests": {"unit": ("unitID", "Units"), "request": ("requestID", "MaintenanceRequests")},
+}
+
+# Upper bound on the number of IDs sent in a single IN (...) list.
+EXPAND_BATCH_SIZE = 1000
+
+
+def parse_expand(table: str, expand: Optional[str]) -> dict:
+    """
+    Parses an expand parameter such as "tenant,unit,unit.property" into a tree
+    of relations ({"tenant": {}, "unit": {"property": {}}}), checking every
+    step against RELATIONS.
+    """
+    tree = {}
+    for path in filter(None, (part.strip() for part in (expand or "").split(","))):
+        node, current = tree, table
+        for name in path.split("."):
+            if name not in RELATIONS.get(current, {}):
+                raise InvalidListQuery("Cannot expand %r on %s" % (path, current))
+            current = RELATIONS[current][name][1]
+            node = node.setdefault(name, {})
+    return tree
+
+
+def by_id_query(table: str, count: int) -> str:
+    key_column, columns = TABLES[table]
+    placeholders = ", ".join(["%s"] * count)
+    return "SELECT %s FROM %s WHERE %s IN (%s)" % (", ".join([key_column] + columns), table, key_column, placeholders)
+
+
+def expansion_ids(table: str, rows: list, tree: dict) -> dict:
+    """
+    Returns {relation name: sorted distinct foreign key values} for the top
+    level of an expansion tree.
+    """
+    return {
+        name: sorted({row[RELATIONS[table][name][0]] for row in rows} - {None})
+        for name in tree
+    }
+
+
+def attach_related(table: str, rows: list, name: str, related: dict):
+    foreign_key = RELATIONS[table][name][0]
+    for row in rows:
+        row[name] = related.get(row[foreign_key])
+
+
+def expand_rows(connection, table: str, rows: list, tree: dict):
+    """
+    Nests the related rows named in tree (see parse_expand()) into rows, in
+    place. Each relation costs one batched "WHERE id IN (...)" query per
+    EXPAND_BATCH_SIZE distinct IDs, however many rows refer to it, and nested
+    relations are expanded on the fetched rows the same way.
+    """
+    if not rows or not tree:
+        return
+    cursor = BACKEND.dict_cursor(connection)
+    for name, ids in expansion_ids(table, rows, tree).items():
+        target = RELATIONS[table][name][1]
+        key_column = TABLES[target][0]
+        related = {}
+        for start in range(0, len(ids), EXPAND_BATCH_SIZE):
+            batch = ids[start:start + EXPAND_BATCH_SIZE]
+            cursor.execute(by_id_query(target, len(batch)), batch)
+            related.update((row[key_column], row) for row in cursor.fetchall())
+        expand_rows(connection, target, list(related.values()), tree[name])
+        attach_related(table, rows, name, related)
+    cursor.close()
+
+
+# Bulk inserts
+
+# Rows per multi-row INSERT statement. Large enough to amortise the round trip,
+# small enough to stay well under max_allowed_packet for our row widths.
+BULK_INSERT_BATCH_SIZE = 500
+
+
+def bulk_insert_batches(table: str, columns: List[str], rows: List[dict]):
+    """
+    Splits rows into multi-row "INSERT ... VALUES (...), (...)" statements of at
+    most BULK_INSERT_BATCH_SIZE rows. Yields (query, params, row_count) tuples.
+    """
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+        batch = rows[start:start + BULK_INSERT_BATCH_SIZE]
+        query = "INSERT INTO %s (%s) VALUES %s" % (table, ", ".join(columns), ", ".join([placeholders] * len(batch)))
+        params = [row[column] for row in batch for column in columns]
+        yield query, params, len(batch)
+
+
+def auto_increment_ids(first_id: int, count: int, increment: int) -> List[int]:
+    """
+    Reconstructs the auto-increment IDs of one multi-row INSERT from the first
+    ID it reports. InnoDB hands a multi-row INSERT ... VALUES (a "simple
+    insert") a consecutive block of IDs in every auto-increment lock mode,
+    spaced by auto_increment_increment.
+    """
+    return [first_id + i * increment for i in range(count)]
+
+
+def bulk_insert(connection, table: str, columns: List[str], rows: List[dict], returns_ids=True):
+    """
+    Inserts rows through bulk_insert_batches() on the given connection without
+    committing. Returns the generated IDs in input order, or None when
+    returns_ids is False (tables without an auto-increment key).
+    """
+    cursor = BACKEND.dict_cursor(connection)
+    increment = BACKEND.id_increment(cursor) if returns_ids else 1
+    ids = []
+    for query, params, count in bulk_insert_batches(table, columns, rows):
+        cursor.execute(query, params)
+        if returns_ids:
+            ids.extend(auto_increment_ids(BACKEND.first_insert_id(cursor, count), count, increment))
+    cursor.close()
+    return ids if returns_ids else None
+
+
+# Group commit
+
+# With GROUP_COMMIT=1, single-row POST /payments and /maintenance_requests
+# inserts that arrive together are written in one transaction: the first
+# caller waits up to GROUP_COMMIT_WINDOW_SECONDS (or until
+# GROUP_COMMIT_MAX_BATCH rows have joined) and then commits the whole batch,
+# so a burst pays for one commit (and one log flush) instead of one per row.
+GROUP_COMMIT = os.environ.get("GROUP_COMMIT") == "1"
+GROUP_COMMIT_WINDOW_SECONDS = 0.002
+GROUP_COMMIT_MAX_BATCH = 100
+
+
+class InsertBatch:
+    def __init__(self):
+        self.items = []  # (row, Future)
+        self.full = threading.Event()
+
+
+def insert_rows_each(connection, query: str, rows: List[dict]) -> list:
+    """
+    Inserts rows one statement at a time on connection without committing.
+    Returns each row's generated ID, or the exception its statement raised
+    when that error undoes only the statement itself.
+    """
+    results = []
     cursor = connection.cursor()
-    cursor.execute(query, {"unitID": unitID, "requestID": requestID})
-    connection.commit()
+    for row in rows:
+        try:
+            cursor.execute(query, row)
+        except BACKEND.statement_errors as e:
+            results.append(e)
+        else:
+            results.append(cursor.lastrowid)
     cursor.close()
+    return results
+
+
+def insert_rows_together(connection, table: str, query: str, rows: List[dict]) -> list:
+    """
+    Inserts a group-commit batch on connection without committing: as one
+    multi-row INSERT, or, if that fails on a bad row, row by row so only the
+    bad rows fail. Returns one ID or exception per row, in order.
+    """
+    try:
+        return bulk_insert(connection, table, TABLES[table][1], rows)
+    except BACKEND.statement_errors:
+        connection.rollback()
+        return insert_rows_each(connection, query, rows)
+
+
+class InsertCoalescer:
+    """
+    Collects concurrent single-row inserts into one table and commits them
+    together. insert() blocks until the caller's row is committed and returns
+    its generated ID, or raises the error for that row (or for the whole
+    batch, if the transaction itself failed).
+    """
+
+    def __init__(self, table: str, query: str, window=GROUP_COMMIT_WINDOW_SECONDS, max_batch=GROUP_COMMIT_MAX_BATCH):
+        self.table = table
+        self.query = query
+        self.window = window
+        self.max_batch = max_batch
+        self._batch = None  # the batch still accepting rows
+        self._lock = threading.Lock()
+
+    def insert(self, row: dict):
+        pin_to_primary()
+        future = Future()
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = InsertBatch()
+            batch.items.append((row, future))
+            if len(batch.items) >= self.max_batch:
+                self._batch = None
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._batch is batch:
+                    self._batch = None
+            self.flush(batch.items)
+        return future.result()
+
+    def flush(self, items: list):
+        rows = [row for row, _ in items]
+        try:
+            with pooled_connection() as connection:
+                results = insert_rows_together(connection, self.table, self.query, rows)
+                key_column = TABLES[self.table][0]
+                log_changes(connection, self.table, "insert",
+                            [{key_column: key} for key in results if not isinstance(key, Exception)])
+                connection.commit()
+        except Exception as e:
+            results = [e] * len(items)
+        for (_, future), result in zip(items, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+coalescers = {
+    "Payments": InsertCoalescer("Payments", QUERIES["create_payment"]),
+    "MaintenanceRequests": InsertCoalescer("MaintenanceRequests", QUERIES["create_maintenance_request"]),
+}
+
+
+# Imports
+
+# Single-row INSERTs of the tables the /import routes write, and the summary
+# counter (see count_rows()) each needs for its new rows.
+IMPORT_QUERIES = {
+    "Tenants": QUERIES["create_tenant"],
+    "Properties": QUERIES["create_property"],
+    "Units": QUERIES["create_unit"],
+    "MaintenanceRequests": QUERIES["create_maintenance_request"],
+    "Leases": QUERIES["create_lease"],
+    "Payments": QUERIES["create_payment"],
+}
+IMPORT_COUNTERS = {"Units": "count_unit", "Leases": "count_lease"}
+
+
+def import_rows(table: str, rows: List[dict]) -> list:
+    """
+    Inserts one batch of an import in a single transaction. Rows the database
+    rejects (a duplicate email, a unit that does not exist) fail on their own
+    without failing the rest of the batch. Returns each row's generated ID or
+    the exception it raised, in order.
+    """
+    key_column = TABLES[table][0]
+    with pooled_connection() as connection:
+        results = insert_rows_together(connection, table, IMPORT_QUERIES[table], rows)
+        keys = [key for key in results if not isinstance(key, Exception)]
+        if table in IMPORT_COUNTERS:
+            count_rows(connection, IMPORT_COUNTERS[table], key_column, keys)
+        if table in SEARCH_KEYS:
+            imported = [row for row, result in zip(rows, results) if not isinstance(result, Exception)]
+            index_rows(connection, table, keys, imported)
+        log_changes(connection, table, "insert", [{key_column: key} for key in keys])
+        connection.commit()
+        return results
+
+
+# Streaming exports
+
+# Full-table SELECTs used by the /export routes, keyed by API resource name.
+EXPORT_QUERIES = {
+    "tenants": QUERIES["get_tenants"],
+    "properties": QUERIES["get_properties"],
+    "units": QUERIES["get_units"],
+    "maintenance_requests": QUERIES["get_maintenance_requests"],
+    "leases": QUERIES["get_leases"],
+    "payments": QUERIES["get_payments"],
+    "unit_maintenance_requests": QUERIES["get_unit_maintenance_requests"],
+}
+
+# Seconds the server waits on a slow reader before aborting an unbuffered
+# result; the default (60) is too short for a client draining a large export.
+EXPORT_NET_WRITE_TIMEOUT = 600
+
+
+def iter_rows(resource: str):
+    """
+    Yields every record of an exported resource one row at a time.
+    Rows are read through an unbuffered server-side cursor, so memory use does
+    not grow with the table. The pooled connection is held until the generator
+    is exhausted or closed; if it is closed early the connection is dropped
+    rather than returned, since draining the rest of the result would cost as
+    much as the export itself.
+    """
+    query = EXPORT_QUERIES[resource]
+    with read_connection() as connection:
+        cursor = BACKEND.streaming_cursor(connection)
+        BACKEND.set_write_timeout(cursor, EXPORT_NET_WRITE_TIMEOUT)
+        cursor.execute(query)
+        for row in cursor:
+            yield row
+        cursor.close()
@@ -1,21 +1,793 @@
-import pymysql
-from pymysql.cursors import DictCursor
+from backends import MySQLBackend, SQLiteBackend
+from contextlib import asynccontextmanager, contextmanager
+from collections import deque
+import asyncio
+import contextvars
+import functools
+import itertools
+import logging
+import metrics
+import migrations
+import os
 import re
+import slow_queries
+import threading
+import time
 
-DB_HOST = "classmysql.engr.oregonstate.edu"
-DB_USER = "cs340_nairp"
-DB_PASSWORD = "7244"
-DB_NAME = "cs340_nairp"
+logger = logging.getLogger(__name__)
+
+# Overridable from the environment so benchmarks and local development can
+# point the API at a local server instead of the class database.
+DB_HOST = os.environ.get("DB_HOST", "classmysql.engr.oregonstate.edu")
+DB_PORT = int(os.environ.get("DB_PORT", "3306"))
+DB_USER = os.environ.get("DB_USER", "cs340_nairp")
+DB_PASSWORD = os.environ.get("DB_PASSWORD", "7244")
+DB_NAME = os.environ.get("DB_NAME", "cs340_nairp")
+
+# Storage engine: "mysql" (the server above) or "sqlite", an embedded database
+# file at SQLITE_PATH for local use, CI and benchmarking the API on its own.
+DB_BACKEND = os.environ.get("DB_BACKEND", "mysql")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "upms.sqlite3")
+
+def parse_hosts(value: str):
+    """
+    Parses "host1,host2:3307" into [("host1", DB_PORT), ("host2", 3307)].
+    """
+    hosts = []
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        host, _, port = entry.partition(":")
+        hosts.append((host, int(port) if port else DB_PORT))
+    return hosts
+
+
+# Read replicas of the MySQL server above, as comma-separated host or
+# host:port entries using the same credentials. Reads are balanced across
+# them with REPLICA_BALANCING ("round_robin" or "least_connections"); a
+# replica that cannot be reached is skipped for REPLICA_RETRY_SECONDS, and
+# reads fall back to the primary when no replica is available.
+DB_REPLICAS = parse_hosts(os.environ.get("DB_REPLICAS", ""))
+REPLICA_BALANCING = os.environ.get("REPLICA_BALANCING", "round_robin")
+REPLICA_RETRY_SECONDS = 30
+
+# "sync" serves the API from crud.py (blocking PyMySQL on FastAPI's threadpool),
+# "async" serves it from async_crud.py (aiomysql on the event loop).
+DB_MODE = os.environ.get("DB_MODE", "sync")
+
+# Apply pending schema migrations when the API starts. Off by default so the
+# API never needs DDL privileges; run `python db.py` to migrate explicitly.
+# The missing-index check runs at startup either way.
+MIGRATE_ON_STARTUP = os.environ.get("MIGRATE_ON_STARTUP") == "1"
+
+# Connection pool sizing. At most POOL_MAX_SIZE connections are ever open at
+# once, and the async pool keeps at least POOL_MIN_SIZE. Idle connections older
+# than POOL_RECYCLE_SECONDS are closed and reopened rather than reused, and a
+# checkout waits at most POOL_TIMEOUT_SECONDS for a free connection.
+POOL_MIN_SIZE = 2
+POOL_MAX_SIZE = 10
+POOL_RECYCLE_SECONDS = 300
+POOL_TIMEOUT_SECONDS = 10
+
+# Connections opened in the background when the API starts (see health.py),
+# so the first requests do not each wait for a handshake. Capped at
+# POOL_MAX_SIZE.
+POOL_PREWARM = min(int(os.environ.get("POOL_PREWARM", str(POOL_MIN_SIZE))), POOL_MAX_SIZE)
+
+
+def make_backend(name=DB_BACKEND):
+    if name == "mysql":
+        return MySQLBackend(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
+    if name == "sqlite":
+        return SQLiteBackend(SQLITE_PATH)
+    raise ValueError("Unknown DB_BACKEND %r; expected 'mysql' or 'sqlite'" % name)
+
+
+BACKEND = make_backend()
+
+# async_crud.py runs on aiomysql, which only speaks to MySQL.
+if DB_MODE == "async" and BACKEND.dialect != "mysql":
+    raise ValueError("DB_MODE=async requires DB_BACKEND=mysql")
+if DB_REPLICAS and BACKEND.dialect != "mysql":
+    raise ValueError("DB_REPLICAS requires DB_BACKEND=mysql")
+if REPLICA_BALANCING not in ("round_robin", "least_connections"):
+    raise ValueError("Unknown REPLICA_BALANCING %r; expected 'round_robin' or 'least_connections'"
+                     % REPLICA_BALANCING)
 
 
 def get_connection():
-    return pymysql.connect(
-        host=DB_HOST,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        database=DB_NAME,
-        cursorclass=DictCursor
-    )
+    return BACKEND.connect()
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of database connections.
+
+    Connections are checked out with acquire() and handed back with release().
+    Every checkout pings the connection (replacing it if the server dropped it),
+    and idle connections past their recycle age are replaced instead of reused.
+    """
+
+    def __init__(self, connect=get_connection, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 recycle=POOL_RECYCLE_SECONDS, timeout=POOL_TIMEOUT_SECONDS):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: min_size=%s, max_size=%s" % (min_size, max_size))
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.recycle = recycle
+        self.timeout = timeout
+        self._idle = deque()
+        self._opened_at = {}  # id(connection) -> time.monotonic() when it was opened
+        self._size = 0  # open connections plus connections currently being opened
+        self._lock = threading.Condition()
+        self._closed = False
+        self.warm(min_size)
+
+    @property
+    def size(self):
+        """Number of connections currently open, idle or checked out."""
+        return self._size
+
+    @property
+    def idle(self):
+        """Number of connections currently waiting in the pool."""
+        return len(self._idle)
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        self._opened_at[id(conn)] = time.monotonic()
+        return conn
+
+    def warm(self, count):
+        """
+        Opens connections until `count` are open (at most max_size) and leaves
+        them idle in the pool. Returns how many were opened.
+        """
+        opened = 0
+        while True:
+            with self._lock:
+                if self._closed or self._size >= min(count, self.max_size):
+                    return opened
+                self._size += 1
+            conn = self._open()
+            with self._lock:
+                self._idle.append(conn)
+                self._lock.notify()
+            opened += 1
+
+    def _discard(self, conn):
+        # Caller must hold self._lock.
+        self._size -= 1
+        self._opened_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._lock.notify()
+
+    def _expired(self, conn):
+        opened_at = self._opened_at.get(id(conn), 0)
+        return self.recycle is not None and time.monotonic() - opened_at > self.recycle
+
+    def acquire(self, timeout=None):
+        """
+        Checks out a live connection, opening a new one if the pool is below
+        max_size, otherwise waiting up to `timeout` seconds (the pool's own by
+        default; 0 to not wait at all) for one to be released.
+        """
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    if self._expired(conn):
+                        self._discard(conn)
+                        continue
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot before connecting so concurrent callers
+                    # can't overshoot max_size while the handshake is in flight.
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout("Timed out waiting for a database connection")
+                self._lock.wait(remaining)
+
+        if conn is None:
+            conn = self._open()
+        else:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                # Replace a dropped connection instead of reconnecting it in
+                # place, so its recycle age starts over; it keeps its slot.
+                self._opened_at.pop(id(conn), None)
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = self._open()
+        metrics.POOL_WAIT.observe(time.monotonic() - started, "sync")
+        return conn
+
+    def release(self, conn, discard=False):
+        """
+        Returns a connection to the pool. An open transaction is rolled back so
+        the next borrower never inherits it; connections that fail the rollback,
+        are past their recycle age, or are passed with discard=True are closed
+        instead of being kept.
+        """
+        if not discard and conn.open and BACKEND.in_transaction(conn):
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        with self._lock:
+            if id(conn) not in self._opened_at:
+                return
+            if discard or not conn.open or self._closed or self._expired(conn):
+                self._discard(conn)
+            else:
+                self._idle.append(conn)
+                self._lock.notify()
+
+    def close(self):
+        """Closes every idle connection and refuses further checkouts."""
+        with self._lock:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._lock.notify_all()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use. It
+    starts empty: connections are opened by warm_pool() at startup, or one at
+    a time as requests need them, never all at once by the first request.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(min_size=0)
+    return _pool
+
+
+def warm_pool(count=POOL_PREWARM):
+    """
+    Opens `count` connections in the process-wide pool ahead of the requests
+    that will use them. Returns how many were opened.
+    """
+    return get_pool().warm(count)
+
+
+def check_connection():
+    """
+    Runs a trivial query on a pooled connection to the primary. Raises if the
+    database cannot be reached.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        cursor.close()
+    except Exception:
+        pool.release(conn, discard=True)
+        raise
+    pool.release(conn)
+
+
+def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+class ReplicaBalancer:
+    """
+    Picks the order in which to try read replicas, by round robin or by
+    fewest connections checked out, leaving out replicas marked down within
+    the last `retry` seconds. Thread-safe; the counts it balances on are kept
+    by the callers through checked_out() and checked_in().
+    """
+
+    def __init__(self, count, strategy=REPLICA_BALANCING, retry=REPLICA_RETRY_SECONDS):
+        self.strategy = strategy
+        self.retry = retry
+        self._in_use = [0] * count
+        self._down_until = [0.0] * count
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def order(self):
+        now = time.monotonic()
+        with self._lock:
+            up = [i for i, until in enumerate(self._down_until) if until <= now]
+            if not up:
+                return []
+            start = next(self._turn) % len(up)
+            rotated = up[start:] + up[:start]
+            if self.strategy == "least_connections":
+                # Stable sort: ties keep the rotation, so idle replicas share load.
+                rotated.sort(key=lambda i: self._in_use[i])
+            return rotated
+
+    def mark_down(self, index):
+        with self._lock:
+            self._down_until[index] = time.monotonic() + self.retry
+
+    def checked_out(self, index):
+        with self._lock:
+            self._in_use[index] += 1
+
+    def checked_in(self, index):
+        with self._lock:
+            self._in_use[index] -= 1
+
+
+class ReplicaSet:
+    """
+    One ConnectionPool per read replica behind the acquire()/release()
+    interface of a single pool. acquire() tries replicas in the balancer's
+    order without waiting on a saturated one, and raises PoolTimeout when none
+    of them can serve a connection right away, so the read falls back to the
+    primary instead of queueing.
+    """
+
+    def __init__(self, pools, balancer=None):
+        self.pools = pools
+        self.balancer = balancer or ReplicaBalancer(len(pools))
+        self._owners = {}  # id(connection) -> index of the pool it came from
+
+    def acquire(self):
+        for index in self.balancer.order():
+            try:
+                conn = self.pools[index].acquire(timeout=0)
+            except PoolTimeout:
+                continue  # saturated rather than down
+            except Exception as e:
+                logger.warning("Read replica %d unavailable, skipping it for %ss: %s",
+                               index, self.balancer.retry, e)
+                self.balancer.mark_down(index)
+                continue
+            self.balancer.checked_out(index)
+            self._owners[id(conn)] = index
+            return conn
+        raise PoolTimeout("No read replica available")
+
+    def pool_of(self, conn):
+        """Returns the replica pool a checked-out connection came from."""
+        return self.pools[self._owners[id(conn)]]
+
+    def release(self, conn, discard=False):
+        index = self._owners.pop(id(conn))
+        self.balancer.checked_in(index)
+        self.pools[index].release(conn, discard)
+
+
+_replicas = None
+
+
+def get_replicas():
+    """
+    Returns the process-wide ReplicaSet for DB_REPLICAS, creating it on first
+    use, or None when no replicas are configured. Replica pools open their
+    connections lazily so a replica that is down at startup does not stop the
+    API from starting.
+    """
+    global _replicas
+    if _replicas is None and DB_REPLICAS:
+        with _pool_lock:
+            if _replicas is None:
+                _replicas = ReplicaSet([
+                    ConnectionPool(connect=BACKEND.replica(host, port).connect, min_size=0)
+                    for host, port in DB_REPLICAS
+                ])
+    return _replicas
+
+
+# Set once the current request has written through the primary. Later reads in
+# the same request then stay on the primary too (read-your-writes) instead of
+# possibly reading a replica that has not caught up yet. Each request runs in
+# its own context, so this never leaks from one request into the next.
+_wrote_primary = contextvars.ContextVar("wrote_primary", default=False)
+
+
+def pin_to_primary():
+    """
+    Sends the rest of the current request's reads to the primary, for writes
+    made on its behalf on another request's connection (see crud's group commit).
+    """
+    _wrote_primary.set(True)
+
+
+# The connection of the transaction() block the current request is inside, if
+# any. While one is open, pooled_connection() and read_connection() (and their
+# async counterparts) hand out that connection instead of a pooled one, so
+# every CRUD call in the block joins the same transaction.
+_shared = contextvars.ContextVar("shared_transaction", default=None)
+
+
+class SharedConnection:
+    """
+    A connection lent to the CRUD functions inside transaction(). Their own
+    commit() calls do nothing; the block commits once when it ends.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        pass
+
+
+class AsyncSharedConnection(SharedConnection):
+    """
+    SharedConnection for async_transaction(). begin() does nothing either,
+    since the block has already begun the transaction.
+    """
+
+    async def begin(self):
+        pass
+
+    async def commit(self):
+        pass
+
+
+def in_transaction():
+    """
+    Returns True inside a transaction() or async_transaction() block.
+    """
+    return _shared.get() is not None
+
+
+# Statements run on the connections lent to the CRUD functions are timed, and
+# those over slow_queries.SLOW_QUERY_MS logged (see GET /admin/slow-queries).
+SLOW_QUERIES = slow_queries.SlowQueryLog()
+
+
+def explain_on(pool, sql, params):
+    """
+    Returns the plan of a statement, from a connection checked out of pool.
+    """
+    with _lent(pool, pool.acquire()) as conn:
+        cursor = conn.cursor()
+        cursor.execute(BACKEND.explain + sql, params)
+        plan = cursor.fetchall()
+        cursor.close()
+    return plan
+
+
+def traced(conn, pool):
+    """
+    Returns conn, checked out of pool, wrapped so the slow-query log times its
+    statements (and explains slow ones on the same pool), or conn itself when
+    the log is off. The pool only ever sees the bare connection.
+    """
+    if not SLOW_QUERIES.enabled:
+        return conn
+    return slow_queries.TracedConnection(conn, SLOW_QUERIES, functools.partial(explain_on, pool))
+
+
+async def async_explain_on(pool, sql, params):
+    """
+    Async counterpart of explain_on().
+    """
+    from aiomysql import DictCursor
+    async with pool.acquire() as conn:
+        cursor = await conn.cursor(DictCursor)
+        await cursor.execute(BACKEND.explain + sql, params)
+        plan = await cursor.fetchall()
+        await cursor.close()
+    return plan
+
+
+def async_traced(conn, pool):
+    """
+    Async counterpart of traced().
+    """
+    if not SLOW_QUERIES.enabled:
+        return conn
+    return slow_queries.AsyncTracedConnection(conn, SLOW_QUERIES, functools.partial(async_explain_on, pool))
+
+
+@contextmanager
+def _lent(pool, conn):
+    """
+    Returns conn to pool when the `with` block ends. The connection is dropped
+    rather than reused if the block raised a database error, or if it was a
+    generator abandoned half way through reading a result.
+    """
+    try:
+        yield conn
+    except BACKEND.disconnect_errors + (GeneratorExit,):
+        pool.release(conn, discard=True)
+        raise
+    except BaseException:
+        pool.release(conn)
+        raise
+    else:
+        pool.release(conn)
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Checks a connection to the primary out of the pool for the duration of a
+    `with` block. Used for writes: it also pins the rest of the current
+    request's reads to the primary.
+    """
+    _wrote_primary.set(True)
+    shared = _shared.get()
+    if shared is not None:
+        yield shared
+        return
+    pool = get_pool()
+    with _lent(pool, pool.acquire()) as conn:
+        yield traced(conn, pool)
+
+
+@contextmanager
+def transaction():
+    """
+    Runs the CRUD calls made inside a `with` block on one primary connection
+    as a single transaction: committed when the block ends, rolled back if it
+    raises. Nested blocks join the outer one.
+    """
+    if _shared.get() is not None:
+        yield
+        return
+    _wrote_primary.set(True)
+    pool = get_pool()
+    with _lent(pool, pool.acquire()) as conn:
+        token = _shared.set(SharedConnection(traced(conn, pool)))
+        try:
+            yield
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            _shared.reset(token)
+
+
+@contextmanager
+def read_connection():
+    """
+    Checks out a connection for reads: from a read replica when any are
+    configured and the current request has not written yet, otherwise (or if
+    no replica is available) from the primary pool.
+    """
+    shared = _shared.get()
+    if shared is not None:
+        yield shared
+        return
+    replicas = get_replicas()
+    if replicas is not None and not _wrote_primary.get():
+        try:
+            conn = replicas.acquire()
+        except PoolTimeout:
+            pass
+        else:
+            with _lent(replicas, conn) as conn:
+                yield traced(conn, replicas.pool_of(conn))
+            return
+    pool = get_pool()
+    with _lent(pool, pool.acquire()) as conn:
+        yield traced(conn, pool)
+
+
+_async_pool = None
+_async_pool_lock = asyncio.Lock()
+
+
+async def get_async_pool():
+    """
+    Returns the process-wide aiomysql pool, creating it on first use.
+    Connections run in autocommit mode: aiomysql closes any connection that is
+    released with a transaction still open, which would defeat the pool for
+    plain SELECTs.
+    """
+    global _async_pool
+    if _async_pool is None:
+        async with _async_pool_lock:
+            if _async_pool is None:
+                import aiomysql
+                from pymysql.constants import CLIENT
+                _async_pool = await aiomysql.create_pool(
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    user=DB_USER,
+                    password=DB_PASSWORD,
+                    db=DB_NAME,
+                    minsize=POOL_MIN_SIZE,
+                    maxsize=POOL_MAX_SIZE,
+                    pool_recycle=POOL_RECYCLE_SECONDS,
+                    autocommit=True,
+                    client_flag=CLIENT.FOUND_ROWS,
+                )
+    return _async_pool
+
+
+@asynccontextmanager
+async def async_pooled_connection():
+    """
+    Async counterpart of pooled_connection(): checks an aiomysql connection
+    to the primary out of the async pool for the duration of an `async with`
+    block, and pins the rest of the request's reads to the primary.
+    """
+    _wrote_primary.set(True)
+    shared = _shared.get()
+    if shared is not None:
+        yield shared
+        return
+    pool = await get_async_pool()
+    started = time.monotonic()
+    async with pool.acquire() as conn:
+        metrics.POOL_WAIT.observe(time.monotonic() - started, "async")
+        yield async_traced(conn, pool)
+
+
+@asynccontextmanager
+async def async_transaction():
+    """
+    Async counterpart of transaction().
+    """
+    if _shared.get() is not None:
+        yield
+        return
+    _wrote_primary.set(True)
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        token = _shared.set(AsyncSharedConnection(async_traced(conn, pool)))
+        try:
+            await conn.begin()
+            yield
+        except BaseException:
+            await conn.rollback()
+            raise
+        else:
+            await conn.commit()
+        finally:
+            _shared.reset(token)
+
+
+async def warm_async_pool(count=POOL_PREWARM):
+    """
+    Async counterpart of warm_pool(): creates the async pool and checks out
+    `count` connections at once, so that many are open when they go back.
+    """
+    pool = await get_async_pool()
+    count = max(count - pool.size, 0)
+    conns = await asyncio.gather(*(pool.acquire() for _ in range(count)), return_exceptions=True)
+    for conn in conns:
+        if not isinstance(conn, BaseException):
+            pool.release(conn)
+    for conn in conns:
+        if isinstance(conn, BaseException):
+            raise conn
+    return count
+
+
+async def async_check_connection():
+    """
+    Async counterpart of check_connection().
+    """
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT 1")
+        await cursor.fetchall()
+        await cursor.close()
+
+
+_async_replica_pools = None
+_async_replica_balancer = None
+
+
+async def get_async_replica_pools():
+    """
+    Returns one aiomysql pool per DB_REPLICAS entry, creating them on first
+    use. Like the primary pool they run in autocommit mode; minsize=0 so an
+    unreachable replica only fails when it is picked.
+    """
+    global _async_replica_pools, _async_replica_balancer
+    if _async_replica_pools is None:
+        async with _async_pool_lock:
+            if _async_replica_pools is None:
+                import aiomysql
+                from pymysql.constants import CLIENT
+                _async_replica_balancer = ReplicaBalancer(len(DB_REPLICAS))
+                _async_replica_pools = [
+                    await aiomysql.create_pool(
+                        host=host,
+                        port=port,
+                        user=DB_USER,
+                        password=DB_PASSWORD,
+                        db=DB_NAME,
+                        minsize=0,
+                        maxsize=POOL_MAX_SIZE,
+                        pool_recycle=POOL_RECYCLE_SECONDS,
+                        autocommit=True,
+                        client_flag=CLIENT.FOUND_ROWS,
+                    )
+                    for host, port in DB_REPLICAS
+                ]
+    return _async_replica_pools
+
+
+@asynccontextmanager
+async def async_read_connection():
+    """
+    Async counterpart of read_connection(): an aiomysql connection to a read
+    replica when one is configured, reachable, has a connection free and the
+    request has not written yet, otherwise to the primary.
+    """
+    shared = _shared.get()
+    if shared is not None:
+        yield shared
+        return
+    if DB_REPLICAS and not _wrote_primary.get():
+        pools = await get_async_replica_pools()
+        for index in _async_replica_balancer.order():
+            if pools[index].freesize == 0 and pools[index].size >= pools[index].maxsize:
+                continue  # saturated rather than down: aiomysql would wait for a release
+            try:
+                conn = await pools[index].acquire()
+            except Exception as e:
+                logger.warning("Read replica %d unavailable, skipping it for %ss: %s",
+                               index, _async_replica_balancer.retry, e)
+                _async_replica_balancer.mark_down(index)
+                continue
+            _async_replica_balancer.checked_out(index)
+            try:
+                yield async_traced(conn, pools[index])
+            finally:
+                _async_replica_balancer.checked_in(index)
+                pools[index].release(conn)
+            return
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        yield async_traced(conn, pool)
+
+
+async def close_async_pool():
+    global _async_pool, _async_replica_pools
+    if _async_pool is not None:
+        _async_pool.close()
+        await _async_pool.wait_closed()
+        _async_pool = None
+    if _async_replica_pools is not None:
+        for pool in _async_replica_pools:
+            pool.close()
+            await pool.wait_closed()
+        _async_replica_pools = None
 
 
 def convert_query(query: str) -> str:
@@ -27,19 +799,28 @@ def convert_query(query: str) -> str:
 
 
 def initialize_db():
-    create_table_query = """
-    CREATE TABLE IF NOT EXISTS Tenants (
-        tenantID INT AUTO_INCREMENT PRIMARY KEY,
-        firstName VARCHAR(100) NOT NULL,
-        lastName VARCHAR(100) NOT NULL,
-        phoneNumber VARCHAR(10) NOT NULL,
-        email VARCHAR(100) NOT NULL UNIQUE
-    );
+    """
+    Brings the schema up to date by applying any pending migrations from
+    migrations.py, then reports required indexes that are still missing.
     """
     conn = get_connection()
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(create_table_query)
-        conn.commit()
+        migrations.migrate(conn, BACKEND.dialect)
+        migrations.check_indexes(conn, BACKEND.dialect)
     finally:
         conn.close()
+
+
+def check_schema():
+    """
+    Reports required indexes that are missing without changing the schema.
+    """
+    conn = get_connection()
+    try:
+        return migrations.check_indexes(conn, BACKEND.dialect)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    initialize_db()
@@ -0,0 +1,121 @@
+# health.py
+# Startup warm-up and the probes behind GET /healthz and GET /readyz.
+#
+# Nothing touches the database while the API is imported or while it starts:
+# the application lifespan only launches Warmup in the background, which
+# checks (or, with MIGRATE_ON_STARTUP, migrates) the schema, validates the
+# query catalog and opens db.POOL_PREWARM connections, retrying with backoff
+# for as long as the database is down or slow. The process therefore starts,
+# and answers /healthz, whatever state the database is in, and an
+# orchestrator polling /readyz only sends it traffic once the warm-up is done
+# and the database answers.
+import asyncio
+import logging
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+import db
+import queries
+
+logger = logging.getLogger(__name__)
+
+# Delay before retrying a failed warm-up, doubled after each failure up to
+# WARMUP_MAX_RETRY_SECONDS.
+WARMUP_RETRY_SECONDS = 1.0
+WARMUP_MAX_RETRY_SECONDS = 30.0
+# How long /readyz waits for the database to answer before reporting it down.
+READY_CHECK_TIMEOUT_SECONDS = 2.0
+
+
+def prepare_schema():
+    """
+    Brings the schema up to date (MIGRATE_ON_STARTUP) or reports missing
+    indexes, then has the database validate every catalog query.
+    """
+    if db.MIGRATE_ON_STARTUP:
+        db.initialize_db()
+    else:
+        db.check_schema()
+    queries.check_queries()
+
+
+async def warm_up():
+    """
+    Runs the startup work once: prepare_schema() and opening POOL_PREWARM
+    connections in the pool of the current DB_MODE.
+    """
+    await run_in_threadpool(prepare_schema)
+    if db.DB_MODE == "async":
+        await db.warm_async_pool()
+    else:
+        await run_in_threadpool(db.warm_pool)
+
+
+async def check_database():
+    """
+    Raises if the database does not answer a trivial query within
+    READY_CHECK_TIMEOUT_SECONDS.
+    """
+    if db.DB_MODE == "async":
+        check = db.async_check_connection()
+    else:
+        check = run_in_threadpool(db.check_connection)
+    await asyncio.wait_for(check, READY_CHECK_TIMEOUT_SECONDS)
+
+
+class Warmup:
+    """
+    Runs warm_up() in the background until it succeeds, and reports whether it
+    has. `error` holds the reason the last attempt failed.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self.started_at = time.monotonic()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        delay = WARMUP_RETRY_SECONDS
+        while True:
+            try:
+                await warm_up()
+                break
+            except Exception as e:
+                self.error = str(e) or type(e).__name__
+                logger.exception("Startup warm-up failed; retrying in %ss", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WARMUP_MAX_RETRY_SECONDS)
+        self.error = None
+        self.ready = True
+        self.finished_at = time.monotonic()
+        logger.info("Warm-up finished in %.2fs", self.finished_at - self.started_at)
+
+    async def readiness(self):
+        """
+        Returns (ready, body) for /readyz: ready once the warm-up is done and
+        the database answers a query.
+        """
+        if not self.ready:
+            return False, {"status": "starting", "detail": self.error}
+        try:
+            await check_database()
+        except Exception as e:
+            return False, {"status": "unavailable", "detail": str(e) or type(e).__name__}
+        return True, {"status": "ready"}
@@ -0,0 +1,258 @@
+# imports.py
+# Streaming CSV and NDJSON imports behind POST /import/{resource}.
+#
+# The upload is the raw request body (e.g. curl --data-binary @tenants.csv),
+# read chunk by chunk as it arrives. Records are split out of the chunks,
+# validated one at a time against the resource's model and written in
+# batches of IMPORT_BATCH_SIZE rows, each batch in its own transaction
+# (crud.import_rows()). Only the current batch and one partial record are ever
+# held in memory, so a file of any size imports in constant memory, and the
+# rows of a batch cost one multi-row INSERT and one commit instead of a
+# request each.
+#
+# Rows are not all-or-nothing: a row that fails validation or is rejected by
+# the database is reported by line number and skipped, and every other row is
+# imported. Batches committed before a failure stay committed.
+import csv
+from enum import Enum
+import json
+
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from models import Lease, MaintenanceRequest, Payment, Property, Tenant, Unit
+
+IMPORT_BATCH_SIZE = 500
+# Failed rows listed in the report; further failures are only counted.
+IMPORT_MAX_ERRORS = 1000
+# Lines one CSV record may span before a stray quote is assumed and the record
+# is rejected, rather than reading the rest of the file into it.
+IMPORT_MAX_RECORD_LINES = 100
+# Longest line kept in memory; a longer one is reported and skipped.
+IMPORT_MAX_LINE_BYTES = 1 << 20
+
+
+class ImportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+# API resource names accepted by the /import routes, with the table each one
+# is written to and the model its rows are validated against.
+IMPORTS = {
+    "tenants": ("Tenants", Tenant),
+    "properties": ("Properties", Property),
+    "units": ("Units", Unit),
+    "maintenance_requests": ("MaintenanceRequests", MaintenanceRequest),
+    "leases": ("Leases", Lease),
+    "payments": ("Payments", Payment),
+}
+
+
+class InvalidImport(ValueError):
+    """Raised for an upload that cannot be read at all, e.g. a CSV file without a header."""
+
+
+async def iter_lines(chunks):
+    """
+    Splits an async iterable of byte chunks into lines, without their line
+    endings. A line longer than IMPORT_MAX_LINE_BYTES is yielded as None as
+    soon as it outgrows the limit, and the rest of it is skipped unread.
+    """
+    pending = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        view = memoryview(chunk)
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if skipping:
+                skipping = False
+            else:
+                pending += view[start:end]
+                yield None if len(pending) > IMPORT_MAX_LINE_BYTES else bytes(pending).rstrip(b"\r")
+                pending.clear()
+            start = end + 1
+        if not skipping:
+            pending += view[start:]
+            if len(pending) > IMPORT_MAX_LINE_BYTES:
+                yield None
+                pending.clear()
+                skipping = True
+    if pending:
+        yield bytes(pending).rstrip(b"\r")
+
+
+async def iter_text_lines(chunks):
+    """
+    iter_lines() decoded as UTF-8 (a leading byte order mark is dropped).
+    Yields (line number, text, error), with text None and the reason in error
+    for a line that is too long or not valid UTF-8.
+    """
+    number = 0
+    async for line in iter_lines(chunks):
+        number += 1
+        if line is None:
+            yield number, None, "Line is longer than %d bytes" % IMPORT_MAX_LINE_BYTES
+            continue
+        try:
+            yield number, line.decode("utf-8-sig" if number == 1 else "utf-8"), None
+        except UnicodeDecodeError:
+            yield number, None, "Line is not valid UTF-8"
+
+
+async def ndjson_records(chunks):
+    """
+    Yields (line number, row dict or error message) for each non-blank line.
+    """
+    async for number, text, error in iter_text_lines(chunks):
+        if error:
+            yield number, error
+            continue
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as e:
+            yield number, "Invalid JSON: %s" % e
+            continue
+        yield number, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+async def csv_records(chunks):
+    """
+    Yields (line number, row dict or error message) for each record after the
+    header line, which names the columns. A quoted field may span lines; the
+    record is numbered by its first line. Empty fields are left out of the
+    row, so optional fields take their defaults.
+    """
+    header = None
+    record = []
+    start = None
+    async for number, text, error in iter_text_lines(chunks):
+        if error:
+            yield number, error
+            record = []
+            continue
+        if not record:
+            if not text.strip():
+                continue
+            start = number
+        record.append(text)
+        joined = "\n".join(record)
+        # An odd number of quotes means a quoted field runs on into the next
+        # line (quotes inside a field are doubled, so never change the parity).
+        if joined.count('"') % 2:
+            if len(record) < IMPORT_MAX_RECORD_LINES:
+                continue
+            yield start, "Unterminated quoted field"
+            record = []
+            continue
+        record = []
+        try:
+            values = next(csv.reader([joined], strict=True))
+        except csv.Error as e:
+            yield start, "Invalid CSV: %s" % e
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, "Expected %d fields, found %d" % (len(header), len(values))
+            continue
+        yield start, {name: value for name, value in zip(header, values) if value != ""}
+    if record:
+        yield start, "Unterminated quoted field"
+    if header is None:
+        raise InvalidImport("The CSV upload has no header line")
+
+
+RECORD_READERS = {
+    ImportFormat.csv: csv_records,
+    ImportFormat.ndjson: ndjson_records,
+}
+
+
+def describe(error: ValidationError) -> str:
+    return "; ".join(
+        "%s: %s" % (".".join(str(part) for part in detail["loc"]), detail["msg"]) for detail in error.errors()
+    )
+
+
+class ImportReport:
+    """
+    Counts imported and failed rows and keeps the first IMPORT_MAX_ERRORS
+    failures.
+    """
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+            "errorsTruncated": self.failed > len(self.errors),
+        }
+
+
+def in_threadpool(function):
+    """
+    Wraps crud.import_rows() (or any blocking function) as an awaitable that
+    runs it in the threadpool.
+    """
+    async def call(*args):
+        return await run_in_threadpool(function, *args)
+    return call
+
+
+async def run_import(resource: str, fmt: ImportFormat, chunks, import_rows) -> dict:
+    """
+    Imports the records in `chunks` (an async iterable of bytes, such as
+    Request.stream()) into `resource`. `import_rows` is an awaitable version of
+    crud.import_rows(): async_crud's, or crud's wrapped by in_threadpool().
+    Returns the report: {"imported", "failed", "errors", "errorsTruncated"}.
+    """
+    table, model = IMPORTS[resource]
+    report = ImportReport()
+    batch = []
+    lines = []
+
+    async def flush():
+        try:
+            results = await import_rows(table, batch)
+        except Exception as e:
+            results = [e] * len(batch)
+        for line, result in zip(lines, results):
+            if isinstance(result, Exception):
+                report.fail(line, str(result))
+            else:
+                report.imported += 1
+        batch.clear()
+        lines.clear()
+
+    async for line, row in RECORD_READERS[fmt](chunks):
+        if isinstance(row, str):
+            report.fail(line, row)
+            continue
+        try:
+            batch.append(model(**row).dict())
+        except ValidationError as e:
+            report.fail(line, describe(e))
+            continue
+        lines.append(line)
+        if len(batch) == IMPORT_BATCH_SIZE:
+            await flush()
+    if batch:
+        await flush()
+    return report.as_dict()
@@ -1,12 +1,50 @@
-from fastapi import FastAPI, HTTPException
-from typing import List
+from contextlib import asynccontextmanager
+from datetime import date
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Query, Request
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import crud
+import db
+import metrics
+from batch import BatchError, run_batch
+from cache import entity_cache
+from changes import ChangeFeed, InvalidChangeQuery, ThreadedStore, parse_resources
+from health import Warmup
+from imports import IMPORTS, ImportFormat, InvalidImport, in_threadpool, run_import
+from metrics import MetricsMiddleware
 from models import Tenant, TenantOut, Property, PropertyOut, Unit, UnitOut, MaintenanceRequest, MaintenanceRequestOut, \
-    Lease, LeaseOut, Payment, PaymentOut, UnitMaintenanceRequest
-
-app = FastAPI()
-
+    Lease, LeaseOut, Payment, PaymentOut, UnitMaintenanceRequest, TenantPage, PropertyPage, UnitPage, \
+    MaintenanceRequestPage, LeasePage, PaymentPage, UnitMaintenanceRequestPage, TenantPatch, PropertyPatch, UnitPatch, \
+    MaintenanceRequestPatch, LeasePatch, PaymentPatch, PropertySummary, ImportResult, BatchRequest, BatchResult, \
+    TenantSearchResult, PropertySearchResult
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, ExpiredSyncToken, InvalidListQuery
+from search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, SEARCH_QUERY_DESCRIPTION
+from serialization import rows_response
+from slow_queries import SLOW_QUERY_LOG_SIZE, SLOW_QUERY_MS
+from streaming import MEDIA_TYPES, ExportFormat, encode_rows
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts the database warm-up in the background (see health.py) so the API
+    comes up without waiting on the database, and closes the pools and the
+    change feed on shutdown.
+    """
+    warmup.start()
+    yield
+    await warmup.stop()
+    await change_feed.stop()
+    await db.close_async_pool()
+    db.close_pool()
+
+
+warmup = Warmup()
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -15,8 +53,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+router = APIRouter()
+
+
+@app.get("/healthz")
+async def read_health():
+    """
+    Liveness: the process is up and serving requests. Never touches the database.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def read_readiness():
+    """
+    Readiness: 200 once the startup warm-up has finished and the database
+    answers, 503 (with the reason) until then or while it is unreachable.
+    """
+    ready, body = await warmup.readiness()
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.get("/cache/stats")
+def read_cache_stats():
+    return entity_cache.stats()
+
 
-@app.post("/tenants", response_model=TenantOut)
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/slow-queries")
+def read_slow_queries(limit: Optional[int] = Query(None, ge=1, le=SLOW_QUERY_LOG_SIZE)):
+    """
+    The most recent statements that took at least SLOW_QUERY_MS, newest first,
+    each with its normalized SQL, parameter fingerprint, duration, row count
+    and (once the background EXPLAIN has run) its plan.
+    """
+    return {"thresholdMs": SLOW_QUERY_MS, "entries": db.SLOW_QUERIES.snapshot(limit)}
+
+
+@app.delete("/admin/slow-queries")
+def clear_slow_queries():
+    db.SLOW_QUERIES.clear()
+    return {"detail": "Slow-query log cleared"}
+
+
+@app.get("/changes")
+async def stream_changes(request: Request, resources: Optional[str] = None, after: Optional[int] = None,
+                         last_event_id: Optional[int] = Header(None)):
+    """
+    Streams inserts, updates and deletes as Server-Sent Events, optionally only
+    for some resources (e.g. ?resources=units,maintenance_requests). Each event
+    carries its seq, resource, operation and the row's key; a client resumes
+    after a disconnect by passing the last seq it saw as Last-Event-ID (which
+    EventSource does automatically) or ?after=.
+    """
+    try:
+        wanted = parse_resources(resources)
+    except InvalidChangeQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if after is None:
+        after = last_event_id
+    return StreamingResponse(change_feed.stream(after, wanted, request.is_disconnected),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.post("/tenants", response_model=TenantOut)
 def create_tenant(tenant: Tenant):
     try:
         tenantID = crud.create_tenant(tenant.dict())
@@ -25,32 +130,68 @@ def create_tenant(tenant: Tenant):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/tenants/{tenantID}", response_model=TenantOut)
+@router.post("/tenants/bulk", response_model=List[TenantOut])
+def create_tenants(tenants: List[Tenant]):
+    try:
+        rows = [tenant.dict() for tenant in tenants]
+        tenantIDs = crud.create_tenants(rows)
+        return [{**row, "tenantID": tenantID} for row, tenantID in zip(rows, tenantIDs)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/tenants/search", response_model=TenantSearchResult)
+def search_tenants(q: str = Query(..., min_length=1, description=SEARCH_QUERY_DESCRIPTION),
+                   limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT)):
+    return rows_response(crud.search_tenants(q, limit))
+
+
+@router.get("/tenants/{tenantID}", response_model=TenantOut)
 def read_tenant(tenantID: int):
     tenant = crud.get_tenant(tenantID)
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
-    return tenant
+    return rows_response(tenant)
 
 
-@app.get("/tenants", response_model=List[TenantOut])
-def read_tenants():
-    return crud.get_tenants()
+@router.get("/tenants", response_model=TenantPage, response_model_exclude_unset=True)
+def read_tenants(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                 after: Optional[str] = None,
+                 since: Optional[str] = None):
+    try:
+        return rows_response(crud.get_tenants(limit, after, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.put("/tenants/{tenantID}", response_model=TenantOut)
+@router.put("/tenants/{tenantID}", response_model=TenantOut)
 def update_tenant(tenantID: int, tenant: Tenant):
     try:
-        crud.update_tenant(tenantID, tenant.dict())
-        updated = crud.get_tenant(tenantID)
+        if not crud.update_tenant(tenantID, tenant.dict()):
+            raise HTTPException(status_code=404, detail="Tenant not found")
+        return {**tenant.dict(), "tenantID": tenantID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/tenants/{tenantID}", response_model=TenantOut)
+def patch_tenant(tenantID: int, tenant: TenantPatch):
+    try:
+        updated = crud.patch_tenant(tenantID, tenant.dict(exclude_unset=True))
         if not updated:
             raise HTTPException(status_code=404, detail="Tenant not found")
         return updated
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.delete("/tenants/{tenantID}")
+@router.delete("/tenants/{tenantID}")
 def delete_tenant(tenantID: int):
     try:
         crud.delete_tenant(tenantID)
@@ -63,7 +204,7 @@ def delete_tenant(tenantID: int):
 # PROPERTIES ENDPOINTS
 # ------------------------------
 
-@app.post("/properties", response_model=PropertyOut)
+@router.post("/properties", response_model=PropertyOut)
 def create_property(property: Property):
     try:
         propertyID = crud.create_property(property.dict())
@@ -72,32 +213,84 @@ def create_property(property: Property):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/properties/{propertyID}", response_model=PropertyOut)
+@router.get("/properties/search", response_model=PropertySearchResult)
+def search_properties(q: str = Query(..., min_length=1, description=SEARCH_QUERY_DESCRIPTION),
+                      limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT)):
+    return rows_response(crud.search_properties(q, limit))
+
+
+@router.get("/properties/summary", response_model=PropertySummary)
+def read_portfolio_summary():
+    return rows_response(crud.get_portfolio_summary())
+
+
+@router.get("/properties/{propertyID}/summary", response_model=PropertySummary)
+def read_property_summary(propertyID: int):
+    summary = crud.get_property_summary(propertyID)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return rows_response(summary)
+
+
+@router.post("/admin/property-summaries/recount")
+def recount_property_summaries():
+    """
+    Recomputes every property summary from the Units and Leases tables.
+    """
+    try:
+        crud.recount_property_summaries()
+        return {"detail": "Property summaries recounted"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/properties/{propertyID}", response_model=PropertyOut)
 def read_property(propertyID: int):
     property_obj = crud.get_property(propertyID)
     if not property_obj:
         raise HTTPException(status_code=404, detail="Property not found")
-    return property_obj
+    return rows_response(property_obj)
 
 
-@app.get("/properties", response_model=List[PropertyOut])
-def read_properties():
-    return crud.get_properties()
+@router.get("/properties", response_model=PropertyPage, response_model_exclude_unset=True)
+def read_properties(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                    after: Optional[str] = None,
+                    city: Optional[str] = None,
+                    since: Optional[str] = None):
+    try:
+        return rows_response(crud.get_properties(limit, after, {"city": city}, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.put("/properties/{propertyID}", response_model=PropertyOut)
+@router.put("/properties/{propertyID}", response_model=PropertyOut)
 def update_property(propertyID: int, property: Property):
     try:
-        crud.update_property(propertyID, property.dict())
-        updated = crud.get_property(propertyID)
+        if not crud.update_property(propertyID, property.dict()):
+            raise HTTPException(status_code=404, detail="Property not found")
+        return {**property.dict(), "propertyID": propertyID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/properties/{propertyID}", response_model=PropertyOut)
+def patch_property(propertyID: int, property: PropertyPatch):
+    try:
+        updated = crud.patch_property(propertyID, property.dict(exclude_unset=True))
         if not updated:
             raise HTTPException(status_code=404, detail="Property not found")
         return updated
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.delete("/properties/{propertyID}")
+@router.delete("/properties/{propertyID}")
 def delete_property(propertyID: int):
     try:
         crud.delete_property(propertyID)
@@ -106,7 +299,7 @@ def delete_property(propertyID: int):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.post("/units", response_model=UnitOut)
+@router.post("/units", response_model=UnitOut)
 def create_unit(unit: Unit):
     try:
         unitID = crud.create_unit(unit.dict())
@@ -115,32 +308,64 @@ def create_unit(unit: Unit):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/units/{unitID}", response_model=UnitOut)
+@router.post("/units/bulk", response_model=List[UnitOut])
+def create_units(units: List[Unit]):
+    try:
+        rows = [unit.dict() for unit in units]
+        unitIDs = crud.create_units(rows)
+        return [{**row, "unitID": unitID} for row, unitID in zip(rows, unitIDs)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/units/{unitID}", response_model=UnitOut)
 def read_unit(unitID: int):
     unit_obj = crud.get_unit(unitID)
     if not unit_obj:
         raise HTTPException(status_code=404, detail="Unit not found")
-    return unit_obj
+    return rows_response(unit_obj)
 
 
-@app.get("/units", response_model=List[UnitOut])
-def read_units():
-    return crud.get_units()
+@router.get("/units", response_model=UnitPage, response_model_exclude_unset=True)
+def read_units(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+               after: Optional[str] = None,
+               propertyID: Optional[int] = None,
+               status: Optional[str] = None,
+               since: Optional[str] = None):
+    try:
+        return rows_response(crud.get_units(limit, after, {"propertyID": propertyID, "status": status}, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.put("/units/{unitID}", response_model=UnitOut)
+@router.put("/units/{unitID}", response_model=UnitOut)
 def update_unit(unitID: int, unit: Unit):
     try:
-        crud.update_unit(unitID, unit.dict())
-        updated = crud.get_unit(unitID)
+        if not crud.update_unit(unitID, unit.dict()):
+            raise HTTPException(status_code=404, detail="Unit not found")
+        return {**unit.dict(), "unitID": unitID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/units/{unitID}", response_model=UnitOut)
+def patch_unit(unitID: int, unit: UnitPatch):
+    try:
+        updated = crud.patch_unit(unitID, unit.dict(exclude_unset=True))
         if not updated:
             raise HTTPException(status_code=404, detail="Unit not found")
         return updated
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.delete("/units/{unitID}")
+@router.delete("/units/{unitID}")
 def delete_unit(unitID: int):
     try:
         crud.delete_unit(unitID)
@@ -149,7 +374,7 @@ def delete_unit(unitID: int):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.post("/maintenance_requests", response_model=MaintenanceRequestOut)
+@router.post("/maintenance_requests", response_model=MaintenanceRequestOut)
 def create_maintenance_request(mr: MaintenanceRequest):
     try:
         requestID = crud.create_maintenance_request(mr.dict())
@@ -158,32 +383,57 @@ def create_maintenance_request(mr: MaintenanceRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/maintenance_requests/{requestID}", response_model=MaintenanceRequestOut)
+@router.get("/maintenance_requests/{requestID}", response_model=MaintenanceRequestOut)
 def read_maintenance_request(requestID: int):
     mr_obj = crud.get_maintenance_request(requestID)
     if not mr_obj:
         raise HTTPException(status_code=404, detail="Maintenance request not found")
-    return mr_obj
+    return rows_response(mr_obj)
 
 
-@app.get("/maintenance_requests", response_model=List[MaintenanceRequestOut])
-def read_maintenance_requests():
-    return crud.get_maintenance_requests()
+@router.get("/maintenance_requests", response_model=MaintenanceRequestPage, response_model_exclude_unset=True)
+def read_maintenance_requests(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                              after: Optional[str] = None,
+                              status: Optional[str] = None,
+                              date_from: Optional[date] = Query(None, alias="from"),
+                              date_to: Optional[date] = Query(None, alias="to"),
+                              sort: Optional[str] = None,
+                              since: Optional[str] = None):
+    try:
+        filters = {"status": status, "from": date_from, "to": date_to}
+        return rows_response(crud.get_maintenance_requests(limit, after, filters, sort, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.put("/maintenance_requests/{requestID}", response_model=MaintenanceRequestOut)
+@router.put("/maintenance_requests/{requestID}", response_model=MaintenanceRequestOut)
 def update_maintenance_request(requestID: int, mr: MaintenanceRequest):
     try:
-        crud.update_maintenance_request(requestID, mr.dict())
-        updated = crud.get_maintenance_request(requestID)
+        if not crud.update_maintenance_request(requestID, mr.dict()):
+            raise HTTPException(status_code=404, detail="Maintenance request not found")
+        return {**mr.dict(), "requestID": requestID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.patch("/maintenance_requests/{requestID}", response_model=MaintenanceRequestOut)
+def patch_maintenance_request(requestID: int, mr: MaintenanceRequestPatch):
+    try:
+        updated = crud.patch_maintenance_request(requestID, mr.dict(exclude_unset=True))
         if not updated:
             raise HTTPException(status_code=404, detail="Maintenance request not found")
         return updated
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.delete("/maintenance_requests/{requestID}")
+@router.delete("/maintenance_requests/{requestID}")
 def delete_maintenance_request(requestID: int):
     try:
         crud.delete_maintenance_request(requestID)
@@ -192,7 +442,7 @@ def delete_maintenance_request(requestID: int):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.post("/leases", response_model=LeaseOut)
+@router.post("/leases", response_model=LeaseOut)
 def create_lease(lease: Lease):
     try:
         leaseID = crud.create_lease(lease.dict())
@@ -201,32 +451,69 @@ def create_lease(lease: Lease):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/leases/{leaseID}", response_model=LeaseOut)
+@router.post("/leases/bulk", response_model=List[LeaseOut])
+def create_leases(leases: List[Lease]):
+    try:
+        rows = [lease.dict() for lease in leases]
+        leaseIDs = crud.create_leases(rows)
+        return [{**row, "leaseID": leaseID} for row, leaseID in zip(rows, leaseIDs)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/leases/{leaseID}", response_model=LeaseOut)
 def read_lease(leaseID: int):
     lease_obj = crud.get_lease(leaseID)
     if not lease_obj:
         raise HTTPException(status_code=404, detail="Lease not found")
-    return lease_obj
+    return rows_response(lease_obj)
+
+
+@router.get("/leases", response_model=LeasePage, response_model_exclude_unset=True)
+def read_leases(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                after: Optional[str] = None,
+                unitID: Optional[int] = None,
+                tenantID: Optional[int] = None,
+                date_from: Optional[date] = Query(None, alias="from"),
+                date_to: Optional[date] = Query(None, alias="to"),
+                sort: Optional[str] = None,
+                expand: Optional[str] = None,
+                since: Optional[str] = None):
+    try:
+        filters = {"unitID": unitID, "tenantID": tenantID, "from": date_from, "to": date_to}
+        return rows_response(crud.get_leases(limit, after, filters, sort, expand, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/leases", response_model=List[LeaseOut])
-def read_leases():
-    return crud.get_leases()
+@router.put("/leases/{leaseID}", response_model=LeaseOut)
+def update_lease(leaseID: int, lease: Lease):
+    try:
+        if not crud.update_lease(leaseID, lease.dict()):
+            raise HTTPException(status_code=404, detail="Lease not found")
+        return {**lease.dict(), "leaseID": leaseID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.put("/leases/{leaseID}", response_model=LeaseOut)
-def update_lease(leaseID: int, lease: Lease):
+@router.patch("/leases/{leaseID}", response_model=LeaseOut)
+def patch_lease(leaseID: int, lease: LeasePatch):
     try:
-        crud.update_lease(leaseID, lease.dict())
-        updated = crud.get_lease(leaseID)
+        updated = crud.patch_lease(leaseID, lease.dict(exclude_unset=True))
         if not updated:
             raise HTTPException(status_code=404, detail="Lease not found")
         return updated
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.delete("/leases/{leaseID}")
+@router.delete("/leases/{leaseID}")
 def delete_lease(leaseID: int):
     try:
         crud.delete_lease(leaseID)
@@ -235,7 +522,7 @@ def delete_lease(leaseID: int):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.post("/payments", response_model=PaymentOut)
+@router.post("/payments", response_model=PaymentOut)
 def create_payment(payment: Payment):
     try:
         paymentID = crud.create_payment(payment.dict())
@@ -244,32 +531,69 @@ def create_payment(payment: Payment):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/payments/{paymentID}", response_model=PaymentOut)
+@router.post("/payments/bulk", response_model=List[PaymentOut])
+def create_payments(payments: List[Payment]):
+    try:
+        rows = [payment.dict() for payment in payments]
+        paymentIDs = crud.create_payments(rows)
+        return [{**row, "paymentID": paymentID} for row, paymentID in zip(rows, paymentIDs)]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/payments/{paymentID}", response_model=PaymentOut)
 def read_payment(paymentID: int):
     payment_obj = crud.get_payment(paymentID)
     if not payment_obj:
         raise HTTPException(status_code=404, detail="Payment not found")
-    return payment_obj
+    return rows_response(payment_obj)
+
+
+@router.get("/payments", response_model=PaymentPage, response_model_exclude_unset=True)
+def read_payments(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                  after: Optional[str] = None,
+                  leaseID: Optional[int] = None,
+                  tenantID: Optional[int] = None,
+                  date_from: Optional[date] = Query(None, alias="from"),
+                  date_to: Optional[date] = Query(None, alias="to"),
+                  sort: Optional[str] = None,
+                  expand: Optional[str] = None,
+                  since: Optional[str] = None):
+    try:
+        filters = {"leaseID": leaseID, "tenantID": tenantID, "from": date_from, "to": date_to}
+        return rows_response(crud.get_payments(limit, after, filters, sort, expand, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/payments", response_model=List[PaymentOut])
-def read_payments():
-    return crud.get_payments()
+@router.put("/payments/{paymentID}", response_model=PaymentOut)
+def update_payment(paymentID: int, payment: Payment):
+    try:
+        if not crud.update_payment(paymentID, payment.dict()):
+            raise HTTPException(status_code=404, detail="Payment not found")
+        return {**payment.dict(), "paymentID": paymentID}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.put("/payments/{paymentID}", response_model=PaymentOut)
-def update_payment(paymentID: int, payment: Payment):
+@router.patch("/payments/{paymentID}", response_model=PaymentOut)
+def patch_payment(paymentID: int, payment: PaymentPatch):
     try:
-        crud.update_payment(paymentID, payment.dict())
-        updated = crud.get_payment(paymentID)
+        updated = crud.patch_payment(paymentID, payment.dict(exclude_unset=True))
         if not updated:
             raise HTTPException(status_code=404, detail="Payment not found")
         return updated
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.delete("/payments/{paymentID}")
+@router.delete("/payments/{paymentID}")
 def delete_payment(paymentID: int):
     try:
         crud.delete_payment(paymentID)
@@ -277,7 +601,7 @@ def delete_payment(paymentID: int):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/unit_maintenance_requests")
+@router.post("/unit_maintenance_requests")
 def create_unit_maintenance_request(umr: UnitMaintenanceRequest):
     try:
         crud.create_unit_maintenance_request(umr.dict())
@@ -286,15 +610,101 @@ def create_unit_maintenance_request(umr: UnitMaintenanceRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.get("/unit_maintenance_requests", response_model=List[UnitMaintenanceRequest])
-def read_unit_maintenance_requests():
-    return crud.get_unit_maintenance_requests()
+@router.post("/unit_maintenance_requests/bulk")
+def create_unit_maintenance_requests(umrs: List[UnitMaintenanceRequest]):
+    try:
+        crud.create_unit_maintenance_requests([umr.dict() for umr in umrs])
+        return {"detail": "%d associations created successfully" % len(umrs)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/unit_maintenance_requests", response_model=UnitMaintenanceRequestPage, response_model_exclude_unset=True)
+def read_unit_maintenance_requests(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                   after: Optional[str] = None,
+                                   unitID: Optional[int] = None,
+                                   requestID: Optional[int] = None,
+                                   expand: Optional[str] = None,
+                                   since: Optional[str] = None):
+    try:
+        filters = {"unitID": unitID, "requestID": requestID}
+        return rows_response(crud.get_unit_maintenance_requests(limit, after, filters, expand=expand, since=since))
+    except ExpiredSyncToken as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except InvalidListQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.delete("/unit_maintenance_requests")
+@router.delete("/unit_maintenance_requests")
 def delete_unit_maintenance_request(unitID: int, requestID: int):
     try:
         crud.delete_unit_maintenance_request(unitID, requestID)
         return {"detail": "Association deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------------------------
+# BATCH
+# ------------------------------
+
+@router.post("/batch", response_model=BatchResult)
+def create_batch(batch: BatchRequest):
+    """
+    Runs the operations in order in one transaction; if any fails, none of
+    them take effect and the error names the failing operation.
+    """
+    try:
+        return {"results": run_batch(crud, batch.operations)}
+    except BatchError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+# ------------------------------
+# IMPORTS
+# ------------------------------
+
+@router.post("/import/{resource}", response_model=ImportResult)
+async def import_resource(resource: str, request: Request, format: ImportFormat = ImportFormat.ndjson):
+    """
+    Imports the CSV (with a header line) or NDJSON records in the request body,
+    read and written in batches as the upload streams in. Invalid rows are
+    skipped and listed in the result by line number.
+    """
+    if resource not in IMPORTS:
+        raise HTTPException(status_code=404, detail="Unknown resource")
+    try:
+        return await run_import(resource, format, request.stream(), in_threadpool(crud.import_rows))
+    except InvalidImport as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------------------------
+# EXPORTS
+# ------------------------------
+
+@router.get("/export/{resource}")
+def export_resource(resource: str, format: ExportFormat = ExportFormat.ndjson):
+    """
+    Streams every record of a resource as NDJSON or as one chunked JSON array.
+    Rows go straight from an unbuffered cursor to the response without being
+    collected or revalidated, so memory stays flat for any table size.
+    """
+    if resource not in crud.EXPORT_QUERIES:
+        raise HTTPException(status_code=404, detail="Unknown resource")
+    return StreamingResponse(encode_rows(crud.iter_rows(resource), format), media_type=MEDIA_TYPES[format])
+
+
+# Register exactly one implementation of the API so sync and async mode can be
+# benchmarked against each other on the same routes. async_routes is imported
+# lazily so sync deployments don't need aiomysql installed.
+if db.DB_MODE == "async":
+    import async_crud
+    import async_routes
+    metrics.instrument_module(async_crud)
+    app.include_router(async_routes.router)
+    change_feed = ChangeFeed(async_crud)
+else:
+    metrics.instrument_module(crud)
+    app.include_router(router)
+    change_feed = ChangeFeed(ThreadedStore(crud))
@@ -0,0 +1,249 @@
+# metrics.py
+# Low-overhead, in-process metrics rendered in the Prometheus text exposition
+# format at GET /metrics.
+#
+# Recording is a bisect plus a few additions under a per-metric lock, cheap
+# enough to leave on for every query and request. Labels are limited to
+# function names and route templates (never raw paths or parameters) so the
+# number of series stays fixed.
+from bisect import bisect_left
+import functools
+import inspect
+import threading
+import time
+
+# Upper bounds in seconds, spanning cache hits (~µs) to slow scans (seconds).
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Name prefixes of the crud/async_crud functions instrument_module() wraps.
+CRUD_PREFIXES = ("create_", "get_", "update_", "patch_", "delete_", "iter_")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join('%s="%s"' % (name, value) for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.documentation), "# TYPE %s counter" % self.name]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append("%s%s %s" % (self.name, _format_labels(self.labels, label_values), value))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.documentation), "# TYPE %s histogram" % self.name]
+        with self._lock:
+            snapshot = sorted((key, list(series)) for key, series in self._series.items())
+        for label_values, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [("le", bound)])
+                lines.append("%s_bucket%s %s" % (self.name, labels, cumulative))
+            labels = _format_labels(self.labels, label_values)
+            lines.append("%s_sum%s %s" % (self.name, labels, series[-1]))
+            lines.append("%s_count%s %s" % (self.name, labels, cumulative))
+        return lines
+
+
+CRUD_DURATION = Histogram("upms_crud_duration_seconds", "Time spent in each CRUD function.", ("function",))
+CRUD_ROWS = Counter("upms_crud_rows_total", "Rows returned by each CRUD function.", ("function",))
+CRUD_ERRORS = Counter("upms_crud_errors_total", "CRUD calls that raised.", ("function",))
+HTTP_DURATION = Histogram("upms_http_request_duration_seconds", "HTTP request latency by route.",
+                          ("method", "route"))
+HTTP_REQUESTS = Counter("upms_http_requests_total", "HTTP requests by route and status.",
+                        ("method", "route", "status"))
+HTTP_RESPONSE_BYTES = Counter("upms_http_response_bytes_total", "Response body bytes serialized by route.",
+                              ("method", "route"))
+POOL_WAIT = Histogram("upms_pool_wait_seconds", "Time spent waiting to check out a database connection.",
+                      ("pool",))
+
+REGISTRY = [CRUD_DURATION, CRUD_ROWS, CRUD_ERRORS, HTTP_DURATION, HTTP_REQUESTS, HTTP_RESPONSE_BYTES, POOL_WAIT]
+
+
+def render():
+    """
+    Renders every registered metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def count_rows(result):
+    """
+    Number of rows in a CRUD result: a list of rows, a page dict, or a single
+    row (None for not found). Other results (generated IDs, matched-row
+    counts) are not rows and count as None.
+    """
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        items = result.get("items")
+        return len(items) if isinstance(items, list) else 1
+    return None
+
+
+def _record(name, started, rows):
+    CRUD_DURATION.observe(time.perf_counter() - started, name)
+    if rows:
+        CRUD_ROWS.inc(name, amount=rows)
+
+
+def timed(func):
+    """
+    Wraps a CRUD function (plain, async, generator or async generator) to
+    record its latency, rows returned and errors under its own name.
+    Generators are timed from first to last row.
+    """
+    name = func.__name__
+
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def async_gen_wrapper(*args, **kwargs):
+            started, rows = time.perf_counter(), 0
+            try:
+                async for row in func(*args, **kwargs):
+                    rows += 1
+                    yield row
+            except GeneratorExit:
+                raise
+            except BaseException:
+                CRUD_ERRORS.inc(name)
+                raise
+            finally:
+                _record(name, started, rows)
+        return async_gen_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def gen_wrapper(*args, **kwargs):
+            started, rows = time.perf_counter(), 0
+            try:
+                for row in func(*args, **kwargs):
+                    rows += 1
+                    yield row
+            except GeneratorExit:
+                raise
+            except BaseException:
+                CRUD_ERRORS.inc(name)
+                raise
+            finally:
+                _record(name, started, rows)
+        return gen_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException:
+                CRUD_ERRORS.inc(name)
+                _record(name, started, None)
+                raise
+            _record(name, started, count_rows(result))
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            CRUD_ERRORS.inc(name)
+            _record(name, started, None)
+            raise
+        _record(name, started, count_rows(result))
+        return result
+    return wrapper
+
+
+def instrument_module(module, prefixes=CRUD_PREFIXES):
+    """
+    Replaces every function defined in module whose name starts with one of
+    prefixes by its timed() wrapper. Calls between functions of the module go
+    through the module globals, so they are measured as well.
+    """
+    for name, value in list(vars(module).items()):
+        if (inspect.isfunction(value) and value.__module__ == module.__name__
+                and name.startswith(prefixes) and not getattr(value, "__instrumented__", False)):
+            wrapper = timed(value)
+            wrapper.__instrumented__ = True
+            setattr(module, name, wrapper)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and response body size per
+    route template. Written against raw ASGI rather than BaseHTTPMiddleware so
+    it adds no extra task per request and never buffers streamed responses.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        state = {"status": 500, "bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; unmatched paths
+            # share one label instead of creating a series per URL.
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_DURATION.observe(time.perf_counter() - started, method, template)
+            HTTP_REQUESTS.inc(method, template, state["status"])
+            HTTP_RESPONSE_BYTES.inc(method, template, amount=state["bytes"])
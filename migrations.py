@@ -0,0 +1,644 @@
+# migrations.py
+# Versioned schema for every table crud.py touches.
+#
+# Each migration is applied once and recorded in SchemaMigrations. MySQL
+# commits DDL implicitly, so a migration cannot be rolled back half way;
+# instead every step is written to be safely re-run (CREATE TABLE IF NOT
+# EXISTS, indexes created only when missing) and a failed migration is simply
+# retried on the next run.
+import logging
+
+from search import SEARCH_FIELDS, SEARCH_KEYS, SEARCH_TERM_LENGTH, row_terms
+
+logger = logging.getLogger(__name__)
+
+# Named advisory lock so several workers starting at once don't race each
+# other through the same migration.
+MIGRATION_LOCK = "upms_schema_migrations"
+MIGRATION_LOCK_TIMEOUT_SECONDS = 60
+
+CREATE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS Tenants (
+        tenantID INT AUTO_INCREMENT PRIMARY KEY,
+        firstName VARCHAR(100) NOT NULL,
+        lastName VARCHAR(100) NOT NULL,
+        phoneNumber VARCHAR(10) NOT NULL,
+        email VARCHAR(100) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Properties (
+        propertyID INT AUTO_INCREMENT PRIMARY KEY,
+        address VARCHAR(255) NOT NULL,
+        city VARCHAR(100) NOT NULL,
+        state VARCHAR(50) NOT NULL,
+        zipCode VARCHAR(10) NOT NULL,
+        propertyValue DECIMAL(14, 2) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Units (
+        unitID INT AUTO_INCREMENT PRIMARY KEY,
+        propertyID INT NOT NULL,
+        unitNumber VARCHAR(20) NOT NULL,
+        unitType VARCHAR(50) NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'Vacant',
+        INDEX idx_units_property (propertyID),
+        INDEX idx_units_status (status),
+        FOREIGN KEY (propertyID) REFERENCES Properties (propertyID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS MaintenanceRequests (
+        requestID INT AUTO_INCREMENT PRIMARY KEY,
+        description TEXT NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        submissionDate DATE NOT NULL,
+        completionDate DATE NULL,
+        INDEX idx_maintenance_requests_status (status)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Leases (
+        leaseID INT AUTO_INCREMENT PRIMARY KEY,
+        unitID INT NOT NULL,
+        tenantID INT NOT NULL,
+        startDate DATE NOT NULL,
+        endDate DATE NULL,
+        rentPrice DECIMAL(10, 2) NOT NULL,
+        INDEX idx_leases_unit (unitID),
+        INDEX idx_leases_tenant (tenantID),
+        FOREIGN KEY (unitID) REFERENCES Units (unitID),
+        FOREIGN KEY (tenantID) REFERENCES Tenants (tenantID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Payments (
+        paymentID INT AUTO_INCREMENT PRIMARY KEY,
+        tenantID INT NOT NULL,
+        leaseID INT NOT NULL,
+        amount DECIMAL(10, 2) NOT NULL,
+        paymentDate DATE NOT NULL,
+        paymentMethod VARCHAR(50) NOT NULL,
+        INDEX idx_payments_lease (leaseID),
+        INDEX idx_payments_tenant (tenantID),
+        INDEX idx_payments_date (paymentDate),
+        FOREIGN KEY (tenantID) REFERENCES Tenants (tenantID),
+        FOREIGN KEY (leaseID) REFERENCES Leases (leaseID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS UnitMaintenanceRequests (
+        unitID INT NOT NULL,
+        requestID INT NOT NULL,
+        PRIMARY KEY (unitID, requestID),
+        INDEX idx_unit_maintenance_requests_request (requestID),
+        FOREIGN KEY (unitID) REFERENCES Units (unitID) ON DELETE CASCADE,
+        FOREIGN KEY (requestID) REFERENCES MaintenanceRequests (requestID) ON DELETE CASCADE
+    )
+    """,
+]
+
+# The same tables for the embedded SQLite backend. SQLite has no inline INDEX
+# clause, so the secondary indexes come from REQUIRED_INDEXES instead, and
+# AUTOINCREMENT keeps deleted IDs from being reused, as in InnoDB.
+SQLITE_CREATE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS Tenants (
+        tenantID INTEGER PRIMARY KEY AUTOINCREMENT,
+        firstName VARCHAR(100) NOT NULL,
+        lastName VARCHAR(100) NOT NULL,
+        phoneNumber VARCHAR(10) NOT NULL,
+        email VARCHAR(100) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Properties (
+        propertyID INTEGER PRIMARY KEY AUTOINCREMENT,
+        address VARCHAR(255) NOT NULL,
+        city VARCHAR(100) NOT NULL,
+        state VARCHAR(50) NOT NULL,
+        zipCode VARCHAR(10) NOT NULL,
+        propertyValue DECIMAL(14, 2) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Units (
+        unitID INTEGER PRIMARY KEY AUTOINCREMENT,
+        propertyID INTEGER NOT NULL REFERENCES Properties (propertyID),
+        unitNumber VARCHAR(20) NOT NULL,
+        unitType VARCHAR(50) NOT NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'Vacant'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS MaintenanceRequests (
+        requestID INTEGER PRIMARY KEY AUTOINCREMENT,
+        description TEXT NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        submissionDate DATE NOT NULL,
+        completionDate DATE NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Leases (
+        leaseID INTEGER PRIMARY KEY AUTOINCREMENT,
+        unitID INTEGER NOT NULL REFERENCES Units (unitID),
+        tenantID INTEGER NOT NULL REFERENCES Tenants (tenantID),
+        startDate DATE NOT NULL,
+        endDate DATE NULL,
+        rentPrice DECIMAL(10, 2) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Payments (
+        paymentID INTEGER PRIMARY KEY AUTOINCREMENT,
+        tenantID INTEGER NOT NULL REFERENCES Tenants (tenantID),
+        leaseID INTEGER NOT NULL REFERENCES Leases (leaseID),
+        amount DECIMAL(10, 2) NOT NULL,
+        paymentDate DATE NOT NULL,
+        paymentMethod VARCHAR(50) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS UnitMaintenanceRequests (
+        unitID INTEGER NOT NULL REFERENCES Units (unitID) ON DELETE CASCADE,
+        requestID INTEGER NOT NULL REFERENCES MaintenanceRequests (requestID) ON DELETE CASCADE,
+        PRIMARY KEY (unitID, requestID)
+    )
+    """,
+]
+
+# Secondary indexes the CRUD layer's filters and joins rely on, as
+# (table, index name, columns). An index counts as present when any index on
+# the table starts with the same columns, whatever it is called, so the
+# implicit indexes MySQL creates for foreign keys satisfy these too.
+REQUIRED_INDEXES = [
+    ("Units", "idx_units_property", ["propertyID"]),
+    ("Units", "idx_units_status", ["status"]),
+    ("MaintenanceRequests", "idx_maintenance_requests_status", ["status"]),
+    ("Leases", "idx_leases_unit", ["unitID"]),
+    ("Leases", "idx_leases_tenant", ["tenantID"]),
+    ("Payments", "idx_payments_lease", ["leaseID"]),
+    ("Payments", "idx_payments_tenant", ["tenantID"]),
+    ("Payments", "idx_payments_date", ["paymentDate"]),
+    ("UnitMaintenanceRequests", "idx_unit_maintenance_requests_request", ["requestID"]),
+    ("Properties", "idx_properties_city", ["city"]),
+    ("MaintenanceRequests", "idx_maintenance_requests_submitted", ["submissionDate"]),
+    ("Leases", "idx_leases_start", ["startDate"]),
+]
+
+
+INDEX_COLUMNS_QUERIES = {
+    "mysql": """
+    SELECT TABLE_NAME AS tableName, INDEX_NAME AS indexName, COLUMN_NAME AS columnName
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE()
+    ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+    """,
+    # The primary key of a rowid table is not an index in SQLite; nothing in
+    # REQUIRED_INDEXES relies on one.
+    "sqlite": """
+    SELECT m.name AS tableName, il.name AS indexName, ii.name AS columnName
+    FROM sqlite_master AS m
+    JOIN pragma_index_list(m.name) AS il
+    JOIN pragma_index_info(il.name) AS ii
+    WHERE m.type = 'table'
+    ORDER BY m.name, il.name, ii.seqno
+    """,
+}
+
+
+def existing_indexes(cursor, dialect="mysql"):
+    """
+    Returns {table: [[column, ...], ...]} listing the columns of every index in
+    the current database, in index order.
+    """
+    cursor.execute(INDEX_COLUMNS_QUERIES[dialect])
+    indexes = {}
+    for row in cursor.fetchall():
+        indexes.setdefault((row["tableName"], row["indexName"]), []).append(row["columnName"])
+    by_table = {}
+    for (table, _), columns in indexes.items():
+        by_table.setdefault(table, []).append(columns)
+    return by_table
+
+
+def missing_indexes(cursor, dialect="mysql", required=None):
+    """
+    Returns the `required` entries (default: REQUIRED_INDEXES) that no
+    existing index covers.
+    """
+    indexes = existing_indexes(cursor, dialect)
+    return [
+        (table, name, columns) for table, name, columns in required or REQUIRED_INDEXES
+        if not any(index[:len(columns)] == columns for index in indexes.get(table, []))
+    ]
+
+
+def create_tables(cursor, dialect):
+    for statement in SQLITE_CREATE_TABLES if dialect == "sqlite" else CREATE_TABLES:
+        cursor.execute(statement)
+
+
+def create_missing_indexes(cursor, dialect, required=None):
+    for table, name, columns in missing_indexes(cursor, dialect, required):
+        logger.info("Creating index %s on %s (%s)", name, table, ", ".join(columns))
+        cursor.execute("CREATE INDEX %s ON %s (%s)" % (name, table, ", ".join(columns)))
+
+
+# Per-property rollups kept current by the unit and lease CRUD functions (see
+# crud.count_unit() and crud.count_lease()), so a property summary is read
+# from a handful of rows instead of by scanning Units and Leases. Leases are
+# bucketed by end date, with open-ended leases under OPEN_LEASE_END, so the
+# leases still active on any given day can be summed without a write per day.
+# Rows whose counts drop to zero are left in place.
+#
+# The counters only see writes made through the CRUD functions, so they
+# drift if the database itself changes Units or Leases rows behind them, as a
+# cascading foreign key does. CREATE TABLE IF NOT EXISTS keeps whatever keys a
+# pre-existing database was created with; check_summary_foreign_keys() makes
+# sure none of them cascades.
+OPEN_LEASE_END = "9999-12-31"
+
+CREATE_SUMMARY_TABLES = {
+    "mysql": [
+        """
+        CREATE TABLE IF NOT EXISTS PropertyUnitCounts (
+            propertyID INT NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            unitCount INT NOT NULL,
+            PRIMARY KEY (propertyID, status),
+            FOREIGN KEY (propertyID) REFERENCES Properties (propertyID) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS PropertyLeaseTotals (
+            propertyID INT NOT NULL,
+            leaseEnd DATE NOT NULL,
+            leaseCount INT NOT NULL,
+            rentTotal DECIMAL(14, 2) NOT NULL,
+            PRIMARY KEY (propertyID, leaseEnd),
+            FOREIGN KEY (propertyID) REFERENCES Properties (propertyID) ON DELETE CASCADE
+        )
+        """,
+    ],
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS PropertyUnitCounts (
+            propertyID INTEGER NOT NULL REFERENCES Properties (propertyID) ON DELETE CASCADE,
+            status VARCHAR(20) NOT NULL,
+            unitCount INTEGER NOT NULL,
+            PRIMARY KEY (propertyID, status)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS PropertyLeaseTotals (
+            propertyID INTEGER NOT NULL REFERENCES Properties (propertyID) ON DELETE CASCADE,
+            leaseEnd DATE NOT NULL,
+            leaseCount INTEGER NOT NULL,
+            rentTotal DECIMAL(14, 2) NOT NULL,
+            PRIMARY KEY (propertyID, leaseEnd)
+        )
+        """,
+    ],
+}
+
+
+# (statement, params) recomputing both summary tables from Units and Leases.
+REBUILD_SUMMARY_STATEMENTS = [
+    ("DELETE FROM PropertyUnitCounts", None),
+    ("DELETE FROM PropertyLeaseTotals", None),
+    ("""
+    INSERT INTO PropertyUnitCounts (propertyID, status, unitCount)
+    SELECT propertyID, status, COUNT(*)
+    FROM Units
+    GROUP BY propertyID, status
+    """, None),
+    ("""
+    INSERT INTO PropertyLeaseTotals (propertyID, leaseEnd, leaseCount, rentTotal)
+    SELECT u.propertyID, COALESCE(l.endDate, %s), COUNT(*), SUM(l.rentPrice)
+    FROM Leases AS l
+    JOIN Units AS u ON u.unitID = l.unitID
+    GROUP BY u.propertyID, COALESCE(l.endDate, %s)
+    """, (OPEN_LEASE_END, OPEN_LEASE_END)),
+]
+
+
+def rebuild_property_summaries(cursor):
+    """
+    Recomputes PropertyUnitCounts and PropertyLeaseTotals from Units and
+    Leases, for rows written without going through the CRUD functions.
+    """
+    for statement, params in REBUILD_SUMMARY_STATEMENTS:
+        cursor.execute(statement, params)
+
+
+def create_property_summaries(cursor, dialect):
+    for statement in CREATE_SUMMARY_TABLES[dialect]:
+        cursor.execute(statement)
+    rebuild_property_summaries(cursor)
+
+
+# Tables whose rows the property summaries count.
+SUMMARY_SOURCE_TABLES = ("Units", "Leases")
+
+FOREIGN_KEY_QUERIES = {
+    "mysql": """
+    SELECT TABLE_NAME AS tableName, CONSTRAINT_NAME AS constraintName, REFERENCED_TABLE_NAME AS referencedTable,
+        DELETE_RULE AS onDelete, UPDATE_RULE AS onUpdate
+    FROM information_schema.REFERENTIAL_CONSTRAINTS
+    WHERE CONSTRAINT_SCHEMA = DATABASE()
+    ORDER BY TABLE_NAME, CONSTRAINT_NAME
+    """,
+    "sqlite": """
+    SELECT m.name AS tableName, fk.id AS constraintName, fk."table" AS referencedTable,
+        fk.on_delete AS onDelete, fk.on_update AS onUpdate
+    FROM sqlite_master AS m
+    JOIN pragma_foreign_key_list(m.name) AS fk
+    WHERE m.type = 'table'
+    ORDER BY m.name, fk.id
+    """,
+}
+
+
+def cascading_foreign_keys(cursor, dialect="mysql", tables=SUMMARY_SOURCE_TABLES):
+    """
+    Returns the foreign keys on `tables` that make the database change their
+    rows by itself (ON DELETE/UPDATE CASCADE, SET NULL or SET DEFAULT).
+    """
+    cursor.execute(FOREIGN_KEY_QUERIES[dialect])
+    return [
+        row for row in cursor.fetchall()
+        if row["tableName"] in tables
+        and not {row["onDelete"], row["onUpdate"]} <= {"RESTRICT", "NO ACTION"}
+    ]
+
+
+def check_summary_foreign_keys(cursor, dialect):
+    """
+    Fails the migration if a foreign key on Units or Leases cascades, then
+    rebuilds the property summaries from scratch in case they have already
+    drifted. The keys have to be redefined without the cascade (as in
+    CREATE_TABLES) by hand before the migration can pass.
+    """
+    cascading = cascading_foreign_keys(cursor, dialect)
+    if cascading:
+        raise RuntimeError(
+            "Foreign keys that cascade into the tables the property summaries count: %s; "
+            "redefine them without ON DELETE/ON UPDATE actions" % ", ".join(
+                "%s.%s -> %s (ON DELETE %s, ON UPDATE %s)" % (
+                    row["tableName"], row["constraintName"], row["referencedTable"], row["onDelete"],
+                    row["onUpdate"])
+                for row in cascading
+            )
+        )
+    rebuild_property_summaries(cursor)
+
+
+# Every committed insert, update and delete made through crud.py, in commit
+# order (near enough; see changes.py), for the GET /changes feed. rowKey is
+# the changed row's primary key as a JSON object.
+CREATE_CHANGE_LOG = {
+    "mysql": """
+    CREATE TABLE IF NOT EXISTS ChangeLog (
+        seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+        tableName VARCHAR(64) NOT NULL,
+        operation VARCHAR(6) NOT NULL,
+        rowKey VARCHAR(255) NOT NULL,
+        changedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "sqlite": """
+    CREATE TABLE IF NOT EXISTS ChangeLog (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tableName VARCHAR(64) NOT NULL,
+        operation VARCHAR(6) NOT NULL,
+        rowKey VARCHAR(255) NOT NULL,
+        changedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+}
+
+
+def create_change_log(cursor, dialect):
+    cursor.execute(CREATE_CHANGE_LOG[dialect])
+
+
+# Delta sync (GET /<resource>?since=): every table the CRUD layer serves gets
+# an updatedAt column that the database itself sets on insert and on update,
+# and deleted rows leave a tombstone, so a client can ask for exactly what
+# changed after a given moment. MySQL maintains updatedAt through the column
+# definition; SQLite cannot add a column with a non-constant default, so
+# triggers set it there. Both keep millisecond precision, and SQLite stores
+# the same "YYYY-MM-DD HH:MM:SS.fff" text that MySQL displays, so timestamps
+# compare alike on both. Tombstones are written by crud.log_change().
+SYNC_TABLES = [
+    "Tenants", "Properties", "Units", "MaintenanceRequests", "Leases", "Payments", "UnitMaintenanceRequests",
+]
+
+# Created by the delta sync migration rather than with REQUIRED_INDEXES,
+# since the earlier index migrations run before these columns exist.
+SYNC_INDEXES = [
+    ("Tenants", "idx_tenants_updated", ["updatedAt"]),
+    ("Properties", "idx_properties_updated", ["updatedAt"]),
+    ("Units", "idx_units_updated", ["updatedAt"]),
+    ("MaintenanceRequests", "idx_maintenance_requests_updated", ["updatedAt"]),
+    ("Leases", "idx_leases_updated", ["updatedAt"]),
+    ("Payments", "idx_payments_updated", ["updatedAt"]),
+    ("UnitMaintenanceRequests", "idx_unit_maintenance_requests_updated", ["updatedAt"]),
+    ("Tombstones", "idx_tombstones_deleted", ["tableName", "deletedAt"]),
+]
+
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+ADD_UPDATED_AT = {
+    "mysql": [
+        "ALTER TABLE {table} ADD COLUMN updatedAt TIMESTAMP(3) NOT NULL"
+        " DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)",
+    ],
+    "sqlite": [
+        "ALTER TABLE {table} ADD COLUMN updatedAt TIMESTAMP NOT NULL DEFAULT '1970-01-01 00:00:00.000'",
+        "UPDATE {table} SET updatedAt = " + SQLITE_NOW,
+    ],
+}
+
+SQLITE_UPDATED_AT_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS {table}_inserted AFTER INSERT ON {table}
+    BEGIN
+        UPDATE {table} SET updatedAt = %s WHERE rowid = NEW.rowid;
+    END
+    """ % SQLITE_NOW,
+    # The WHEN clause skips the trigger's own UPDATE and statements that
+    # already set updatedAt.
+    """
+    CREATE TRIGGER IF NOT EXISTS {table}_updated AFTER UPDATE ON {table}
+    FOR EACH ROW WHEN NEW.updatedAt IS OLD.updatedAt
+    BEGIN
+        UPDATE {table} SET updatedAt = %s WHERE rowid = NEW.rowid;
+    END
+    """ % SQLITE_NOW,
+]
+
+CREATE_TOMBSTONES = {
+    "mysql": """
+    CREATE TABLE IF NOT EXISTS Tombstones (
+        tableName VARCHAR(64) NOT NULL,
+        rowKey VARCHAR(255) NOT NULL,
+        deletedAt TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3)
+    )
+    """,
+    "sqlite": """
+    CREATE TABLE IF NOT EXISTS Tombstones (
+        tableName VARCHAR(64) NOT NULL,
+        rowKey VARCHAR(255) NOT NULL,
+        deletedAt TIMESTAMP NOT NULL DEFAULT (%s)
+    )
+    """ % SQLITE_NOW,
+}
+
+
+def table_columns(cursor, table):
+    cursor.execute("SELECT * FROM %s LIMIT 0" % table)
+    columns = [description[0] for description in cursor.description]
+    cursor.fetchall()
+    return columns
+
+
+def add_sync_columns(cursor, dialect):
+    for table in SYNC_TABLES:
+        if "updatedAt" not in table_columns(cursor, table):
+            for statement in ADD_UPDATED_AT[dialect]:
+                cursor.execute(statement.format(table=table))
+        if dialect == "sqlite":
+            for statement in SQLITE_UPDATED_AT_TRIGGERS:
+                cursor.execute(statement.format(table=table))
+    cursor.execute(CREATE_TOMBSTONES[dialect])
+    create_missing_indexes(cursor, dialect, SYNC_INDEXES)
+
+
+# Search terms of tenants and properties for the /search routes (see
+# search.py), kept current by the CRUD functions (crud.index_row()). The
+# primary key serves the prefix lookups; terms are compared byte for byte,
+# since search.words() has already folded case and accents.
+CREATE_SEARCH_TERMS = {
+    "mysql": """
+    CREATE TABLE IF NOT EXISTS SearchTerms (
+        tableName VARCHAR(64) NOT NULL,
+        term VARCHAR(%d) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+        rowID INT NOT NULL,
+        weight INT NOT NULL,
+        PRIMARY KEY (tableName, term, rowID)
+    )
+    """ % SEARCH_TERM_LENGTH,
+    "sqlite": """
+    CREATE TABLE IF NOT EXISTS SearchTerms (
+        tableName VARCHAR(64) NOT NULL,
+        term VARCHAR(%d) NOT NULL,
+        rowID INTEGER NOT NULL,
+        weight INTEGER NOT NULL,
+        PRIMARY KEY (tableName, term, rowID)
+    ) WITHOUT ROWID
+    """ % SEARCH_TERM_LENGTH,
+}
+
+# For replacing or removing the terms of one row.
+SEARCH_INDEXES = [
+    ("SearchTerms", "idx_search_terms_row", ["tableName", "rowID"]),
+]
+
+def rebuild_search_terms(cursor):
+    """
+    Recomputes SearchTerms from Tenants and Properties, for rows written
+    without going through the CRUD functions.
+    """
+    cursor.execute("DELETE FROM SearchTerms")
+    for table, key_column in SEARCH_KEYS.items():
+        cursor.execute("SELECT %s, %s FROM %s" % (key_column, ", ".join(SEARCH_FIELDS[table]), table))
+        terms = [
+            (table, term, row[key_column], weight)
+            for row in cursor.fetchall() for term, weight in row_terms(table, row).items()
+        ]
+        cursor.executemany(
+            "INSERT INTO SearchTerms (tableName, term, rowID, weight) VALUES (%s, %s, %s, %s)", terms)
+
+
+def create_search_terms(cursor, dialect):
+    cursor.execute(CREATE_SEARCH_TERMS[dialect])
+    create_missing_indexes(cursor, dialect, SEARCH_INDEXES)
+    rebuild_search_terms(cursor)
+
+
+# (version, description, step). Append new migrations; never edit or reorder
+# ones that have shipped.
+MIGRATIONS = [
+    (1, "Create all tables", create_tables),
+    (2, "Add secondary indexes to pre-existing tables", create_missing_indexes),
+    (3, "Add indexes for list filters and sorts", create_missing_indexes),
+    (4, "Add per-property unit and lease summaries", create_property_summaries),
+    (5, "Add the change log", create_change_log),
+    (6, "Add updatedAt columns and tombstones for delta sync", add_sync_columns),
+    (7, "Add search terms for tenant and property search", create_search_terms),
+    (8, "Check that no foreign key cascades into the summarized tables", check_summary_foreign_keys),
+]
+
+
+def applied_versions(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS SchemaMigrations (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        appliedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("SELECT version FROM SchemaMigrations")
+    return {row["version"] for row in cursor.fetchall()}
+
+
+def migrate(connection, dialect="mysql"):
+    """
+    Applies every migration not yet recorded in SchemaMigrations, in order.
+    Returns the versions that were applied.
+    """
+    cursor = connection.cursor()
+    # SQLite has no named locks; an embedded database belongs to one process.
+    locked = dialect == "mysql"
+    if locked:
+        cursor.execute("SELECT GET_LOCK(%s, %s) AS acquired", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT_SECONDS))
+        if not cursor.fetchone()["acquired"]:
+            raise RuntimeError("Timed out waiting for the schema migration lock")
+    try:
+        done = applied_versions(cursor)
+        applied = []
+        for version, description, step in MIGRATIONS:
+            if version in done:
+                continue
+            logger.info("Applying schema migration %s: %s", version, description)
+            step(cursor, dialect)
+            cursor.execute(
+                "INSERT INTO SchemaMigrations (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+            connection.commit()
+            applied.append(version)
+        return applied
+    finally:
+        if locked:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+        cursor.close()
+
+
+def check_indexes(connection, dialect="mysql"):
+    """
+    Logs a warning for every required index that is missing and returns them,
+    so a schema drifted away from MIGRATIONS is noticed at startup instead of
+    as slow full-table scans.
+    """
+    cursor = connection.cursor()
+    missing = missing_indexes(cursor, dialect, REQUIRED_INDEXES + SYNC_INDEXES + SEARCH_INDEXES)
+    cursor.close()
+    for table, name, columns in missing:
+        logger.warning("Missing index on %s (%s); expected %s", table, ", ".join(columns), name)
+    return missing
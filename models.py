@@ -1,6 +1,7 @@
 from datetime import date
+from enum import Enum
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional, Union
 
 
 class Tenant(BaseModel):
@@ -76,3 +77,192 @@ class PaymentOut(Payment):
 class UnitMaintenanceRequest(BaseModel):
     unitID: int
     requestID: int
+
+
+# Records with related records nested in, as returned by list endpoints called
+# with ?expand=. Relations that were not requested are left out of the
+# response entirely rather than sent as null.
+class UnitExpanded(UnitOut):
+    property: Optional[PropertyOut] = None
+
+
+class LeaseExpanded(LeaseOut):
+    tenant: Optional[TenantOut] = None
+    unit: Optional[UnitExpanded] = None
+
+
+class PaymentExpanded(PaymentOut):
+    tenant: Optional[TenantOut] = None
+    lease: Optional[LeaseExpanded] = None
+
+
+class UnitMaintenanceRequestExpanded(UnitMaintenanceRequest):
+    unit: Optional[UnitExpanded] = None
+    request: Optional[MaintenanceRequestOut] = None
+
+
+# Partial updates for PATCH: only the fields a client sends are written.
+class TenantPatch(BaseModel):
+    firstName: Optional[str] = None
+    lastName: Optional[str] = None
+    phoneNumber: Optional[str] = None
+    email: Optional[str] = None
+
+
+class PropertyPatch(BaseModel):
+    address: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    zipCode: Optional[str] = None
+    propertyValue: Optional[float] = None
+
+
+class UnitPatch(BaseModel):
+    propertyID: Optional[int] = None
+    unitNumber: Optional[str] = None
+    unitType: Optional[str] = None
+    status: Optional[str] = None
+
+
+class MaintenanceRequestPatch(BaseModel):
+    description: Optional[str] = None
+    status: Optional[str] = None
+    submissionDate: Optional[date] = None
+    completionDate: Optional[date] = None
+
+
+class LeasePatch(BaseModel):
+    unitID: Optional[int] = None
+    tenantID: Optional[int] = None
+    startDate: Optional[date] = None
+    endDate: Optional[date] = None
+    rentPrice: Optional[float] = None
+
+
+class PaymentPatch(BaseModel):
+    tenantID: Optional[int] = None
+    leaseID: Optional[int] = None
+    amount: Optional[float] = None
+    paymentDate: Optional[date] = None
+    paymentMethod: Optional[str] = None
+
+
+# Paginated list responses. nextCursor is passed back as `after` to fetch the
+# following page and is null on the last page. Delta listings (?since=) add the
+# keys of rows deleted since the token and, on their last page, the syncToken
+# for the next delta; other listings leave both fields out.
+class TenantPage(BaseModel):
+    items: List[TenantOut]
+    nextCursor: Optional[str] = None
+    deleted: Optional[List[Dict[str, int]]] = None
+    syncToken: Optional[str] = None
+
+
+class PropertyPage(BaseModel):
+    items: List[PropertyOut]
+    nextCursor: Optional[str] = None
+    deleted: Optional[List[Dict[str, int]]] = None
+    syncToken: Optional[str] = None
+
+
+class UnitPage(BaseModel):
+    items: List[UnitOut]
+    nextCursor: Optional[str] = None
+    deleted: Optional[List[Dict[str, int]]] = None
+    syncToken: Optional[str] = None
+
+
+class MaintenanceRequestPage(BaseModel):
+    items: List[MaintenanceRequestOut]
+    nextCursor: Optional[str] = None
+    deleted: Optional[List[Dict[str, int]]] = None
+    syncToken: Optional[str] = None
+
+
+class LeasePage(BaseModel):
+    items: List[LeaseExpanded]
+    nextCursor: Optional[str] = None
+    deleted: Optional[List[Dict[str, int]]] = None
+    syncToken: Optional[str] = None
+
+
+class PaymentPage(BaseModel):
+    items: List[PaymentExpanded]
+    nextCursor: Optional[str] = None
+    deleted: Optional[List[Dict[str, int]]] = None
+    syncToken: Optional[str] = None
+
+
+class UnitMaintenanceRequestPage(BaseModel):
+    items: List[UnitMaintenanceRequestExpanded]
+    nextCursor: Optional[str] = None
+    deleted: Optional[List[Dict[str, int]]] = None
+    syncToken: Optional[str] = None
+
+
+# /search results, best match first. score is the sum of the weights of the
+# terms the query's words matched (see search.py); higher ranks first.
+class TenantMatch(TenantOut):
+    score: int
+
+
+class PropertyMatch(PropertyOut):
+    score: int
+
+
+class TenantSearchResult(BaseModel):
+    items: List[TenantMatch]
+
+
+class PropertySearchResult(BaseModel):
+    items: List[PropertyMatch]
+
+
+# Occupancy and rent roll, read from the incrementally maintained summary
+# tables. propertyID is null for the portfolio-wide summary.
+class PropertySummary(BaseModel):
+    propertyID: Optional[int] = None
+    totalUnits: int
+    unitsByStatus: Dict[str, int]
+    activeLeases: int
+    totalRent: float
+
+
+# Outcome of a streamed /import upload. Failed rows are identified by the
+# line they start on; only the first IMPORT_MAX_ERRORS are listed.
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+    errorsTruncated: bool
+
+
+# POST /batch: operations run in order in one transaction. `id` (the record
+# to update, patch or delete) and the ID fields in `data` may be references,
+# "$<ref>" or "$<index>", to the ID created by an earlier operation.
+class BatchMethod(str, Enum):
+    create = "create"
+    update = "update"
+    patch = "patch"
+    delete = "delete"
+
+
+class BatchOperation(BaseModel):
+    method: BatchMethod
+    resource: str
+    id: Optional[Union[int, str]] = None
+    data: Dict[str, Any] = {}
+    ref: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+
+class BatchResult(BaseModel):
+    results: List[Dict[str, Any]]
@@ -0,0 +1,180 @@
+# pagination.py
+# Keyset (seek) pagination, filtering and sorting shared by crud.py and
+# async_crud.py.
+#
+# List queries are ordered by their sort column and key columns and resume
+# from the last row of the previous page ("WHERE key > :last ORDER BY key
+# LIMIT n") instead of using OFFSET, so every page is a bounded index range
+# scan no matter how deep into the table it is. The last row's sort values are
+# handed to clients as an opaque cursor.
+#
+# Delta listings (?since=) are ordered by updatedAt instead, and end with a
+# sync token for the client's next delta request.
+from datetime import date, datetime
+from decimal import Decimal
+import base64
+import json
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidListQuery(ValueError):
+    """Raised for list parameters that cannot be honoured (bad cursor, filter or sort)."""
+
+
+class InvalidCursor(InvalidListQuery):
+    """Raised when a client-supplied `after` cursor cannot be decoded."""
+
+
+class InvalidSyncToken(InvalidListQuery):
+    """Raised when a client-supplied `since` token cannot be decoded."""
+
+
+class ExpiredSyncToken(InvalidSyncToken):
+    """
+    Raised for a `since` token older than the tombstones kept for delta sync;
+    the client must start over from SYNC_FROM_START.
+    """
+
+
+# `since` value that starts a client's first sync: every row, no deletions.
+SYNC_FROM_START = "0"
+
+
+def _cursor_value(value):
+    # In the text form both databases compare updatedAt values in.
+    if isinstance(value, datetime):
+        return value.isoformat(" ", "milliseconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError("Cannot encode %s in a cursor" % type(value).__name__)
+
+
+def encode_cursor(order: Sequence[str], values: Sequence) -> str:
+    """
+    Encodes the sort values of the last row on a page as an opaque, URL-safe
+    cursor. The ordering is embedded so a cursor cannot be replayed against a
+    listing sorted differently.
+    """
+    raw = json.dumps([list(order), list(values)], default=_cursor_value, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: Sequence[str]) -> list:
+    """
+    Decodes a cursor produced by encode_cursor() for the given ordering.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_order, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed pagination cursor")
+    if cursor_order != list(order) or not isinstance(values, list) or len(values) != len(order):
+        raise InvalidCursor("Pagination cursor does not match this listing")
+    if not all(value is None or (isinstance(value, (str, int, float)) and not isinstance(value, bool))
+               for value in values):
+        raise InvalidCursor("Malformed pagination cursor")
+    return values
+
+
+def encode_sync_token(when: datetime) -> str:
+    """
+    Encodes the moment a delta listing covers changes up to as an opaque,
+    URL-safe token for the next request's `since`.
+    """
+    return base64.urlsafe_b64encode(_cursor_value(when).encode()).decode().rstrip("=")
+
+
+def decode_sync_token(token: str) -> Optional[datetime]:
+    """
+    Decodes a token produced by encode_sync_token(). Returns None for
+    SYNC_FROM_START.
+    """
+    if token == SYNC_FROM_START:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        return datetime.fromisoformat(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError):
+        raise InvalidSyncToken("Malformed sync token")
+
+
+def ordering(key_columns: List[str], sort: Optional[str], sortable: Sequence[str]) -> List[str]:
+    """
+    Returns the full ordering for a listing as column names, "-"-prefixed when
+    descending. `sort` is "column" or "-column" and must be one of `sortable`;
+    the key columns follow it in the same direction as tie-breakers, which
+    keeps the order total (so the cursor is unambiguous) and lets one index
+    scan in one direction serve the whole ORDER BY.
+    """
+    if not sort:
+        return list(key_columns)
+    descending = sort.startswith("-")
+    column = sort.lstrip("-")
+    if column not in sortable:
+        raise InvalidListQuery("Cannot sort by %r; expected one of: %s" % (column, ", ".join(sortable) or "none"))
+    prefix = "-" if descending else ""
+    return [prefix + column] + [prefix + key for key in key_columns if key != column]
+
+
+def page_query(select: str, key_columns: List[str], after: Optional[str], limit: int,
+               filters: Optional[dict] = None, allowed_filters: Optional[Dict[str, str]] = None,
+               sort: Optional[str] = None, sortable: Sequence[str] = ()):
+    """
+    Appends filter conditions, the keyset condition, ordering and limit to a
+    bare SELECT ... FROM query. Returns (query, params, order); one row more
+    than `limit` is requested so make_page() can tell whether another page
+    follows.
+
+    `filters` maps filter names to values (None means "not filtered") and each
+    name must be a key of `allowed_filters`, whose values are the SQL
+    conditions to apply, written with a %(name)s placeholder for the value.
+    Only those whitelisted fragments and column names ever reach the SQL.
+
+    Composite orderings are compared column by column
+    ("a > x OR (a = x AND b > y)") rather than with a row constructor so the
+    condition stays sargable on every MySQL version.
+    """
+    order = ordering(key_columns, sort, sortable)
+    allowed_filters = allowed_filters or {}
+    params = {"page_limit": limit + 1}
+    conditions = []
+    for name, value in (filters or {}).items():
+        if value is None:
+            continue
+        if name not in allowed_filters:
+            raise InvalidListQuery("Unknown filter: %s" % name)
+        conditions.append(allowed_filters[name])
+        params[name] = value
+    if after is not None:
+        values = decode_cursor(after, order)
+        disjuncts = []
+        for i, term in enumerate(order):
+            column = term.lstrip("-")
+            comparison = "<" if term.startswith("-") else ">"
+            terms = ["%s = %%(after_%d)s" % (order[j].lstrip("-"), j) for j in range(i)]
+            terms.append("%s %s %%(after_%d)s" % (column, comparison, i))
+            disjuncts.append("(" + " AND ".join(terms) + ")")
+            params["after_%d" % i] = values[i]
+        conditions.append("(" + " OR ".join(disjuncts) + ")")
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    order_by = ", ".join(term.lstrip("-") + (" DESC" if term.startswith("-") else "") for term in order)
+    query = "%s %s ORDER BY %s LIMIT %%(page_limit)s" % (select.rstrip(), where, order_by)
+    return query, params, order
+
+
+def make_page(rows: list, order: List[str], limit: int) -> dict:
+    """
+    Trims the extra look-ahead row fetched by page_query() and builds the page
+    body: {"items": [...], "nextCursor": cursor or None}.
+    """
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(order, [rows[-1][term.lstrip("-")] for term in order])
+    return {"items": rows, "nextCursor": next_cursor}
@@ -0,0 +1,341 @@
+# queries.py
+# Catalog of the fixed SQL statements run by crud.py and async_crud.py, keyed
+# by the CRUD function that runs them.
+#
+# Statements are written once here with :name placeholders and compiled to the
+# drivers' pyformat style when this module is imported, so no function
+# rebuilds or converts its SQL per call. They are not server-side prepared
+# statements: PyMySQL and aiomysql escape the parameters into the SQL text on
+# the client and send it as a plain query, and only the SQLite backend binds
+# them (reusing its per-connection statement cache, since the text never
+# changes). check_queries() has the database parse every entry at startup, so
+# a statement that no longer matches the schema fails the deploy rather than
+# the first request that runs it. Statements assembled from caller input
+# (filters, PATCH columns, bulk VALUES lists) are built in crud.py.
+import logging
+import re
+
+import db
+from migrations import OPEN_LEASE_END
+
+logger = logging.getLogger(__name__)
+
+CATALOG = {
+    # Tenants
+    "create_tenant": """
+    INSERT INTO Tenants (firstName, lastName, phoneNumber, email)
+    VALUES (:firstName, :lastName, :phoneNumber, :email)
+    """,
+    "get_tenant": """
+    SELECT tenantID, firstName, lastName, phoneNumber, email
+    FROM Tenants
+    WHERE tenantID = :tenantID
+    """,
+    "get_tenants": """
+    SELECT tenantID, firstName, lastName, phoneNumber, email
+    FROM Tenants
+    """,
+    "get_changed_tenants": """
+    SELECT tenantID, firstName, lastName, phoneNumber, email, updatedAt
+    FROM Tenants
+    """,
+    "update_tenant": """
+    UPDATE Tenants
+    SET firstName = :firstName,
+        lastName = :lastName,
+        phoneNumber = :phoneNumber,
+        email = :email
+    WHERE tenantID = :tenantID
+    """,
+    "delete_tenant": "DELETE FROM Tenants WHERE tenantID = :tenantID",
+
+    # Properties
+    "create_property": """
+    INSERT INTO Properties (address, city, state, zipCode, propertyValue)
+    VALUES (:address, :city, :state, :zipCode, :propertyValue)
+    """,
+    "get_property": """
+    SELECT propertyID, address, city, state, zipCode, propertyValue
+    FROM Properties
+    WHERE propertyID = :propertyID
+    """,
+    "get_properties": """
+    SELECT propertyID, address, city, state, zipCode, propertyValue
+    FROM Properties
+    """,
+    "get_changed_properties": """
+    SELECT propertyID, address, city, state, zipCode, propertyValue, updatedAt
+    FROM Properties
+    """,
+    "update_property": """
+    UPDATE Properties
+    SET address = :address,
+        city = :city,
+        state = :state,
+        zipCode = :zipCode,
+        propertyValue = :propertyValue
+    WHERE propertyID = :propertyID
+    """,
+    "delete_property": "DELETE FROM Properties WHERE propertyID = :propertyID",
+
+    # Units
+    "create_unit": """
+    INSERT INTO Units (propertyID, unitNumber, unitType, status)
+    VALUES (:propertyID, :unitNumber, :unitType, :status)
+    """,
+    "get_unit": """
+    SELECT unitID, propertyID, unitNumber, unitType, status
+    FROM Units
+    WHERE unitID = :unitID
+    """,
+    "get_units": """
+    SELECT unitID, propertyID, unitNumber, unitType, status
+    FROM Units
+    """,
+    "get_changed_units": """
+    SELECT unitID, propertyID, unitNumber, unitType, status, updatedAt
+    FROM Units
+    """,
+    "update_unit": """
+    UPDATE Units
+    SET propertyID = :propertyID,
+        unitNumber = :unitNumber,
+        unitType = :unitType,
+        status = :status
+    WHERE unitID = :unitID
+    """,
+    "delete_unit": "DELETE FROM Units WHERE unitID = :unitID",
+
+    # Maintenance requests
+    "create_maintenance_request": """
+    INSERT INTO MaintenanceRequests (description, status, submissionDate, completionDate)
+    VALUES (:description, :status, :submissionDate, :completionDate)
+    """,
+    "get_maintenance_request": """
+    SELECT requestID, description, status, submissionDate, completionDate
+    FROM MaintenanceRequests
+    WHERE requestID = :requestID
+    """,
+    "get_maintenance_requests": """
+    SELECT requestID, description, status, submissionDate, completionDate
+    FROM MaintenanceRequests
+    """,
+    "get_changed_maintenance_requests": """
+    SELECT requestID, description, status, submissionDate, completionDate, updatedAt
+    FROM MaintenanceRequests
+    """,
+    "update_maintenance_request": """
+    UPDATE MaintenanceRequests
+    SET description = :description,
+        status = :status,
+        submissionDate = :submissionDate,
+        completionDate = :completionDate
+    WHERE requestID = :requestID
+    """,
+    "delete_maintenance_request": "DELETE FROM MaintenanceRequests WHERE requestID = :requestID",
+
+    # Leases
+    "create_lease": """
+    INSERT INTO Leases (unitID, tenantID, startDate, endDate, rentPrice)
+    VALUES (:unitID, :tenantID, :startDate, :endDate, :rentPrice)
+    """,
+    "get_lease": """
+    SELECT leaseID, unitID, tenantID, startDate, endDate, rentPrice
+    FROM Leases
+    WHERE leaseID = :leaseID
+    """,
+    "get_leases": """
+    SELECT leaseID, unitID, tenantID, startDate, endDate, rentPrice
+    FROM Leases
+    """,
+    "get_changed_leases": """
+    SELECT leaseID, unitID, tenantID, startDate, endDate, rentPrice, updatedAt
+    FROM Leases
+    """,
+    "update_lease": """
+    UPDATE Leases
+    SET unitID = :unitID,
+        tenantID = :tenantID,
+        startDate = :startDate,
+        endDate = :endDate,
+        rentPrice = :rentPrice
+    WHERE leaseID = :leaseID
+    """,
+    "delete_lease": "DELETE FROM Leases WHERE leaseID = :leaseID",
+
+    # Payments
+    "create_payment": """
+    INSERT INTO Payments (tenantID, leaseID, amount, paymentDate, paymentMethod)
+    VALUES (:tenantID, :leaseID, :amount, :paymentDate, :paymentMethod)
+    """,
+    "get_payment": """
+    SELECT paymentID, tenantID, leaseID, amount, paymentDate, paymentMethod
+    FROM Payments
+    WHERE paymentID = :paymentID
+    """,
+    "get_payments": """
+    SELECT paymentID, tenantID, leaseID, amount, paymentDate, paymentMethod
+    FROM Payments
+    """,
+    "get_changed_payments": """
+    SELECT paymentID, tenantID, leaseID, amount, paymentDate, paymentMethod, updatedAt
+    FROM Payments
+    """,
+    "update_payment": """
+    UPDATE Payments
+    SET tenantID = :tenantID,
+        leaseID = :leaseID,
+        amount = :amount,
+        paymentDate = :paymentDate,
+        paymentMethod = :paymentMethod
+    WHERE paymentID = :paymentID
+    """,
+    "delete_payment": "DELETE FROM Payments WHERE paymentID = :paymentID",
+
+    # Unit maintenance requests
+    "create_unit_maintenance_request": """
+    INSERT INTO UnitMaintenanceRequests (unitID, requestID)
+    VALUES (:unitID, :requestID)
+    """,
+    "get_unit_maintenance_request": """
+    SELECT unitID, requestID
+    FROM UnitMaintenanceRequests
+    WHERE unitID = :unitID AND requestID = :requestID
+    """,
+    "get_unit_maintenance_requests": """
+    SELECT unitID, requestID
+    FROM UnitMaintenanceRequests
+    """,
+    "get_changed_unit_maintenance_requests": """
+    SELECT unitID, requestID, updatedAt
+    FROM UnitMaintenanceRequests
+    """,
+    "delete_unit_maintenance_request": """
+    DELETE FROM UnitMaintenanceRequests
+    WHERE unitID = :unitID AND requestID = :requestID
+    """,
+    # The associations a unit or request delete removes by cascade.
+    "get_unit_links": "SELECT unitID, requestID FROM UnitMaintenanceRequests WHERE unitID = :unitID",
+    "get_request_links": "SELECT unitID, requestID FROM UnitMaintenanceRequests WHERE requestID = :requestID",
+
+    # Property summaries. The count_* statements add :sign (1 or -1) times a
+    # row's current contribution to the summary rows it belongs to; running
+    # one with -1 before a write and +1 after it moves the contribution.
+    "count_unit": """
+    INSERT INTO PropertyUnitCounts (propertyID, status, unitCount)
+    SELECT propertyID, status, :sign
+    FROM Units
+    WHERE unitID = :unitID
+    """ + db.BACKEND.upsert_sum(["propertyID", "status"], ["unitCount"]),
+    "count_lease": """
+    INSERT INTO PropertyLeaseTotals (propertyID, leaseEnd, leaseCount, rentTotal)
+    SELECT u.propertyID, COALESCE(l.endDate, '%s'), :sign, :sign * l.rentPrice
+    FROM Leases AS l
+    JOIN Units AS u ON u.unitID = l.unitID
+    WHERE l.leaseID = :leaseID
+    """ % OPEN_LEASE_END + db.BACKEND.upsert_sum(["propertyID", "leaseEnd"], ["leaseCount", "rentTotal"]),
+    "count_unit_leases": """
+    INSERT INTO PropertyLeaseTotals (propertyID, leaseEnd, leaseCount, rentTotal)
+    SELECT u.propertyID, COALESCE(l.endDate, '%s'), :sign * COUNT(*), :sign * SUM(l.rentPrice)
+    FROM Leases AS l
+    JOIN Units AS u ON u.unitID = l.unitID
+    WHERE l.unitID = :unitID
+    GROUP BY u.propertyID, COALESCE(l.endDate, '%s')
+    """ % (OPEN_LEASE_END, OPEN_LEASE_END) + db.BACKEND.upsert_sum(["propertyID", "leaseEnd"], ["leaseCount", "rentTotal"]),
+    "get_property_unit_counts": """
+    SELECT p.propertyID, c.status, c.unitCount
+    FROM Properties AS p
+    LEFT JOIN PropertyUnitCounts AS c ON c.propertyID = p.propertyID AND c.unitCount > 0
+    WHERE p.propertyID = :propertyID
+    """,
+    "get_property_lease_totals": """
+    SELECT SUM(leaseCount) AS activeLeases, SUM(rentTotal) AS totalRent
+    FROM PropertyLeaseTotals
+    WHERE propertyID = :propertyID AND leaseEnd >= :today
+    """,
+    "get_unit_counts": """
+    SELECT status, SUM(unitCount) AS unitCount
+    FROM PropertyUnitCounts
+    GROUP BY status
+    HAVING SUM(unitCount) > 0
+    """,
+    "get_lease_totals": """
+    SELECT SUM(leaseCount) AS activeLeases, SUM(rentTotal) AS totalRent
+    FROM PropertyLeaseTotals
+    WHERE leaseEnd >= :today
+    """,
+
+    # Change log
+    "log_change": """
+    INSERT INTO ChangeLog (tableName, operation, rowKey)
+    VALUES (:tableName, :operation, :rowKey)
+    """,
+    "get_changes": """
+    SELECT seq, tableName, operation, rowKey, changedAt
+    FROM ChangeLog
+    WHERE seq > :after
+    ORDER BY seq
+    LIMIT :limit
+    """,
+    "get_change_bounds": "SELECT MIN(seq) AS first, MAX(seq) AS last FROM ChangeLog",
+    "prune_changes": "DELETE FROM ChangeLog WHERE seq <= :through",
+
+    # Delta sync
+    "get_sync_time": "SELECT %s AS now" % db.BACKEND.current_timestamp,
+    "add_tombstone": """
+    INSERT INTO Tombstones (tableName, rowKey)
+    VALUES (:tableName, :rowKey)
+    """,
+    "get_tombstones": "SELECT rowKey, deletedAt FROM Tombstones",
+    "prune_tombstones": "DELETE FROM Tombstones WHERE tableName = :tableName AND deletedAt < :before",
+
+    # Search
+    "add_search_term": """
+    INSERT INTO SearchTerms (tableName, term, rowID, weight)
+    VALUES (:tableName, :term, :rowID, :weight)
+    """,
+    "delete_search_terms": "DELETE FROM SearchTerms WHERE tableName = :tableName AND rowID = :rowID",
+}
+
+# CATALOG compiled once to the pyformat placeholders PyMySQL, aiomysql and the
+# SQLite adapter all accept.
+QUERIES = {name: db.convert_query(query) for name, query in CATALOG.items()}
+
+PARAMETER = re.compile(r"%\((\w+)\)s")
+
+
+def check_statement(cursor, dialect, query):
+    """
+    Has the database parse and resolve a compiled query against the current
+    schema without running it: MySQL parses it with PREPARE and drops it again
+    (queries are still sent interpolated when they run), SQLite compiles it
+    under EXPLAIN. Raises the driver's error if it is invalid.
+    """
+    if dialect == "mysql":
+        cursor.execute("PREPARE upms_check_query FROM %s", (PARAMETER.sub("?", query),))
+        cursor.execute("DEALLOCATE PREPARE upms_check_query")
+    else:
+        cursor.execute("EXPLAIN " + query, dict.fromkeys(PARAMETER.findall(query)))
+        cursor.fetchall()
+
+
+def check_queries():
+    """
+    Validates every CATALOG statement against the database schema. Logs each
+    invalid statement and raises RuntimeError if there are any.
+    """
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        failed = []
+        for name, query in QUERIES.items():
+            try:
+                check_statement(cursor, db.BACKEND.dialect, query)
+            except Exception as e:
+                logger.error("Query %s does not match the schema: %s", name, e)
+                failed.append(name)
+        cursor.close()
+    finally:
+        conn.close()
+    if failed:
+        raise RuntimeError("Invalid queries in the catalog: %s" % ", ".join(failed))
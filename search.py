@@ -0,0 +1,131 @@
+# search.py
+# Term extraction behind GET /tenants/search and GET /properties/search.
+#
+# Searchable fields are split into normalized terms (accents stripped, case
+# folded, punctuation dropped) that the CRUD functions write to the
+# SearchTerms table alongside the row itself (crud.index_row()). A query is
+# split the same way and each of its words is looked up as a prefix of a
+# term, which is a range scan on SearchTerms' primary key, so a lookup reads
+# only the index entries starting with what was typed however large the
+# tables grow. A row matches when every query word matches one of its terms;
+# rows are ranked by how well they match (see crud.search_rows()).
+import re
+import unicodedata
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Query words beyond this many are ignored.
+SEARCH_MAX_WORDS = 5
+# Width of SearchTerms.term; longer terms are cut to it.
+SEARCH_TERM_LENGTH = 64
+# Looked up on its own, a shorter query word (an initial, a house number)
+# would match a large share of all terms as a prefix. Such words only narrow
+# down the rows the query's longer words found, or, in a query with no longer
+# words, match whole terms.
+SEARCH_MIN_PREFIX = 2
+# The q parameter of the search routes, as documented in the API schema.
+SEARCH_QUERY_DESCRIPTION = (
+    "Words to find, each matched as the start of a word of the row. Case, accents and punctuation "
+    "are ignored. A word shorter than %d characters is not looked up on its own: it narrows down "
+    "the rows the query's longer words found, or, in a query with none, matches only whole words."
+    % SEARCH_MIN_PREFIX
+)
+
+# Searchable fields of each table with their weight in the ranking: a query
+# word matching a name counts for more than one matching an email address or a
+# state.
+SEARCH_FIELDS = {
+    "Tenants": {"firstName": 3, "lastName": 3, "email": 2, "phoneNumber": 2},
+    "Properties": {"address": 3, "city": 2, "zipCode": 2, "state": 1},
+}
+
+# Primary key column of each searchable table.
+SEARCH_KEYS = {"Tenants": "tenantID", "Properties": "propertyID"}
+
+WORD = re.compile(r"[^\W_]+")
+EMAIL_DOMAIN = re.compile(r"@\S*")
+
+
+def fold(text: str) -> str:
+    """
+    Returns text case folded and with accents removed, e.g. "Zoë" becomes "zoe".
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def words(text: str) -> list:
+    """
+    Splits text into folded words of letters and digits, e.g.
+    "Zoë O'Brien-Smith" becomes ["zoe", "o", "brien", "smith"].
+    """
+    return [word[:SEARCH_TERM_LENGTH] for word in WORD.findall(fold(text))]
+
+
+def text_terms(text: str) -> list:
+    """
+    Returns the words of text, plus each run of words joined by punctuation
+    written as one word, so "obrien" finds "O'Brien-Smith" as well as "brien".
+    """
+    terms = words(text)
+    for chunk in fold(text).split():
+        parts = WORD.findall(chunk)
+        if len(parts) > 1:
+            terms.append("".join(parts)[:SEARCH_TERM_LENGTH])
+    return terms
+
+
+def phone_terms(phone: str) -> list:
+    """
+    Returns the digits of a phone number as one term, plus its last seven and
+    last four digits, so "555-0142" and "0142" find "(503) 555-0142".
+    """
+    digits = "".join(char for char in phone if char.isdigit())
+    return [digits[-length:] for length in (len(digits), 7, 4) if len(digits) >= length > 0]
+
+
+def email_terms(email: str) -> list:
+    """
+    Returns the terms of the part of an email address before the @. Domains
+    are shared by so many addresses that as terms they would match nearly
+    every row.
+    """
+    return text_terms(email.split("@", 1)[0])
+
+
+def row_terms(table: str, row: dict) -> dict:
+    """
+    Returns {term: weight} for a row of a searchable table, keeping the
+    highest weight of a term found in several fields.
+    """
+    terms = {}
+    for field, weight in SEARCH_FIELDS[table].items():
+        value = row.get(field)
+        if value is None:
+            continue
+        if field == "phoneNumber":
+            found = phone_terms(value)
+        elif field == "email":
+            found = email_terms(value)
+        else:
+            found = text_terms(str(value))
+        for term in found:
+            terms[term] = max(weight, terms.get(term, 0))
+    return terms
+
+
+def query_words(q: str) -> list:
+    """
+    Returns the distinct words of a search query, in order, at most
+    SEARCH_MAX_WORDS of them. The domain of an email address in the query is
+    left out, as it is from the terms.
+    """
+    return list(dict.fromkeys(words(EMAIL_DOMAIN.sub("", q))))[:SEARCH_MAX_WORDS]
+
+
+def prefix_bounds(word: str):
+    """
+    Returns (low, high) such that the terms starting with word are exactly
+    those with low <= term < high under binary collation.
+    """
+    return word, word[:-1] + chr(ord(word[-1]) + 1)
@@ -0,0 +1,64 @@
+# serialization.py
+# Fast JSON encoding of rows read from the database.
+#
+# By default FastAPI validates whatever a route returns against its
+# response_model, building a Pydantic model per row, and then encodes the
+# result. Rows coming straight from our own queries are already the right
+# shape, so with FAST_RESPONSES=1 the read routes hand them to RowsResponse
+# instead: they are encoded to JSON bytes in one pass and no model is built.
+# The route's response_model is unchanged, so the OpenAPI schema still
+# documents the same body.
+from datetime import date, datetime
+from decimal import Decimal
+import json
+import os
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is the fallback
+    orjson = None
+
+FAST_RESPONSES = os.environ.get("FAST_RESPONSES") == "1"
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError("Object of type %s is not JSON serializable" % type(value).__name__)
+
+
+def dumps(content) -> bytes:
+    """
+    Encodes rows (dicts, lists and pages of them) as compact JSON bytes.
+    Dates become ISO strings and Decimals floats, exactly as the Pydantic
+    models would render them.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class RowsResponse(Response):
+    """
+    A JSON response for trusted database rows, rendered with dumps() and
+    without response_model validation.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def rows_response(content):
+    """
+    Wraps a read route's result in a RowsResponse when FAST_RESPONSES is on;
+    otherwise returns it unchanged for FastAPI to validate and encode.
+    """
+    if FAST_RESPONSES:
+        return RowsResponse(content)
+    return content
@@ -0,0 +1,424 @@
+# slow_queries.py
+# Slow-query log behind GET /admin/slow-queries.
+#
+# The connections db.py lends to the CRUD functions are wrapped so that every
+# statement they run is timed: the time spent in execute() and in fetching
+# its rows, but not time the caller spends between fetches (a streamed export
+# is not charged for a slow client). A statement taking SLOW_QUERY_MS or more
+# is logged and kept in a ring buffer of the last SLOW_QUERY_LOG_SIZE, as its
+# normalized SQL (whitespace collapsed, literals and placeholders replaced by
+# ?, repeated VALUES or IN lists folded), a fingerprint of its parameters
+# (equal for equal parameters, keyed so the values cannot be recovered), its
+# duration and its row count.
+#
+# A slow SELECT's plan is then captured off the request path, on a connection
+# from the same pool the statement ran on (so a replica's read is explained on
+# that replica): a background thread runs EXPLAIN for the sync pools, a task
+# on the event loop for the async ones, and the result is attached to the
+# entry. Writes are logged without a plan. A plan is reused for the same normalized SQL for
+# EXPLAIN_REUSE_SECONDS, and statements arriving faster than they can be
+# explained get no plan rather than a growing queue.
+#
+# The log is off unless SLOW_QUERY_MS is set: connections are then lent
+# unwrapped and nothing is explained.
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Statements at least this slow are logged; 0 (the default) turns the log off.
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "0"))
+SLOW_QUERY_LOG_SIZE = 200
+EXPLAIN_QUEUE_SIZE = 50
+EXPLAIN_REUSE_SECONDS = 300
+EXPLAIN_CACHE_SIZE = 500
+
+# Only reads are explained: the plans worth triaging are those of the list and
+# search queries, and a write's plan would be taken after it had already run.
+EXPLAINABLE = re.compile(r"^\s*SELECT\b", re.I)
+
+WHITESPACE = re.compile(r"\s+")
+LITERAL = re.compile(r"%\(\w+\)s|%s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+VALUE_LIST = re.compile(r"\(\?(?:, ?\?)*\)")
+REPEATED_LISTS = re.compile(r"\(\.\.\.\)(?:, ?\(\.\.\.\))+")
+
+
+def normalize(sql: str) -> str:
+    """
+    Returns the shape of a statement, the same for every call whatever its
+    values, e.g. "SELECT ... WHERE id IN (%s, %s) LIMIT 50" becomes
+    "SELECT ... WHERE id IN (...) LIMIT ?".
+    """
+    sql = LITERAL.sub("?", WHITESPACE.sub(" ", sql).strip())
+    return REPEATED_LISTS.sub("(...), ...", VALUE_LIST.sub("(...)", sql))
+
+
+# Key of the parameter fingerprints, new in every process: without it an id,
+# phone number or email could be recovered from its fingerprint by hashing
+# candidates until one matches.
+FINGERPRINT_KEY = os.urandom(16)
+
+
+def fingerprint(params) -> str:
+    """
+    Returns a short keyed hash identifying a parameter set (or an
+    executemany() list of them) without revealing the values. Fingerprints
+    only compare equal within one process.
+    """
+    if isinstance(params, dict):
+        params = sorted(params.items())
+    return hashlib.blake2b(repr(params).encode(), digest_size=8, key=FINGERPRINT_KEY).hexdigest()
+
+
+class SlowQueryLog:
+    """
+    The ring buffer of slow statements and the background EXPLAIN work.
+    """
+
+    def __init__(self, threshold_ms=SLOW_QUERY_MS, size=SLOW_QUERY_LOG_SIZE):
+        self.threshold = threshold_ms / 1000.0
+        self.entries = deque(maxlen=size)
+        self._plans = OrderedDict()  # normalized SQL -> (monotonic time, plan)
+        self._queue = queue.Queue(maxsize=EXPLAIN_QUEUE_SIZE)
+        self._tasks = set()  # pending async EXPLAIN tasks
+        self._lock = threading.Lock()
+        self._worker = None
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def record(self, sql: str, params, duration: float, rows, error=None, many=False, explain=None):
+        """
+        Adds a statement that took `duration` seconds to the log if it was
+        slow. Called by the traced cursors for every statement; `explain` runs
+        EXPLAIN for it on the pool it came from (a coroutine function for an
+        async pool).
+        """
+        if duration < self.threshold:
+            return
+        shape = normalize(sql)
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "sql": shape,
+            "params": fingerprint(params),
+            "durationMs": round(duration * 1000, 2),
+            "rows": rows,
+            "error": error,
+            "plan": None,
+            "planError": None,
+        }
+        logger.warning("Slow query (%.1f ms, %s rows, params %s): %s",
+                       entry["durationMs"], rows, entry["params"], shape)
+        with self._lock:
+            self.entries.append(entry)
+        if self._reuse_plan(entry):
+            return
+        if explain is not None and not many and EXPLAINABLE.match(sql):
+            if asyncio.iscoroutinefunction(explain):
+                self._explain_async(entry, sql, params, explain)
+            else:
+                self._explain_later(entry, sql, params, explain)
+
+    def _explain_later(self, entry, sql, params, explain):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="slow-query-explain", daemon=True)
+                    self._worker.start()
+        try:
+            self._queue.put_nowait((entry, sql, params, explain))
+        except queue.Full:
+            entry["planError"] = "EXPLAIN queue full"
+
+    def _run(self):
+        while True:
+            entry, sql, params, explain = self._queue.get()
+            if self._reuse_plan(entry):
+                continue
+            try:
+                plan = [dict(row) for row in explain(sql, params)]
+            except Exception as e:
+                entry["planError"] = str(e) or type(e).__name__
+                continue
+            self._keep_plan(entry, plan)
+
+    def _explain_async(self, entry, sql, params, explain):
+        if len(self._tasks) >= EXPLAIN_QUEUE_SIZE:
+            entry["planError"] = "EXPLAIN queue full"
+            return
+        task = asyncio.ensure_future(self._arun(entry, sql, params, explain))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _arun(self, entry, sql, params, explain):
+        if self._reuse_plan(entry):
+            return
+        try:
+            plan = [dict(row) for row in await explain(sql, params)]
+        except Exception as e:
+            entry["planError"] = str(e) or type(e).__name__
+            return
+        self._keep_plan(entry, plan)
+
+    def _reuse_plan(self, entry):
+        with self._lock:
+            cached = self._plans.get(entry["sql"])
+        if cached is not None and time.monotonic() - cached[0] < EXPLAIN_REUSE_SECONDS:
+            entry["plan"] = cached[1]
+            return True
+        return False
+
+    def _keep_plan(self, entry, plan):
+        entry["plan"] = plan
+        with self._lock:
+            self._plans[entry["sql"]] = (time.monotonic(), plan)
+            self._plans.move_to_end(entry["sql"])
+            while len(self._plans) > EXPLAIN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+
+    def snapshot(self, limit=None) -> list:
+        """
+        Returns the logged statements, newest first.
+        """
+        with self._lock:
+            entries = list(reversed(self.entries))
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._plans.clear()
+
+
+class _Timing:
+    """
+    The statement a traced cursor is running: its active time so far and the
+    rows fetched. Recorded when the cursor moves on to the next statement, has
+    fetched everything or is closed.
+    """
+
+    def __init__(self, log, cursor, explain):
+        self._log = log
+        self._cursor = cursor
+        self._explain = explain
+        self._statement = None
+
+    def start(self, sql, params, many=False):
+        self.finish()
+        self._statement = [sql, params, 0.0, None, many]
+
+    def add(self, elapsed, rows=None):
+        if self._statement is not None:
+            self._statement[2] += elapsed
+            if rows is not None:
+                self._statement[3] = (self._statement[3] or 0) + rows
+
+    def finish(self, error=None):
+        statement, self._statement = self._statement, None
+        if statement is None:
+            return
+        sql, params, duration, rows, many = statement
+        if rows is None:
+            rowcount = getattr(self._cursor, "rowcount", -1)
+            rows = rowcount if rowcount is not None and 0 <= rowcount < 2 ** 63 else None
+        self._log.record(sql, params, duration, rows, error, many, self._explain)
+
+
+class TracedCursor:
+    """
+    A DB-API cursor that reports each statement it runs to a SlowQueryLog.
+    """
+
+    def __init__(self, cursor, log, explain=None):
+        self._cursor = cursor
+        self._timing = _Timing(log, cursor, explain)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _run(self, method, query, params, many):
+        self._timing.start(query, params, many)
+        started = time.perf_counter()
+        try:
+            result = method(query, params)
+        except Exception as e:
+            self._timing.add(time.perf_counter() - started)
+            self._timing.finish(str(e) or type(e).__name__)
+            raise
+        self._timing.add(time.perf_counter() - started)
+        return result
+
+    def execute(self, query, params=None):
+        return self._run(self._cursor.execute, query, params, False)
+
+    def executemany(self, query, seq_of_params):
+        return self._run(self._cursor.executemany, query, seq_of_params, True)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._timing.add(time.perf_counter() - started, int(row is not None))
+        if row is None:
+            self._timing.finish()
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._timing.add(time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._timing.add(time.perf_counter() - started, len(rows))
+        self._timing.finish()
+        return rows
+
+    def __iter__(self):
+        iterator = iter(self._cursor)
+        while True:
+            started = time.perf_counter()
+            row = next(iterator, None)
+            self._timing.add(time.perf_counter() - started, int(row is not None))
+            if row is None:
+                self._timing.finish()
+                return
+            yield row
+
+    def close(self):
+        self._timing.finish()
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TracedConnection:
+    """
+    A connection whose cursors are TracedCursors. Everything else is passed
+    through to the wrapped connection. `explain(sql, params)` returns the plan
+    of a statement, run on the pool the connection came from.
+    """
+
+    def __init__(self, conn, log, explain=None):
+        self._conn = conn
+        self._log = log
+        self._explain = explain
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self._conn.cursor(*args, **kwargs), self._log, self._explain)
+
+
+class AsyncTracedCursor(TracedCursor):
+    """
+    TracedCursor for aiomysql, whose cursor methods are awaitable.
+    """
+
+    async def _run(self, method, query, params, many):
+        self._timing.start(query, params, many)
+        started = time.perf_counter()
+        try:
+            result = await method(query, params)
+        except Exception as e:
+            self._timing.add(time.perf_counter() - started)
+            self._timing.finish(str(e) or type(e).__name__)
+            raise
+        self._timing.add(time.perf_counter() - started)
+        return result
+
+    async def fetchone(self):
+        started = time.perf_counter()
+        row = await self._cursor.fetchone()
+        self._timing.add(time.perf_counter() - started, int(row is not None))
+        if row is None:
+            self._timing.finish()
+        return row
+
+    async def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = await (self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany())
+        self._timing.add(time.perf_counter() - started, len(rows))
+        return rows
+
+    async def fetchall(self):
+        started = time.perf_counter()
+        rows = await self._cursor.fetchall()
+        self._timing.add(time.perf_counter() - started, len(rows))
+        self._timing.finish()
+        return rows
+
+    def __iter__(self):
+        raise TypeError("An async cursor is not iterable; use async for")
+
+    def __aiter__(self):
+        return self._rows()
+
+    async def _rows(self):
+        while True:
+            row = await self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    async def close(self):
+        self._timing.finish()
+        await self._cursor.close()
+
+    def __enter__(self):
+        raise TypeError("An async cursor is closed with async with")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class _AsyncCursorContext:
+    """
+    What AsyncTracedConnection.cursor() returns: awaited it is the cursor, and
+    `async with` closes it at the end of the block, as with aiomysql's own.
+    """
+
+    def __init__(self, opening):
+        self._opening = opening
+        self._cursor = None
+
+    def __await__(self):
+        return self._opening.__await__()
+
+    async def __aenter__(self):
+        self._cursor = await self._opening
+        return self._cursor
+
+    async def __aexit__(self, *exc_info):
+        await self._cursor.close()
+
+
+class AsyncTracedConnection(TracedConnection):
+    """
+    TracedConnection for aiomysql, whose cursor() is awaitable or used with
+    `async with`.
+    """
+
+    def cursor(self, *args, **kwargs):
+        return _AsyncCursorContext(self._open_cursor(*args, **kwargs))
+
+    async def _open_cursor(self, *args, **kwargs):
+        return AsyncTracedCursor(await self._conn.cursor(*args, **kwargs), self._log, self._explain)
@@ -0,0 +1,70 @@
+# streaming.py
+# Incremental JSON encoders for the /export routes. Rows arrive one at a time
+# from an unbuffered cursor and leave as byte chunks, so neither the result set
+# nor the response body is ever held in memory as a whole.
+from enum import Enum
+
+from serialization import dumps
+
+# Rows are encoded into chunks of this many rows before being handed to the
+# server; sending each row as its own chunk would cost a write (and, for sync
+# generators, a threadpool hop) per row.
+CHUNK_ROWS = 500
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    json = "json"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.json: "application/json",
+}
+
+
+def _piece(row: dict, fmt: ExportFormat, first: bool) -> bytes:
+    if fmt is ExportFormat.ndjson:
+        return dumps(row) + b"\n"
+    return dumps(row) if first else b"," + dumps(row)
+
+
+def encode_rows(rows, fmt: ExportFormat):
+    """
+    Encodes an iterable of row dicts as NDJSON lines or as the elements of a
+    single JSON array, yielding bytes every CHUNK_ROWS rows.
+    """
+    if fmt is ExportFormat.json:
+        yield b"["
+    buffer = []
+    count = 0
+    for row in rows:
+        buffer.append(_piece(row, fmt, first=count == 0))
+        count += 1
+        if len(buffer) == CHUNK_ROWS:
+            yield b"".join(buffer)
+            buffer = []
+    if buffer:
+        yield b"".join(buffer)
+    if fmt is ExportFormat.json:
+        yield b"]"
+
+
+async def aencode_rows(rows, fmt: ExportFormat):
+    """
+    encode_rows() for an async iterable of row dicts.
+    """
+    if fmt is ExportFormat.json:
+        yield b"["
+    buffer = []
+    count = 0
+    async for row in rows:
+        buffer.append(_piece(row, fmt, first=count == 0))
+        count += 1
+        if len(buffer) == CHUNK_ROWS:
+            yield b"".join(buffer)
+            buffer = []
+    if buffer:
+        yield b"".join(buffer)
+    if fmt is ExportFormat.json:
+        yield b"]"
@@ -0,0 +1,83 @@
+# conftest.py
+# Runs the test suite against a throwaway SQLite database (db.py's embedded
+# backend), migrated when the app starts, so no MySQL server is needed. The
+# environment is set here, before any test module imports db.py.
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+DATABASE_DIR = tempfile.mkdtemp(prefix="upms-tests-")
+
+os.environ.update({
+    "DB_BACKEND": "sqlite",
+    "SQLITE_PATH": os.path.join(DATABASE_DIR, "upms.sqlite3"),
+    "MIGRATE_ON_STARTUP": "1",
+})
+for name in ("DB_MODE", "DB_REPLICAS", "GROUP_COMMIT"):
+    os.environ.pop(name, None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+READY_TIMEOUT_SECONDS = 10
+
+_serial = itertools.count(1)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(DATABASE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """
+    A TestClient for the app, yielded once the startup warm-up (and with it
+    the migrations) has finished. Tests share the database, so each creates
+    the rows it checks rather than counting on an empty table.
+    """
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+        while client.get("/readyz").status_code != 200:
+            assert time.monotonic() < deadline, "the app did not become ready"
+            time.sleep(0.02)
+        yield client
+
+
+@pytest.fixture
+def make_tenant(client):
+    def make_tenant(**fields):
+        serial = next(_serial)
+        tenant = {"firstName": "Test", "lastName": "Tenant%d" % serial, "phoneNumber": "5550100",
+                  "email": "tenant%d@example.com" % serial, **fields}
+        response = client.post("/tenants", json=tenant)
+        assert response.status_code == 200, response.text
+        return response.json()["tenantID"]
+    return make_tenant
+
+
+@pytest.fixture
+def make_property(client):
+    def make_property(**fields):
+        prop = {"address": "%d Main St" % next(_serial), "city": "Portland", "state": "OR", "zipCode": "97201",
+                "propertyValue": 100000, **fields}
+        response = client.post("/properties", json=prop)
+        assert response.status_code == 200, response.text
+        return response.json()["propertyID"]
+    return make_property
+
+
+@pytest.fixture
+def make_unit(client, make_property):
+    def make_unit(propertyID=None, **fields):
+        unit = {"propertyID": propertyID or make_property(), "unitNumber": str(next(_serial)), "unitType": "Studio",
+                **fields}
+        response = client.post("/units", json=unit)
+        assert response.status_code == 200, response.text
+        return response.json()["unitID"]
+    return make_unit
@@ -0,0 +1,77 @@
+import db
+
+
+def batch(client, *operations):
+    return client.post("/batch", json={"operations": list(operations)})
+
+
+def tenant_data(email):
+    return {"firstName": "Batch", "lastName": "Tenant", "phoneNumber": "5550100", "email": email}
+
+
+def count_tenants(email):
+    with db.pooled_connection() as connection:
+        cursor = db.BACKEND.dict_cursor(connection)
+        cursor.execute("SELECT COUNT(*) AS tenants FROM Tenants WHERE email = %(email)s", {"email": email})
+        count = cursor.fetchone()["tenants"]
+        cursor.close()
+    return count
+
+
+def test_move_in_commits_with_references(client, make_property, make_unit):
+    propertyID = make_property()
+    unitID = make_unit(propertyID)
+    response = batch(
+        client,
+        {"method": "create", "resource": "tenants", "ref": "tenant", "data": tenant_data("batch-move-in@example.com")},
+        {"method": "create", "resource": "leases", "data": {"unitID": unitID, "tenantID": "$tenant",
+                                                             "startDate": "2026-01-01", "rentPrice": 1200}},
+        {"method": "patch", "resource": "units", "id": unitID, "data": {"status": "Occupied"}},
+        {"method": "create", "resource": "payments", "data": {"tenantID": "$tenant", "leaseID": "$1", "amount": 1200,
+                                                               "paymentDate": "2026-01-01", "paymentMethod": "card"}},
+    )
+    assert response.status_code == 200, response.text
+    tenant, lease, unit, payment = response.json()["results"]
+    assert lease["tenantID"] == payment["tenantID"] == tenant["tenantID"]
+    assert payment["leaseID"] == lease["leaseID"]
+    assert unit["status"] == "Occupied"
+    summary = client.get("/properties/%d/summary" % propertyID).json()
+    assert (summary["unitsByStatus"], summary["activeLeases"]) == ({"Occupied": 1}, 1)
+
+
+def test_failing_operation_rolls_back_the_batch(client, make_property, make_unit):
+    propertyID = make_property()
+    unitID = make_unit(propertyID)
+    assert client.get("/units/%d" % unitID).json()["status"] == "Vacant"
+    response = batch(
+        client,
+        {"method": "create", "resource": "tenants", "ref": "tenant", "data": tenant_data("batch-rolled@example.com")},
+        {"method": "patch", "resource": "units", "id": unitID, "data": {"status": "Occupied"}},
+        {"method": "create", "resource": "leases", "data": {"unitID": 10 ** 9, "tenantID": "$tenant",
+                                                             "startDate": "2026-01-01", "rentPrice": 1}},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Operation 2 (create leases)")
+    assert count_tenants("batch-rolled@example.com") == 0
+    assert client.get("/units/%d" % unitID).json()["status"] == "Vacant"
+    assert client.get("/properties/%d/summary" % propertyID).json()["unitsByStatus"] == {"Vacant": 1}
+
+
+def test_missing_row_fails_with_its_route_status(client):
+    response = batch(client, {"method": "update", "resource": "tenants", "id": 10 ** 9,
+                              "data": tenant_data("batch-missing@example.com")})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Operation 0 (update tenants): Tenant not found"
+
+
+def test_invalid_batches_are_rejected_before_running(client):
+    unknown_ref = batch(client, {"method": "create", "resource": "leases",
+                                 "data": {"unitID": "$nope", "tenantID": 1, "startDate": "2026-01-01", "rentPrice": 1}})
+    assert unknown_ref.status_code == 400
+    assert "Unknown reference $nope" in unknown_ref.json()["detail"]
+    invalid = batch(client, {"method": "create", "resource": "tenants", "data": {"firstName": "A"}})
+    assert invalid.status_code == 422
+    association = batch(client, {"method": "patch", "resource": "unit_maintenance_requests", "data": {}})
+    assert association.status_code == 400
+    too_long = batch(client, *[{"method": "delete", "resource": "payments", "id": 1}] * 101)
+    assert too_long.status_code == 400
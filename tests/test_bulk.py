@@ -0,0 +1,88 @@
+import pytest
+
+import crud
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(crud, "BULK_INSERT_BATCH_SIZE", 3)
+
+
+def test_bulk_ids_match_their_rows(client, small_batches):
+    tenants = [{"firstName": "Bulk", "lastName": "Order%d" % index, "phoneNumber": "5550100",
+                "email": "bulk-order%d@example.com" % index} for index in range(8)]
+    response = client.post("/tenants/bulk", json=tenants)
+    assert response.status_code == 200, response.text
+    created = response.json()
+    assert [row["email"] for row in created] == [tenant["email"] for tenant in tenants]
+    assert len({row["tenantID"] for row in created}) == len(tenants)
+    for row in created:
+        assert client.get("/tenants/%d" % row["tenantID"]).json() == row
+
+
+def test_bulk_units_are_counted(client, make_property, small_batches):
+    propertyID = make_property()
+    units = [{"propertyID": propertyID, "unitNumber": str(index), "unitType": "Studio",
+              "status": "Occupied" if index % 2 else "Vacant"} for index in range(5)]
+    created = client.post("/units/bulk", json=units).json()
+    for unit, row in zip(units, created):
+        assert client.get("/units/%d" % row["unitID"]).json() == {**unit, "unitID": row["unitID"]}
+    assert client.get("/properties/%d/summary" % propertyID).json()["unitsByStatus"] == {"Occupied": 2, "Vacant": 3}
+
+
+def test_empty_bulk_create(client):
+    response = client.post("/tenants/bulk", json=[])
+    assert (response.status_code, response.json()) == (200, [])
+
+
+def test_failed_bulk_create_writes_nothing(client):
+    tenants = [{"firstName": "Bulk", "lastName": "Dup", "phoneNumber": "5550100", "email": "bulk-dup@example.com"}] * 2
+    assert client.post("/tenants/bulk", json=tenants).status_code == 400
+    emails = [item["email"] for item in client.get("/tenants", params={"limit": 1000}).json()["items"]]
+    assert "bulk-dup@example.com" not in emails
+
+
+def test_auto_increment_ids_follow_the_increment():
+    assert crud.auto_increment_ids(7, 3, 1) == [7, 8, 9]
+    assert crud.auto_increment_ids(11, 3, 5) == [11, 16, 21]
+    assert crud.auto_increment_ids(11, 0, 5) == []
+
+
+class FakeCursor:
+    def __init__(self):
+        self.lastrowid = None
+        self.next_id = 101
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append(query)
+        count = query.count("), (") + 1
+        self.lastrowid = self.next_id
+        self.next_id += count * 2
+
+    def close(self):
+        pass
+
+
+class SteppedBackend:
+    """A MySQL server with auto_increment_increment = 2, which reports the first ID of an INSERT."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def dict_cursor(self, conn):
+        return self.cursor
+
+    def id_increment(self, cursor):
+        return 2
+
+    def first_insert_id(self, cursor, count):
+        return cursor.lastrowid
+
+
+def test_bulk_insert_steps_ids_by_the_increment(monkeypatch, small_batches):
+    cursor = FakeCursor()
+    monkeypatch.setattr(crud, "BACKEND", SteppedBackend(cursor))
+    rows = [{"name": str(index)} for index in range(5)]
+    assert crud.bulk_insert(None, "Things", ["name"], rows) == [101, 103, 105, 107, 109]
+    assert len(cursor.statements) == 2
@@ -0,0 +1,87 @@
+import time
+
+import crud
+import db
+from cache import MISSING, LRUCache, entity_cache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire():
+    cache = LRUCache(maxsize=2, ttl=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is MISSING
+
+
+def test_put_after_invalidation_is_skipped():
+    cache = LRUCache(maxsize=2, ttl=60)
+    version = cache.version()
+    cache.invalidate("a")
+    cache.put("a", "stale", version)
+    assert cache.get("a") is MISSING
+
+
+def test_reads_are_cached_and_writes_invalidate(client, make_unit):
+    unitID = make_unit()
+    assert client.get("/units/%d" % unitID).json()["status"] == "Vacant"
+    assert entity_cache.get(("Units", unitID)) is not MISSING
+    client.patch("/units/%d" % unitID, json={"status": "Occupied"})
+    assert entity_cache.get(("Units", unitID)) is MISSING
+    assert client.get("/units/%d" % unitID).json()["status"] == "Occupied"
+
+
+def test_reads_inside_a_transaction_bypass_the_cache(client, make_unit):
+    unitID = make_unit()
+    client.get("/units/%d" % unitID)
+    try:
+        with db.transaction():
+            crud.patch_unit(unitID, {"status": "Occupied"})
+            assert crud.get_unit(unitID)["status"] == "Occupied"
+            assert entity_cache.get(("Units", unitID)) is MISSING
+            raise RuntimeError("roll back")
+    except RuntimeError:
+        pass
+    assert entity_cache.get(("Units", unitID)) is MISSING
+    assert client.get("/units/%d" % unitID).json()["status"] == "Vacant"
+
+
+def make_link(client, unitID):
+    requestID = client.post("/maintenance_requests", json={"description": "Leak", "status": "Open",
+                                                           "submissionDate": "2026-01-01"}).json()["requestID"]
+    assert client.post("/unit_maintenance_requests", json={"unitID": unitID, "requestID": requestID}).status_code == 200
+    assert crud.get_unit_maintenance_request(unitID, requestID)
+    assert entity_cache.get(("UnitMaintenanceRequests", unitID, requestID)) is not MISSING
+    return requestID
+
+
+def test_deleting_a_unit_drops_its_cached_links(client, make_unit):
+    unitID = make_unit()
+    requestID = make_link(client, unitID)
+    assert client.delete("/units/%d" % unitID).status_code == 200
+    assert crud.get_unit_maintenance_request(unitID, requestID) is None
+
+
+def test_deleting_a_request_drops_its_cached_links(client, make_unit):
+    unitID = make_unit()
+    requestID = make_link(client, unitID)
+    assert client.delete("/maintenance_requests/%d" % requestID).status_code == 200
+    assert crud.get_unit_maintenance_request(unitID, requestID) is None
+
+
+def test_batch_delete_of_a_link_drops_it_from_the_cache(client, make_unit):
+    unitID = make_unit()
+    requestID = make_link(client, unitID)
+    response = client.post("/batch", json={"operations": [{"method": "delete", "resource": "unit_maintenance_requests",
+                                                           "data": {"unitID": unitID, "requestID": requestID}}]})
+    assert response.status_code == 200, response.text
+    assert crud.get_unit_maintenance_request(unitID, requestID) is None
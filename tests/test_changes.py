@@ -0,0 +1,160 @@
+import asyncio
+import json
+
+import pytest
+
+import changes
+import crud
+from changes import ChangeFeed, InvalidChangeQuery, ThreadedStore, parse_resources
+
+
+class FakeStore:
+    """An in-memory ChangeLog whose writers' transactions the test opens and ends."""
+
+    def __init__(self):
+        self.rows = []
+        self.open = set()
+        self.visible = True  # False: open transactions cannot be seen
+
+    async def get_change_bounds(self):
+        seqs = [row["seq"] for row in self.rows]
+        return {"first": min(seqs, default=None), "last": max(seqs, default=None), "increment": 1}
+
+    async def get_changes(self, after, limit):
+        return sorted((row for row in self.rows if row["seq"] > after), key=lambda row: row["seq"])[:limit]
+
+    async def get_open_transactions(self):
+        return set(self.open) if self.visible else None
+
+    async def prune_changes(self, through):
+        self.rows = [row for row in self.rows if row["seq"] > through]
+
+    def commit(self, *seqs):
+        for seq in seqs:
+            self.rows.append({"seq": seq, "tableName": "Tenants", "operation": "insert",
+                              "rowKey": json.dumps({"tenantID": seq}), "changedAt": None})
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_POLL_SECONDS", 0.005)
+
+
+def run(scenario):
+    async def main():
+        store = FakeStore()
+        feed = ChangeFeed(store)
+        await feed.start()
+        try:
+            await scenario(store, feed)
+        finally:
+            await feed.stop()
+    asyncio.run(main())
+
+
+def published(feed):
+    return [event["seq"] for event in feed.buffer]
+
+
+async def settle():
+    await asyncio.sleep(0.05)
+
+
+def test_publishes_in_seq_order():
+    async def scenario(store, feed):
+        store.commit(1, 2, 3)
+        await settle()
+        assert published(feed) == [1, 2, 3]
+        assert [event["seq"] for event in feed.buffered_after(1)] == [2, 3]
+    run(scenario)
+
+
+def test_holds_a_gap_until_its_writer_commits():
+    async def scenario(store, feed):
+        store.open = {"writer"}
+        store.commit(2, 3)
+        await settle()
+        assert published(feed) == []
+        store.commit(1)
+        store.open = set()
+        await settle()
+        assert published(feed) == [1, 2, 3]
+    run(scenario)
+
+
+def test_skips_a_gap_once_its_writers_have_ended():
+    async def scenario(store, feed):
+        store.open = {"writer"}
+        store.commit(1, 3)
+        await settle()
+        assert published(feed) == [1]
+        store.open = {"later writer"}
+        await settle()
+        assert published(feed) == [1, 3]
+    run(scenario)
+
+
+def test_skips_a_gap_after_the_timeout_when_transactions_are_hidden(monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_GAP_TIMEOUT_SECONDS", 0.1)
+
+    async def scenario(store, feed):
+        store.visible = False
+        store.commit(2)
+        await settle()
+        assert published(feed) == []
+        await asyncio.sleep(0.1)
+        assert published(feed) == [2]
+    run(scenario)
+
+
+def test_gives_up_on_a_writer_open_too_long(monkeypatch):
+    monkeypatch.setattr(changes, "CHANGE_GAP_MAX_SECONDS", 0.1)
+
+    async def scenario(store, feed):
+        store.open = {"stuck writer"}
+        store.commit(2)
+        await settle()
+        assert published(feed) == []
+        await asyncio.sleep(0.1)
+        assert published(feed) == [2]
+    run(scenario)
+
+
+def test_stream_resumes_after_the_last_seen_seq():
+    async def scenario(store, feed):
+        store.commit(1, 2, 3)
+        await settle()
+        messages = []
+
+        async def is_disconnected():
+            return len(messages) > 0
+
+        async for message in feed.stream(1, {"tenants"}, is_disconnected):
+            messages.append(message)
+        assert messages[0].startswith(b"id: 2\nevent: change\n")
+        assert b"id: 3\n" in messages[0] and b"id: 1\n" not in messages[0]
+    run(scenario)
+
+
+def test_parse_resources():
+    assert parse_resources(None) is None
+    assert parse_resources("units, leases") == {"units", "leases"}
+    with pytest.raises(InvalidChangeQuery):
+        parse_resources("units,widgets")
+
+
+def test_feed_sees_writes_through_the_crud_layer(client, make_tenant):
+    async def main():
+        feed = ChangeFeed(ThreadedStore(crud))
+        await feed.start()
+        try:
+            tenantID = make_tenant()
+            for _ in range(100):
+                if feed.buffer:
+                    break
+                await asyncio.sleep(0.01)
+            assert [(event["resource"], event["operation"], event["key"]) for event in feed.buffer] == [
+                ("tenants", "insert", {"tenantID": tenantID})]
+        finally:
+            await feed.stop()
+    asyncio.run(main())
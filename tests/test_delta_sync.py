@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import crud
+import db
+from pagination import encode_sync_token
+
+
+def sync(client, since, limit=100):
+    """Pages through a delta of /tenants; returns (items, deleted keys, next token)."""
+    items, deleted, after = [], [], None
+    while True:
+        response = client.get("/tenants", params={"since": since, "limit": limit, **({"after": after} if after else {})})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        items += page["items"]
+        deleted += page["deleted"]
+        after = page["nextCursor"]
+        if after is None:
+            assert page["syncToken"]
+            return items, deleted, page["syncToken"]
+        assert page["syncToken"] is None
+
+
+def test_full_sync_then_delta(client, make_tenant):
+    tenantIDs = [make_tenant() for _ in range(3)]
+    items, deleted, token = sync(client, "0", limit=2)
+    assert set(tenantIDs) <= {item["tenantID"] for item in items}
+    assert deleted == []
+
+    client.patch("/tenants/%d" % tenantIDs[0], json={"lastName": "Renamed"})
+    client.delete("/tenants/%d" % tenantIDs[1])
+    items, deleted, _ = sync(client, token, limit=1)
+    changed = {item["tenantID"]: item for item in items}
+    assert changed[tenantIDs[0]]["lastName"] == "Renamed"
+    assert tenantIDs[1] not in changed
+    assert {"tenantID": tenantIDs[1]} in deleted
+
+
+def test_plain_listing_has_no_sync_fields(client):
+    assert set(client.get("/tenants").json()) == {"items", "nextCursor"}
+
+
+def test_invalid_delta_requests(client):
+    assert client.get("/tenants", params={"since": "garbage!"}).status_code == 400
+    assert client.get("/units", params={"since": "0", "status": "Vacant"}).status_code == 400
+    old = encode_sync_token(datetime(2000, 1, 1))
+    assert client.get("/tenants", params={"since": old}).status_code == 410
+
+
+def test_expired_tombstones_are_pruned(client, monkeypatch):
+    with db.pooled_connection() as connection:
+        cursor = db.BACKEND.dict_cursor(connection)
+        cursor.execute("INSERT INTO Tombstones (tableName, rowKey, deletedAt) "
+                       "VALUES ('Tenants', '{\"tenantID\": 999999}', '2001-01-01 00:00:00.000')")
+        connection.commit()
+        monkeypatch.setattr(crud, "_tombstones_pruned_at", None)
+        sync(client, "0")
+        cursor.execute("SELECT COUNT(*) AS expired FROM Tombstones WHERE deletedAt < '2002-01-01'")
+        assert cursor.fetchone()["expired"] == 0
+        cursor.close()
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+import crud
+import db
+from crud import InsertCoalescer
+from queries import QUERIES
+
+
+@pytest.fixture
+def coalescer(client, monkeypatch):
+    """
+    Turns GROUP_COMMIT on with a maintenance-request coalescer whose flushes
+    are recorded as the lists of rows they committed together.
+    """
+    def install(**options):
+        coalescer = InsertCoalescer("MaintenanceRequests", QUERIES["create_maintenance_request"], **options)
+        coalescer.flushes = []
+        flush = coalescer.flush
+
+        def recording_flush(items):
+            coalescer.flushes.append([row for row, _ in items])
+            flush(items)
+
+        coalescer.flush = recording_flush
+        monkeypatch.setattr(crud, "GROUP_COMMIT", True)
+        monkeypatch.setitem(crud.coalescers, "MaintenanceRequests", coalescer)
+        return coalescer
+    return install
+
+
+def request(description):
+    return {"description": description, "status": "Open", "submissionDate": "2026-01-01", "completionDate": None}
+
+
+def insert_concurrently(rows):
+    """Calls create_maintenance_request() for every row at once; returns the ID or exception for each."""
+    results = [None] * len(rows)
+    start = threading.Barrier(len(rows))
+
+    def insert(index):
+        start.wait()
+        try:
+            results[index] = crud.create_maintenance_request(rows[index])
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=insert, args=(index,)) for index in range(len(rows))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_each_caller_gets_its_own_id_or_error(coalescer):
+    coalescer = coalescer(window=0.05)
+    rows = [request(None if index % 5 == 0 else "group %d" % index) for index in range(40)]
+    results = insert_concurrently(rows)
+
+    assert any(len(flush) > 1 for flush in coalescer.flushes)
+    ids = [result for result in results if not isinstance(result, Exception)]
+    assert len(set(ids)) == len(ids) == 32
+    for row, result in zip(rows, results):
+        if row["description"] is None:
+            assert isinstance(result, crud.BACKEND.statement_errors)
+        else:
+            assert crud.get_maintenance_request(result)["description"] == row["description"]
+
+
+def test_batch_is_cut_at_max_batch(coalescer):
+    coalescer = coalescer(window=5, max_batch=3)
+    started = time.monotonic()
+    results = insert_concurrently([request("full %d" % index) for index in range(3)])
+    assert time.monotonic() - started < 2
+    assert all(isinstance(result, int) for result in results)
+    assert [len(flush) for flush in coalescer.flushes] == [3]
+
+
+def test_lone_insert_waits_for_the_window_only(coalescer):
+    coalescer = coalescer(window=0.05)
+    started = time.monotonic()
+    requestID = crud.create_maintenance_request(request("alone"))
+    assert 0.05 <= time.monotonic() - started < 2
+    assert crud.get_maintenance_request(requestID)["description"] == "alone"
+    assert len(coalescer.flushes) == 1
+
+
+def test_inserts_inside_a_transaction_skip_the_coalescer(coalescer):
+    coalescer = coalescer(window=5)
+    with db.transaction():
+        requestID = crud.create_maintenance_request(request("in transaction"))
+    assert coalescer.flushes == []
+    assert crud.get_maintenance_request(requestID)["description"] == "in transaction"
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import tracemalloc
+
+import db
+import imports
+from imports import ImportFormat, iter_lines, run_import
+
+
+def lines(*chunks):
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [line async for line in iter_lines(source())]
+    return asyncio.run(collect())
+
+
+def test_lines_are_split_across_chunks():
+    assert lines(b"a,b\r\nc", b",d\n", b"e,f") == [b"a,b", b"c,d", b"e,f"]
+
+
+def test_overlong_line_is_yielded_as_none_and_skipped(monkeypatch):
+    monkeypatch.setattr(imports, "IMPORT_MAX_LINE_BYTES", 4)
+    assert lines(b"ab\nabc", b"defgh", b"ij\nxy\n12345\nz") == [b"ab", None, b"xy", None, b"z"]
+
+
+def test_overlong_line_is_reported_in_bounded_memory(monkeypatch):
+    monkeypatch.setattr(imports, "IMPORT_MAX_LINE_BYTES", 1000)
+    chunk = b"x" * 65536
+
+    async def body():
+        yield b'{"firstName": "Ok", "lastName": "Before", "phoneNumber": "1", "email": "a@example.com"}\n'
+        for _ in range(160):  # a 10 MB line
+            yield chunk
+        yield b'\n{"firstName": "Ok", "lastName": "After", "phoneNumber": "1", "email": "b@example.com"}\n'
+
+    written = []
+
+    async def import_rows(table, rows):
+        written.extend(row["lastName"] for row in rows)
+        return [0] * len(rows)
+
+    tracemalloc.start()
+    try:
+        report = asyncio.run(run_import("tenants", ImportFormat.ndjson, body(), import_rows))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert report["errors"] == [{"line": 2, "error": "Line is longer than 1000 bytes"}]
+    assert written == ["Before", "After"]
+    assert peak < 1 << 20
+
+
+def test_csv_import_skips_bad_rows(client):
+    body = (
+        "firstName,lastName,phoneNumber,email\n"
+        '"Ann","O""Neil",5550101,csv-ann@example.com\n'
+        'Bob,"Multi\nLine",5550102,csv-bob@example.com\n'
+        "\n"
+        "Cat,Dup,5550103,csv-ann@example.com\n"
+        "Short,row\n"
+    )
+    report = client.post("/import/tenants?format=csv", content=body.encode()).json()
+    assert (report["imported"], report["failed"]) == (2, 2)
+    assert [error["line"] for error in report["errors"]] == [6, 7]
+    assert "Expected 4 fields" in report["errors"][1]["error"]
+    with db.pooled_connection() as connection:
+        cursor = db.BACKEND.dict_cursor(connection)
+        cursor.execute("SELECT firstName, lastName FROM Tenants WHERE email LIKE 'csv-%%'")
+        names = {(row["firstName"], row["lastName"]) for row in cursor.fetchall()}
+        cursor.close()
+    assert names == {("Ann", 'O"Neil'), ("Bob", "Multi\nLine")}
+
+
+def test_ndjson_import_counts_into_the_summaries(client, make_property):
+    propertyID = make_property()
+    records = [json.dumps({"propertyID": propertyID, "unitNumber": str(i), "unitType": "Studio"}) for i in range(3)]
+    records += [json.dumps({"propertyID": propertyID, "unitNumber": "4", "unitType": "Studio", "status": "Occupied"}),
+                json.dumps({"propertyID": 10 ** 9, "unitNumber": "x", "unitType": "Studio"}),
+                "[1]", "{bad", json.dumps({"unitNumber": "5"})]
+    report = client.post("/import/units", content="\n".join(records).encode()).json()
+    assert (report["imported"], report["failed"]) == (4, 4)
+    assert [error["line"] for error in report["errors"]] == [5, 6, 7, 8]
+    summary = client.get("/properties/%d/summary" % propertyID).json()
+    assert summary["unitsByStatus"] == {"Vacant": 3, "Occupied": 1}
+
+
+def test_large_import_spans_batches(client):
+    def body():
+        yield b"firstName,lastName,phoneNumber,email\n"
+        for start in range(0, 1200, 400):
+            yield "".join("Bulk,Row%d,5550100,bulk%d@example.com\n" % (i, i) for i in range(start, start + 400)).encode()
+    report = client.post("/import/tenants?format=csv", content=body()).json()
+    assert (report["imported"], report["failed"]) == (1200, 0)
+
+
+def test_unreadable_uploads_are_rejected(client):
+    assert client.post("/import/leases?format=csv", content=b"").status_code == 400
+    assert client.post("/import/widgets", content=b"{}").status_code == 404
+
@@ -0,0 +1,46 @@
+import pytest
+
+import migrations
+from backends import SQLiteBackend
+
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = SQLiteBackend(str(tmp_path / "migrations.sqlite3")).connect()
+    yield connection
+    connection.close()
+
+
+def all_indexes():
+    return migrations.REQUIRED_INDEXES + migrations.SYNC_INDEXES + migrations.SEARCH_INDEXES
+
+
+def test_fresh_database_gets_every_migration_once(connection):
+    versions = [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.migrate(connection, "sqlite") == versions
+    assert migrations.migrate(connection, "sqlite") == []
+    assert migrations.check_indexes(connection, "sqlite") == []
+
+
+def test_missing_index_is_reported_and_recreated(connection):
+    migrations.migrate(connection, "sqlite")
+    cursor = connection.cursor()
+    cursor.execute("DROP INDEX idx_leases_start")
+    assert migrations.check_indexes(connection, "sqlite") == [("Leases", "idx_leases_start", ["startDate"])]
+    migrations.create_missing_indexes(cursor, "sqlite", all_indexes())
+    cursor.close()
+    assert migrations.check_indexes(connection, "sqlite") == []
+
+
+def test_existing_tables_are_kept_and_indexed(connection):
+    cursor = connection.cursor()
+    cursor.execute("CREATE TABLE Tenants (tenantID INTEGER PRIMARY KEY AUTOINCREMENT, firstName VARCHAR(100) NOT NULL, "
+                   "lastName VARCHAR(100) NOT NULL, phoneNumber VARCHAR(10) NOT NULL, email VARCHAR(100) NOT NULL)")
+    cursor.execute("INSERT INTO Tenants (firstName, lastName, phoneNumber, email) VALUES ('Old', 'Row', '1', 'old@x')")
+    connection.commit()
+    migrations.migrate(connection, "sqlite")
+    cursor.execute("SELECT lastName, updatedAt FROM Tenants")
+    row = cursor.fetchone()
+    cursor.close()
+    assert row["lastName"] == "Row" and row["updatedAt"] is not None
+    assert migrations.check_indexes(connection, "sqlite") == []
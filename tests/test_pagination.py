@@ -0,0 +1,98 @@
+import base64
+import json
+
+import pytest
+
+from pagination import InvalidCursor, InvalidListQuery, decode_cursor, encode_cursor, ordering, page_query
+
+
+def raw_cursor(order, values):
+    return base64.urlsafe_b64encode(json.dumps([order, values]).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    order = ["-submissionDate", "-requestID"]
+    cursor = encode_cursor(order, ["2026-01-02", 7])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, order) == ["2026-01-02", 7]
+
+
+def test_cursor_from_another_listing_is_rejected():
+    cursor = encode_cursor(["unitID"], [3])
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, ["-unitID"])
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", raw_cursor(["unitID"], [1, 2]), "bm90IGpzb24"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, ["unitID"])
+
+
+@pytest.mark.parametrize("value", [[1], {"a": 1}, True])
+def test_cursor_values_must_be_scalars(value):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(raw_cursor(["unitID"], [value]), ["unitID"])
+
+
+def test_ordering_appends_key_columns_in_the_sort_direction():
+    assert ordering(["requestID"], None, []) == ["requestID"]
+    assert ordering(["requestID"], "-submissionDate", ["submissionDate"]) == ["-submissionDate", "-requestID"]
+    with pytest.raises(InvalidListQuery):
+        ordering(["requestID"], "description", ["submissionDate"])
+
+
+def test_page_query_seeks_past_the_cursor():
+    after = encode_cursor(["submissionDate", "requestID"], ["2026-01-01", 4])
+    query, params, order = page_query("SELECT * FROM MaintenanceRequests", ["requestID"], after, 10,
+                                      sort="submissionDate", sortable=["submissionDate"])
+    assert "(submissionDate > %(after_0)s) OR (submissionDate = %(after_0)s AND requestID > %(after_1)s)" in query
+    assert query.endswith("ORDER BY submissionDate, requestID LIMIT %(page_limit)s")
+    assert params == {"page_limit": 11, "after_0": "2026-01-01", "after_1": 4}
+
+
+def test_unknown_filter_is_rejected():
+    with pytest.raises(InvalidListQuery):
+        page_query("SELECT * FROM Units", ["unitID"], None, 10, {"color": "red"}, {})
+
+
+def read_all(client, path, **params):
+    items, pages, after = [], 0, None
+    while True:
+        response = client.get(path, params={**params, **({"after": after} if after else {})})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        items += page["items"]
+        pages += 1
+        after = page["nextCursor"]
+        if after is None:
+            return items, pages
+
+
+def test_pages_cover_a_filtered_listing_once(client, make_property, make_unit):
+    propertyID = make_property()
+    unitIDs = [make_unit(propertyID) for _ in range(5)]
+    items, pages = read_all(client, "/units", propertyID=propertyID, limit=2)
+    assert [item["unitID"] for item in items] == unitIDs
+    assert pages == 3
+
+
+def test_pages_follow_a_descending_sort(client):
+    dates = ["2031-03-0%d" % day for day in (4, 1, 3, 1, 2)]
+    for day in dates:
+        response = client.post("/maintenance_requests",
+                               json={"description": "Leak", "status": "Tested", "submissionDate": day})
+        assert response.status_code == 200, response.text
+    items, _ = read_all(client, "/maintenance_requests", status="Tested", sort="-submissionDate", limit=2)
+    keys = [(item["submissionDate"], item["requestID"]) for item in items]
+    assert keys == sorted(keys, reverse=True)
+    assert len(keys) == len(dates)
+
+
+@pytest.mark.parametrize("after", ["garbage", raw_cursor(["unitID"], [{"unitID": 1}]), encode_cursor(["-unitID"], [1])])
+def test_bad_cursor_is_a_client_error(client, after):
+    assert client.get("/units", params={"after": after}).status_code == 400
+
+
+def test_unknown_sort_is_a_client_error(client):
+    assert client.get("/maintenance_requests", params={"sort": "description"}).status_code == 400
@@ -0,0 +1,104 @@
+import itertools
+import threading
+
+import pytest
+
+from db import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    serial = itertools.count(1)
+
+    def __init__(self):
+        self.id = next(self.serial)
+        self.open = True
+        self.in_transaction = False
+        self.dropped = False
+        self.rolled_back = 0
+
+    def ping(self, reconnect=True):
+        assert not reconnect
+        if self.dropped:
+            raise OSError("server has gone away")
+
+    def rollback(self):
+        self.rolled_back += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.open = False
+
+
+def test_reuses_released_connections():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert pool.size == 1
+
+
+def test_warm_opens_up_to_max_size():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=3)
+    assert pool.warm(5) == 3
+    assert (pool.size, pool.idle) == (3, 3)
+
+
+def test_acquire_times_out_when_exhausted():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0)
+
+
+def test_waiter_gets_released_connection():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=1, timeout=5)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, (conn,)).start()
+    assert pool.acquire() is conn
+
+
+def test_release_rolls_back_open_transaction():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=1)
+    conn = pool.acquire()
+    conn.in_transaction = True
+    pool.release(conn)
+    assert conn.rolled_back == 1
+    assert pool.acquire() is conn
+
+
+def test_expired_connection_is_replaced():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=1, recycle=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert not conn.open
+    assert pool.acquire() is not conn
+    assert pool.size == 1
+
+
+def test_dropped_connection_is_replaced_on_checkout():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=1, recycle=3600)
+    conn = pool.acquire()
+    pool.release(conn)
+    opened_at = pool._opened_at[id(conn)]
+    conn.dropped = True
+    replacement = pool.acquire()
+    assert replacement is not conn and not conn.open
+    assert pool.size == 1
+    assert pool._opened_at[id(replacement)] >= opened_at
+
+
+def test_failed_replacement_frees_its_slot():
+    pool = ConnectionPool(connect=FakeConnection, min_size=0, max_size=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.dropped = True
+
+    def refuse():
+        raise OSError("connection refused")
+
+    pool._connect = refuse
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.size == 0
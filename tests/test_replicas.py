@@ -0,0 +1,104 @@
+import contextvars
+import sqlite3
+import time
+
+import pytest
+
+import db
+
+
+class Replica:
+    """Opens connections to the test database tagged with a replica number, or fails like a server that is down."""
+
+    def __init__(self, number):
+        self.number = number
+        self.down = False
+        self.connects = 0
+
+    def connect(self):
+        self.connects += 1
+        if self.down:
+            raise sqlite3.OperationalError("Can't connect to replica %d" % self.number)
+        conn = db.BACKEND.connect()
+        conn.replica = self.number
+        return conn
+
+
+@pytest.fixture
+def replicas(client, monkeypatch):
+    servers = [Replica(0), Replica(1)]
+    replica_set = db.ReplicaSet([db.ConnectionPool(connect=server.connect, min_size=0, max_size=1)
+                                 for server in servers])
+    monkeypatch.setattr(db, "_replicas", replica_set)
+    yield servers
+    for pool in replica_set.pools:
+        pool.close()
+
+
+def in_request(function):
+    """Runs function in a context of its own, as each API request is."""
+    return contextvars.Context().run(function)
+
+
+def read_from():
+    """Returns the replica number a read is served by, or None for the primary."""
+    with db.read_connection() as conn:
+        return getattr(conn, "replica", None)
+
+
+def test_reads_are_spread_over_the_replicas(replicas):
+    assert {in_request(read_from) for _ in range(4)} == {0, 1}
+
+
+def test_reads_use_the_primary_when_every_replica_is_saturated(replicas):
+    replica_set = db.get_replicas()
+    held = [replica_set.acquire() for _ in replicas]
+    try:
+        started = time.monotonic()
+        assert in_request(read_from) is None
+        # It fell back at once instead of waiting on a replica's pool.
+        assert time.monotonic() - started < 1
+    finally:
+        for conn in held:
+            replica_set.release(conn)
+    # Saturated replicas are not marked down: they serve again once released.
+    assert in_request(read_from) in (0, 1)
+
+
+def test_reads_use_the_primary_when_every_replica_is_down(replicas):
+    for server in replicas:
+        server.down = True
+    assert in_request(read_from) is None
+    assert [server.connects for server in replicas] == [1, 1]
+    # A replica that failed is skipped until its retry time, even once it is back.
+    for server in replicas:
+        server.down = False
+    assert in_request(read_from) is None
+    assert [server.connects for server in replicas] == [1, 1]
+
+
+def test_a_replica_that_is_down_is_skipped(replicas):
+    replicas[0].down = True
+    assert {in_request(read_from) for _ in range(4)} == {1}
+
+
+def test_reads_after_a_write_use_the_primary(replicas):
+    def write_then_read():
+        before = read_from()
+        with db.pooled_connection():
+            pass
+        return before, read_from()
+
+    before, after = in_request(write_then_read)
+    assert before in (0, 1)
+    assert after is None
+    # The next request starts on the replicas again.
+    assert in_request(read_from) in (0, 1)
+
+
+def test_pin_to_primary(replicas):
+    def pinned_read():
+        db.pin_to_primary()
+        return read_from()
+
+    assert in_request(pinned_read) is None
@@ -0,0 +1,84 @@
+import pytest
+
+import crud
+import search
+
+
+def found(client, resource, q):
+    response = client.get("/%s/search" % resource, params={"q": q})
+    assert response.status_code == 200, response.text
+    key = "tenantID" if resource == "tenants" else "propertyID"
+    return [item[key] for item in response.json()["items"]]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Zoë O'Brien-Smith", ["zoe", "o", "brien", "smith", "obriensmith"]),
+    ("ÅNGSTRÖM", ["angstrom"]),
+    ("  --  ", []),
+])
+def test_text_terms(text, expected):
+    assert search.text_terms(text) == expected
+
+
+def test_query_words_drop_the_email_domain_and_repeats():
+    assert search.query_words("Kay kay@example.com KAY") == ["kay"]
+
+
+def test_better_matches_rank_first(client, make_tenant):
+    by_email = make_tenant(email="quillon@example.com")
+    by_prefix = make_tenant(lastName="Quillonsby")
+    by_name = make_tenant(firstName="Quillon")
+    items = client.get("/tenants/search", params={"q": "quillon"}).json()["items"]
+    # A whole-word match doubles a term's weight, and names weigh more than emails.
+    assert [(item["tenantID"], item["score"]) for item in items] == [(by_name, 6), (by_email, 4), (by_prefix, 3)]
+
+
+def test_every_word_must_match(client, make_tenant):
+    both = make_tenant(firstName="Marisol", lastName="Quenby")
+    make_tenant(firstName="Marisol", lastName="Upton")
+    assert found(client, "tenants", "quen mari") == [both]
+
+
+def test_accents_case_and_punctuation_are_ignored(client, make_tenant):
+    tenantID = make_tenant(firstName="Zoë", lastName="O'Vëlasquez-Trent")
+    for q in ("zoe", "ZOË", "ovelasquez", "O'Velasquez", "velasquez trent", "Vëlasquez-Trent zoe"):
+        assert found(client, "tenants", q) == [tenantID], q
+
+
+def test_short_words_are_not_prefixes_on_their_own(client, make_tenant):
+    tenantID = make_tenant(firstName="Zebulon", lastName="O'Xandersen")
+    assert found(client, "tenants", "z") == []
+    assert found(client, "tenants", "z o") == []
+    assert found(client, "tenants", "ze") == [tenantID]
+    # Alongside a longer word, a short one narrows by prefix.
+    assert found(client, "tenants", "xander z") == [tenantID]
+    assert found(client, "tenants", "xander q") == []
+    # In a query of short words only, they match whole words.
+    assert tenantID in found(client, "tenants", "o")
+
+
+def test_queries_without_words(client):
+    assert found(client, "tenants", "!!! --") == []
+    assert client.get("/tenants/search", params={"q": ""}).status_code == 422
+
+
+def test_updated_and_deleted_rows_leave_the_results(client, make_tenant, make_property):
+    tenantID = make_tenant(firstName="Ottoline", lastName="Brackwater")
+    assert found(client, "tenants", "brackwater") == [tenantID]
+    client.patch("/tenants/%d" % tenantID, json={"lastName": "Fenwright"})
+    assert found(client, "tenants", "brackwater") == []
+    assert found(client, "tenants", "ottoline fenwright") == [tenantID]
+    assert client.delete("/tenants/%d" % tenantID).status_code == 200
+    assert found(client, "tenants", "fenwright") == []
+
+    propertyID = make_property(address="12 Quarrystone Lane", city="Tillamook", zipCode="97141")
+    assert found(client, "properties", "quarrystone tillamook") == [propertyID]
+    assert crud.search_properties("97141")["items"][0]["propertyID"] == propertyID
+    assert client.delete("/properties/%d" % propertyID).status_code == 200
+    assert found(client, "properties", "quarrystone") == []
+
+
+def test_the_query_description_states_the_minimum_length(client):
+    parameters = client.get("/openapi.json").json()["paths"]["/tenants/search"]["get"]["parameters"]
+    (q,) = [parameter for parameter in parameters if parameter["name"] == "q"]
+    assert "shorter than %d characters" % search.SEARCH_MIN_PREFIX in q["description"]
@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+import db
+import slow_queries
+from slow_queries import SlowQueryLog
+
+# Counts to 300,000 in SQL: tens of milliseconds, against microseconds for SELECT 1.
+SLOW_SELECT = """
+    SELECT (WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+            SELECT COUNT(*) FROM n) AS total
+"""
+
+
+def wait_for_plan(entry):
+    deadline = time.monotonic() + 5
+    while entry["plan"] is None and entry["planError"] is None:
+        assert time.monotonic() < deadline, "EXPLAIN did not run"
+        time.sleep(0.01)
+    return entry
+
+
+class Explainer:
+    def __init__(self):
+        self.explained = []
+
+    def __call__(self, sql, params):
+        self.explained.append(sql)
+        return [{"detail": "plan of " + sql}]
+
+
+def test_only_statements_over_the_threshold_are_logged():
+    log = SlowQueryLog(threshold_ms=5)
+    log.record("SELECT * FROM Tenants WHERE tenantID = %s", (1,), 0.0049, 1)
+    log.record("SELECT * FROM Units WHERE unitID = %s", (2,), 0.005, 1)
+    log.record("SELECT * FROM Leases WHERE leaseID = %s", (3,), 0.2, 0)
+    assert [(entry["sql"], entry["durationMs"]) for entry in log.snapshot()] == [
+        ("SELECT * FROM Leases WHERE leaseID = ?", 200.0),
+        ("SELECT * FROM Units WHERE unitID = ?", 5.0),
+    ]
+
+
+def test_the_log_is_off_without_a_threshold(monkeypatch):
+    monkeypatch.setattr(db, "SLOW_QUERIES", SlowQueryLog(threshold_ms=0))
+    conn = object()
+    assert db.traced(conn, None) is conn
+
+
+def test_the_log_keeps_only_the_newest_entries():
+    log = SlowQueryLog(threshold_ms=1, size=3)
+    for number in range(10):
+        log.record("DELETE FROM Payments WHERE paymentID = %s", (number,), 0.01 * (number + 1), 1)
+    entries = log.snapshot()
+    assert len(log.entries) == 3
+    assert [entry["durationMs"] for entry in entries] == [100.0, 90.0, 80.0]
+    assert [entry["durationMs"] for entry in log.snapshot(limit=2)] == [100.0, 90.0]
+
+
+def test_only_selects_are_explained():
+    log = SlowQueryLog(threshold_ms=1)
+    explain = Explainer()
+    log.record("  select * FROM Tenants WHERE email = %s", ("a@example.com",), 0.1, 1, explain=explain)
+    log.record("UPDATE Tenants SET phoneNumber = %s WHERE tenantID = %s", ("1", 1), 0.1, 1, explain=explain)
+    log.record("DELETE FROM Tenants WHERE tenantID = %s", (1,), 0.1, 1, explain=explain)
+    log.record("INSERT INTO Tenants (email) VALUES (%s)", [("b@example.com",)], 0.1, 1, many=True, explain=explain)
+    select, update, delete, insert = reversed(log.snapshot())
+    assert wait_for_plan(select)["plan"] == [{"detail": "plan of   select * FROM Tenants WHERE email = %s"}]
+    assert explain.explained == ["  select * FROM Tenants WHERE email = %s"]
+    assert update["plan"] is delete["plan"] is insert["plan"] is None
+
+
+def test_a_plan_is_reused_for_the_same_statement():
+    log = SlowQueryLog(threshold_ms=1)
+    explain = Explainer()
+    log.record("SELECT * FROM Units WHERE propertyID = %s", (1,), 0.1, 3, explain=explain)
+    wait_for_plan(log.snapshot()[0])
+    log.record("SELECT * FROM Units WHERE propertyID = %s", (2,), 0.1, 3, explain=explain)
+    first, second = reversed(log.snapshot())
+    assert second["plan"] == first["plan"]
+    assert second["params"] != first["params"]
+    assert len(explain.explained) == 1
+
+
+@pytest.fixture
+def slow_log(client, monkeypatch):
+    log = SlowQueryLog(threshold_ms=5)
+    monkeypatch.setattr(db, "SLOW_QUERIES", log)
+    return log
+
+
+def test_slow_statements_on_lent_connections_are_logged_and_explained(client, slow_log):
+    with db.read_connection() as conn:
+        cursor = db.BACKEND.dict_cursor(conn)
+        cursor.execute("SELECT 1 AS one")
+        cursor.fetchall()
+        cursor.execute(SLOW_SELECT, (300000,))
+        assert cursor.fetchone() == {"total": 300000}
+        cursor.close()
+    (entry,) = slow_log.snapshot()
+    assert entry["sql"] == slow_queries.normalize(SLOW_SELECT)
+    assert entry["rows"] == 1
+    assert entry["durationMs"] >= 5
+    assert wait_for_plan(entry)["planError"] is None
+    assert entry["plan"]
+    assert client.get("/admin/slow-queries").json()["entries"] == [entry]
+    client.delete("/admin/slow-queries")
+    assert slow_log.snapshot() == []
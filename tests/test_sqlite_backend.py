@@ -0,0 +1,80 @@
+from datetime import date
+from decimal import Decimal
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from backends import SQLiteBackend, convert_placeholders
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = SQLiteBackend(str(tmp_path / "backend.sqlite3")).connect()
+    cursor = connection.cursor()
+    cursor.execute("CREATE TABLE Things (id INTEGER PRIMARY KEY AUTOINCREMENT, label TEXT, due DATE, price DECIMAL)")
+    connection.commit()
+    cursor.close()
+    yield connection
+    connection.close()
+
+
+def test_placeholders_are_converted():
+    assert convert_placeholders("a = %(a)s AND b = %s AND c LIKE 'x%%'") == "a = :a AND b = ? AND c LIKE 'x%'"
+
+
+def test_rows_come_back_as_dicts_with_dates(connection):
+    cursor = connection.cursor()
+    cursor.execute("INSERT INTO Things (label, due, price) VALUES (%(label)s, %(due)s, %(price)s)",
+                   {"label": "a", "due": date(2026, 1, 2), "price": Decimal("9.50")})
+    assert (cursor.rowcount, cursor.lastrowid) == (1, 1)
+    cursor.execute("SELECT label, due FROM Things WHERE id = %s", (1,))
+    assert cursor.fetchone() == {"label": "a", "due": date(2026, 1, 2)}
+    cursor.execute("SELECT label FROM Things WHERE id = %s", (2,))
+    assert cursor.fetchone() is None
+    cursor.close()
+
+
+def test_transactions_roll_back(connection):
+    cursor = connection.cursor()
+    cursor.executemany("INSERT INTO Things (label) VALUES (%(label)s)", [{"label": "a"}, {"label": "b"}])
+    assert connection.in_transaction
+    connection.rollback()
+    assert not connection.in_transaction
+    cursor.execute("SELECT COUNT(*) AS things FROM Things")
+    assert cursor.fetchone()["things"] == 0
+    cursor.close()
+
+
+def test_foreign_keys_are_enforced(connection):
+    cursor = connection.cursor()
+    cursor.execute("CREATE TABLE Parts (thingID INTEGER NOT NULL REFERENCES Things (id))")
+    with pytest.raises(sqlite3.IntegrityError):
+        cursor.execute("INSERT INTO Parts (thingID) VALUES (%s)", (42,))
+    cursor.close()
+
+
+def test_ping_fails_once_closed(connection):
+    connection.ping(reconnect=False)
+    connection.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        connection.ping(reconnect=False)
+
+
+def test_app_imports_without_the_mysql_driver(tmp_path):
+    script = (
+        "import sys\n"
+        "class Block:\n"
+        "    def find_spec(self, name, path=None, target=None):\n"
+        "        if name.partition('.')[0] in ('pymysql', 'aiomysql'):\n"
+        "            raise ImportError(name)\n"
+        "sys.meta_path.insert(0, Block())\n"
+        "import main, crud\n"
+    )
+    env = {**os.environ, "DB_BACKEND": "sqlite", "SQLITE_PATH": str(tmp_path / "nodriver.sqlite3")}
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
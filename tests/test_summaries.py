@@ -0,0 +1,76 @@
+import pytest
+
+import db
+import migrations
+from backends import SQLiteBackend
+
+
+def summary(client, propertyID):
+    response = client.get("/properties/%d/summary" % propertyID)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def make_lease(client, unitID, tenantID, rentPrice, endDate=None):
+    response = client.post("/leases", json={"unitID": unitID, "tenantID": tenantID, "startDate": "2026-01-01",
+                                            "endDate": endDate, "rentPrice": rentPrice})
+    assert response.status_code == 200, response.text
+    return response.json()["leaseID"]
+
+
+def test_summary_follows_unit_and_lease_writes(client, make_property, make_unit, make_tenant):
+    propertyID = make_property()
+    units = [make_unit(propertyID) for _ in range(4)]
+    tenantID = make_tenant()
+    client.patch("/units/%d" % units[0], json={"status": "Occupied"})
+    make_lease(client, units[0], tenantID, 1200)
+    leaseID = make_lease(client, units[1], tenantID, 900)
+    make_lease(client, units[2], tenantID, 500, endDate="2020-12-31")
+    assert client.delete("/units/%d" % units[3]).status_code == 200
+    client.patch("/leases/%d" % leaseID, json={"rentPrice": 1000})
+
+    assert summary(client, propertyID) == {
+        "propertyID": propertyID, "totalUnits": 3, "unitsByStatus": {"Occupied": 1, "Vacant": 2},
+        "activeLeases": 2, "totalRent": 2200.0,
+    }
+
+
+def test_moving_a_unit_moves_its_leases(client, make_property, make_unit, make_tenant):
+    source, target = make_property(), make_property()
+    unitID = make_unit(source)
+    make_lease(client, unitID, make_tenant(), 750)
+    client.patch("/units/%d" % unitID, json={"propertyID": target})
+    assert summary(client, source)["activeLeases"] == 0
+    assert summary(client, target)["totalRent"] == 750.0
+
+
+def test_recount_repairs_drift(client, make_property, make_unit):
+    propertyID = make_property()
+    unitID = make_unit(propertyID)
+    with db.pooled_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("UPDATE Units SET status = 'Occupied' WHERE unitID = %(unitID)s", {"unitID": unitID})
+        connection.commit()
+        cursor.close()
+    assert summary(client, propertyID)["unitsByStatus"] == {"Vacant": 1}
+    assert client.post("/admin/property-summaries/recount").status_code == 200
+    assert summary(client, propertyID)["unitsByStatus"] == {"Occupied": 1}
+
+
+def test_migration_refuses_cascading_foreign_keys(tmp_path):
+    connection = SQLiteBackend(str(tmp_path / "cascading.sqlite3")).connect()
+    cursor = connection.cursor()
+    cursor.execute("""
+    CREATE TABLE Leases (
+        leaseID INTEGER PRIMARY KEY AUTOINCREMENT,
+        unitID INTEGER NOT NULL REFERENCES Units (unitID) ON DELETE CASCADE,
+        tenantID INTEGER NOT NULL,
+        startDate DATE NOT NULL,
+        endDate DATE NULL,
+        rentPrice DECIMAL(10, 2) NOT NULL
+    )
+    """)
+    connection.commit()
+    with pytest.raises(RuntimeError, match="Leases"):
+        migrations.migrate(connection, "sqlite")
+    connection.close()